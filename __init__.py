@@ -9,4 +9,5 @@ from .report_details import ReportDetail
 from .roles import Role
 from .tableau_server import TableauServerCredential, TableauServerDetail, TableauSiteDetail
 from .report_details import ReportDetailManager
-from .report_logs import ReportLogManager
\ No newline at end of file
+from .report_logs import ReportLogManager
+from .dax_translation_cache import DaxTranslationCache, DaxTranslationCacheManager
\ No newline at end of file
@@ -8,6 +8,7 @@ from app.services.analysis import AnalysisProcessor
 from app.core.dependencies import get_current_user
 from app.core import logger
 from app.schemas.analyse import ReportAnalysisRequest
+from app.core.metrics import track_stage, organization_label, report_type_label
 
 
 analysis_router = APIRouter()   
@@ -36,7 +37,10 @@ async def generate_report_analysis(
     logger.info(f"[Analysis API] Starting analysis for {len(request.report_ids)} report(s), user: {user.email}")
     
     try:
-        response = await AnalysisProcessor.analyse_processor(request.report_ids, user)
+        report_type = await report_type_label(request.report_ids)
+        with track_stage("analyse", organization_label(user), report_type) as stage:
+            response = await AnalysisProcessor.analyse_processor(request.report_ids, user)
+            stage.set_status_code(response.status_code)
         
         # Determine status based on response
         if response.status_code == 200:
@@ -0,0 +1,111 @@
+import time
+import asyncio
+import threading
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import logger, COMPUTE_POOL_WORKERS, COMPUTE_POOL_MAX_QUEUE
+from app.core.exceptions import ServiceUnavailableError
+from app.core.metrics import register_queue_depth
+
+
+class ComputePool:
+    """
+    Process pool for CPU-bound stages (parsing, conversion, packaging).
+
+    Async handlers ``await compute_pool.run(fn, ...)`` so heavy work runs in a
+    worker process and the API event loop stays responsive. At most
+    ``max_queue`` tasks may be running or waiting; beyond that new work is
+    rejected with 503 instead of piling up. ``fn`` and its arguments must be
+    picklable, so pass module-level functions and plain data.
+    """
+
+    def __init__(self, max_workers: int = COMPUTE_POOL_WORKERS, max_queue: int = COMPUTE_POOL_MAX_QUEUE):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(self.max_workers, max_queue)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._busy_seconds = 0.0
+        self._max_pending = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                logger.info("[COMPUTE_POOL] Started process pool with %s workers", self.max_workers)
+            return self._executor
+
+    def _reset_executor(self, broken: Optional[ProcessPoolExecutor] = None) -> None:
+        """
+        Drop the current executor. With ``broken``, only if it is still the
+        current one: concurrent tasks failing on the same crashed pool must not
+        tear down the replacement another task already started.
+        """
+        with self._lock:
+            if broken is not None and self._executor is not broken:
+                return
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._rejected += 1
+                logger.warning("[COMPUTE_POOL] Rejecting %s: %s tasks queued", getattr(fn, '__name__', fn), self._pending)
+                raise ServiceUnavailableError(detail="Server is busy processing other reports; please retry shortly")
+            self._pending += 1
+            self._submitted += 1
+            self._max_pending = max(self._max_pending, self._pending)
+
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            result = await loop.run_in_executor(executor, partial(fn, *args, **kwargs))
+            with self._lock:
+                self._completed += 1
+            return result
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); recreate the pool so later requests are not affected.
+            logger.error("[COMPUTE_POOL] Worker crashed while running %s; restarting pool", getattr(fn, '__name__', fn))
+            self._reset_executor(executor)
+            with self._lock:
+                self._failed += 1
+            raise
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._busy_seconds += time.perf_counter() - started
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._pending,
+                "max_queue_depth_seen": self._max_pending,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "busy_seconds": round(self._busy_seconds, 3),
+            }
+
+    def shutdown(self) -> None:
+        self._reset_executor()
+
+
+compute_pool = ComputePool()
+register_queue_depth("compute_pool", lambda: compute_pool._pending)
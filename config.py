@@ -1,50 +1,53 @@
 import os
-import logging
+import json
+import asyncio
+import base64
 import aiofiles
 import aioboto3
 import botocore
-from typing import Optional, List
+import botocore.session
+from typing import Any, Dict, Optional, List
+from pydantic import PrivateAttr
 from pydantic_settings import BaseSettings
 from sqlalchemy import create_engine
 from openai import OpenAI
 from dotenv import load_dotenv
-from app.core.constants import HTTP_STATUS_INTERNAL_ERROR, MSG_S3_DOWNLOAD_FAILED, MSG_S3_FETCH_ERROR
+from app.core.constants import (
+    HTTP_STATUS_INTERNAL_ERROR, MSG_S3_DOWNLOAD_FAILED, MSG_S3_FETCH_ERROR, UPLOAD_PART_SIZE,
+    S3_MAX_COPY_OBJECT_SIZE, S3_COPY_PART_SIZE, S3_DELETE_BATCH_SIZE, BLOB_DELETE_BATCH_SIZE, BLOB_COPY_WAIT_SECONDS,
+    WORKBOOK_CACHE_KEY_MARKER, WORKBOOK_CACHE_KEY_SUFFIXES
+)
 from fastapi import HTTPException, status
 from pathlib import Path
 import tableauserverclient as TSC
-from app.core.exceptions import BadRequestError
+from app.core.exceptions import BadRequestError, BaseAppException
 from azure.storage.blob.aio import BlobServiceClient
 from azure.core.exceptions import ResourceNotFoundError
 from datetime import datetime, timedelta, timezone
-from azure.storage.blob import generate_blob_sas, BlobSasPermissions
+from azure.storage.blob import generate_blob_sas, BlobSasPermissions, BlobBlock
 from urllib.parse import quote
-from openai import AzureOpenAI
+from app.core.storage_cache import ObjectMetadataCache, PresignedUrlCache
+from app.core.logger_setup import logger
+from app.core.metrics import observe_storage_operation, record_storage_bytes
+from openai import AzureOpenAI, AsyncOpenAI, AsyncAzureOpenAI
 
 
 
 # Load environment variables
 load_dotenv()
 
-def setup_logger(logger_name: str) -> logging.Logger:
-    logger = logging.getLogger(logger_name)
-    logger.setLevel(logging.DEBUG)
 
-    # Clear existing handlers if the logger was already configured
-    if logger.hasHandlers():
-        logger.handlers.clear()
-
-    # Console handler for logging to stdout
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(
-        logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s"
-        )
-    )
-    logger.addHandler(console_handler)
-
-    return logger
-
-logger = setup_logger("BIport-Log")
+async def _invalidate_workbook_cache(*object_keys: str) -> None:
+    # Only workbook keys can be in the workbook cache; the keys.json update runs in a thread.
+    keys = [
+        key for key in object_keys
+        if WORKBOOK_CACHE_KEY_MARKER in key or key.lower().endswith(WORKBOOK_CACHE_KEY_SUFFIXES)
+    ]
+    if not keys:
+        return
+    # Imported lazily: the workbook cache itself depends on this module.
+    from app.core.workbook_cache import invalidate_cached_objects
+    await asyncio.to_thread(invalidate_cached_objects, keys)
 
 #for semantic_model V2 api
 class PathConfig:
@@ -91,6 +94,7 @@ class S3Config(BaseSettings):
     aws_secret_access_key: str = os.getenv("AWS_SECRET_KEY")
     endpoint_url: str = os.getenv("AWS_ENDPOINT")
     bucket_name: str = os.getenv("AWS_S3_BUCKET_NAME")
+    _presign_client: Any = PrivateAttr(default=None)
  
     def get_s3_client(self):
         return aioboto3.Session().client(
@@ -101,48 +105,166 @@ class S3Config(BaseSettings):
             endpoint_url=self.endpoint_url,
         )
                 
+    @observe_storage_operation("s3", "upload")
     async def upload_to_s3(self, file_path: str, object_name: str) -> bool:
         try:
             async with self.get_s3_client() as s3:
                 with open(file_path, "rb") as f:
                     await s3.upload_fileobj(f, self.bucket_name, object_name)
+            await _invalidate_workbook_cache(object_name)
+            size = os.path.getsize(file_path)
+            object_metadata_cache.record_present(self.bucket_name, object_name, size=size)
+            record_storage_bytes("s3", "upload", size)
+            return True
+        except Exception as e:
+            logger.error("Upload to S3 failed: %s", e)
+            return False
+
+    @observe_storage_operation("s3", "upload_stream")
+    async def upload_stream(self, chunks, object_name: str) -> bool:
+        """
+        Uploads an async iterable of byte chunks with S3 multipart upload.
+        Chunks are buffered up to UPLOAD_PART_SIZE so every part but the last meets the S3 minimum.
+        Application errors raised by the iterator (e.g. size limits) propagate after the upload is aborted.
+        """
+        upload_id = None
+        try:
+            async with self.get_s3_client() as s3:
+                response = await s3.create_multipart_upload(Bucket=self.bucket_name, Key=object_name)
+                upload_id = response["UploadId"]
+                parts = []
+                buffer = bytearray()
+                total_size = 0
+
+                async def flush_part():
+                    part_number = len(parts) + 1
+                    part = await s3.upload_part(
+                        Bucket=self.bucket_name, Key=object_name, UploadId=upload_id,
+                        PartNumber=part_number, Body=bytes(buffer)
+                    )
+                    parts.append({"ETag": part["ETag"], "PartNumber": part_number})
+                    buffer.clear()
+
+                try:
+                    async for chunk in chunks:
+                        buffer.extend(chunk)
+                        total_size += len(chunk)
+                        if len(buffer) >= UPLOAD_PART_SIZE:
+                            await flush_part()
+                    if buffer or not parts:
+                        await flush_part()
+                    completed = await s3.complete_multipart_upload(
+                        Bucket=self.bucket_name, Key=object_name, UploadId=upload_id,
+                        MultipartUpload={"Parts": parts}
+                    )
+                except BaseException:
+                    await s3.abort_multipart_upload(Bucket=self.bucket_name, Key=object_name, UploadId=upload_id)
+                    raise
+            await _invalidate_workbook_cache(object_name)
+            object_metadata_cache.record_present(self.bucket_name, object_name, completed.get("ETag"), total_size)
+            record_storage_bytes("s3", "upload", total_size)
             return True
+        except BaseAppException:
+            raise
         except Exception as e:
-            logger.error(f"Upload to S3 failed: {e}")
+            logger.error("Multipart upload to S3 failed: %s", e)
             return False
 
     async def check_file_exists(self, object_name: str) -> bool:
         """
         Checks whether an object exists in the S3 bucket.
         Returns True if it exists, False if not found, raises exception for other errors.
+        Recent uploads, deletes and HEAD results are answered from object_metadata_cache.
         """
+        cached = object_metadata_cache.get(self.bucket_name, object_name)
+        if cached is not None:
+            return cached.exists
+        return await self._head_exists(object_name)
+
+    # Timed separately from check_file_exists so cache hits do not count as HEAD latency.
+    @observe_storage_operation("s3", "head", false_is_error=False)
+    async def _head_exists(self, object_name: str) -> bool:
         try:
             async with self.get_s3_client() as s3:
-                await s3.head_object(Bucket=self.bucket_name, Key=object_name)
+                response = await s3.head_object(Bucket=self.bucket_name, Key=object_name)
+                object_metadata_cache.record_present(
+                    self.bucket_name, object_name, response.get("ETag"), response.get("ContentLength")
+                )
                 return True
         except botocore.exceptions.ClientError as e:
             if e.response['Error']['Code'] == '404':
+                object_metadata_cache.record_absent(self.bucket_name, object_name)
                 return False
             # Re-raise other client errors (permissions, etc)
             raise
         except Exception as e:
-            logger.error(f"Error checking S3 file existence: {str(e)}")
+            logger.error("Error checking S3 file existence: %s", e)
             raise
 
-    async def copy_object(self, source_key: str, destination_key: str) -> bool:
+    @observe_storage_operation("s3", "head", none_is_error=True)
+    async def get_object_etag(self, object_name: str) -> Optional[str]:
+        """Returns the object's ETag, or None if it does not exist or cannot be read."""
+        try:
+            async with self.get_s3_client() as s3:
+                response = await s3.head_object(Bucket=self.bucket_name, Key=object_name)
+                object_metadata_cache.record_present(
+                    self.bucket_name, object_name, response.get("ETag"), response.get("ContentLength")
+                )
+                return response.get("ETag")
+        except Exception as e:
+            logger.error("Error reading S3 object ETag: %s", e)
+            return None
+
+    @observe_storage_operation("s3", "copy")
+    async def copy_object(self, source_key: str, destination_key: str, size: Optional[int] = None) -> bool:
         """
         Copies an object from source_key to destination_key within the same bucket.
-        Returns True if successful, otherwise False.
+        Objects larger than S3_MAX_COPY_OBJECT_SIZE (size from the caller or object_metadata_cache)
+        are copied with multipart UploadPartCopy. Returns True if successful, otherwise False.
         """
+        if size is None:
+            cached = object_metadata_cache.get(self.bucket_name, source_key)
+            size = cached.size if cached is not None else None
         try:
             async with self.get_s3_client() as s3:
                 copy_source = {"Bucket": self.bucket_name, "Key": source_key}
-                await s3.copy_object(Bucket=self.bucket_name, CopySource=copy_source, Key=destination_key)
+                if size is not None and size > S3_MAX_COPY_OBJECT_SIZE:
+                    etag = await self._multipart_copy(s3, copy_source, destination_key, size)
+                else:
+                    response = await s3.copy_object(Bucket=self.bucket_name, CopySource=copy_source, Key=destination_key)
+                    etag = response.get("CopyObjectResult", {}).get("ETag")
+            await _invalidate_workbook_cache(destination_key)
+            object_metadata_cache.record_present(self.bucket_name, destination_key, etag, size)
             return True
         except Exception as e:
-            logger.error(f"Copy object in S3 failed: {e}")
+            logger.error("Copy object in S3 failed: %s", e)
             return False
 
+    async def _multipart_copy(self, s3, copy_source: Dict[str, str], destination_key: str, size: int) -> Optional[str]:
+        response = await s3.create_multipart_upload(Bucket=self.bucket_name, Key=destination_key)
+        upload_id = response["UploadId"]
+        try:
+            async def copy_part(part_number: int, start: int) -> Dict[str, Any]:
+                end = min(start + S3_COPY_PART_SIZE, size) - 1
+                part = await s3.upload_part_copy(
+                    Bucket=self.bucket_name, Key=destination_key, UploadId=upload_id, PartNumber=part_number,
+                    CopySource=copy_source, CopySourceRange=f"bytes={start}-{end}"
+                )
+                return {"ETag": part["CopyPartResult"]["ETag"], "PartNumber": part_number}
+
+            parts = await asyncio.gather(*(
+                copy_part(index + 1, start) for index, start in enumerate(range(0, size, S3_COPY_PART_SIZE))
+            ))
+            completed = await s3.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=destination_key, UploadId=upload_id,
+                MultipartUpload={"Parts": list(parts)}
+            )
+            return completed.get("ETag")
+        except BaseException:
+            await s3.abort_multipart_upload(Bucket=self.bucket_name, Key=destination_key, UploadId=upload_id)
+            raise
+
+    @observe_storage_operation("s3", "delete")
     async def delete_object(self, object_key: str) -> bool:
         """
         Deletes an object from the S3 bucket.
@@ -151,11 +273,85 @@ class S3Config(BaseSettings):
         try:
             async with self.get_s3_client() as s3:
                 await s3.delete_object(Bucket=self.bucket_name, Key=object_key)
+            await _invalidate_workbook_cache(object_key)
+            presigned_url_cache.invalidate(self.bucket_name, object_key)
+            object_metadata_cache.record_absent(self.bucket_name, object_key)
             return True
         except Exception as e:
-            logger.error(f"Delete object from S3 failed: {e}")
+            logger.error("Delete object from S3 failed: %s", e)
             return False
 
+    @observe_storage_operation("s3", "delete_batch")
+    async def delete_objects(self, object_keys: List[str]) -> List[str]:
+        """
+        Deletes objects with DeleteObjects, S3_DELETE_BATCH_SIZE keys per call.
+        Returns the keys that could not be deleted.
+        """
+        failed = []
+        async with self.get_s3_client() as s3:
+            for start in range(0, len(object_keys), S3_DELETE_BATCH_SIZE):
+                batch = object_keys[start:start + S3_DELETE_BATCH_SIZE]
+                try:
+                    response = await s3.delete_objects(
+                        Bucket=self.bucket_name,
+                        Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+                    )
+                    errors = {error["Key"] for error in response.get("Errors", [])}
+                except Exception as e:
+                    logger.error("Batch delete from S3 failed: %s", e)
+                    errors = set(batch)
+                deleted = [key for key in batch if key not in errors]
+                failed.extend(key for key in batch if key in errors)
+                for key in deleted:
+                    presigned_url_cache.invalidate(self.bucket_name, key)
+                    object_metadata_cache.record_absent(self.bucket_name, key)
+                await _invalidate_workbook_cache(*deleted)
+        return failed
+
+    @observe_storage_operation("s3", "list")
+    async def list_objects(self, prefix: str) -> Dict[str, int]:
+        """Returns {key: size} for every object under prefix."""
+        objects = {}
+        async with self.get_s3_client() as s3:
+            paginator = s3.get_paginator("list_objects_v2")
+            async for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                for obj in page.get("Contents", []):
+                    objects[obj["Key"]] = obj["Size"]
+                    object_metadata_cache.record_present(self.bucket_name, obj["Key"], obj.get("ETag"), obj["Size"])
+        return objects
+
+    @observe_storage_operation("s3", "read_json")
+    async def read_json(self, object_name: str) -> Optional[Any]:
+        """Returns a small JSON document from the bucket, or None if it does not exist."""
+        try:
+            async with self.get_s3_client() as s3:
+                response = await s3.get_object(Bucket=self.bucket_name, Key=object_name)
+                return json.loads(await response["Body"].read())
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            raise
+
+    @observe_storage_operation("s3", "write_json")
+    async def write_json(self, object_name: str, data: Any) -> None:
+        async with self.get_s3_client() as s3:
+            response = await s3.put_object(
+                Bucket=self.bucket_name, Key=object_name,
+                Body=json.dumps(data).encode("utf-8"), ContentType="application/json"
+            )
+        object_metadata_cache.record_present(self.bucket_name, object_name, response.get("ETag"))
+
+    async def rename_prefix(self, source_prefix: str, destination_prefix: str, job_id: Optional[str] = None) -> Dict[str, Any]:
+        """Moves every object under source_prefix with server-side copies; see storage_move.move_prefix."""
+        from app.core.storage_move import move_prefix
+        return await move_prefix(self, source_prefix, destination_prefix, job_id)
+
+    async def rename_object(self, source_key: str, destination_key: str) -> bool:
+        """Moves the single object at source_key; see storage_move.move_object."""
+        from app.core.storage_move import move_object
+        return await move_object(self, source_key, destination_key)
+
+    @observe_storage_operation("s3", "download")
     async def download_file(self, object_name: str, file_path: str) -> None:
         """Downloads an object from S3 to a local file."""
         try:
@@ -163,23 +359,43 @@ class S3Config(BaseSettings):
             async with self.get_s3_client() as s3:
                 async with aiofiles.open(file_path, "wb") as f:
                     await s3.download_fileobj(self.bucket_name, object_name, f)
+            record_storage_bytes("s3", "download", os.path.getsize(file_path))
         except Exception as e:
             raise BadRequestError(
                 status_code=404,
                 detail=f"Failed to download file from s3: {str(e)}"
             )
 
+    def _get_presign_client(self):
+        # Presigning is local signing work, so one plain botocore client replaces an aioboto3 session per URL.
+        if self._presign_client is None:
+            self._presign_client = botocore.session.get_session().create_client(
+                "s3",
+                region_name=self.region_name,
+                aws_access_key_id=self.aws_access_key_id,
+                aws_secret_access_key=self.aws_secret_access_key,
+                endpoint_url=self.endpoint_url,
+            )
+        return self._presign_client
+
     async def generate_presigned_url(self, object_key: str, expiration: int = 3600) -> Optional[str]:
         try:
-            async with self.get_s3_client() as s3_client:
-                return await s3_client.generate_presigned_url(
+            url = presigned_url_cache.get(self.bucket_name, object_key, expiration)
+            if url is None:
+                url = self._get_presign_client().generate_presigned_url(
                     ClientMethod="get_object",
                     Params={"Bucket": self.bucket_name, "Key": object_key},
                     ExpiresIn=expiration,
                 )
+                presigned_url_cache.set(self.bucket_name, object_key, expiration, url)
+            return url
         except Exception as e:
-            logger.error(f"Error generating presigned URL: {e}")
+            logger.error("Error generating presigned URL: %s", e)
             return None
+
+    async def generate_presigned_urls(self, object_keys: List[str], expiration: int = 3600) -> Dict[str, Optional[str]]:
+        """Signs many keys at once (e.g. a listing page) with the shared client and cache."""
+        return {key: await self.generate_presigned_url(key, expiration) for key in object_keys}
         
     @staticmethod
     def extract_s3_key(filepath: str, bucket_name: str) -> str:
@@ -253,13 +469,13 @@ class S3Config(BaseSettings):
                             )
                         return [str(local_file_path)]
                     except Exception as error:
-                        logger.exception(f"S3 download error: {error}")
+                        logger.exception("S3 download error: %s", error)
                         raise HTTPException(
                             status_code=HTTP_STATUS_INTERNAL_ERROR,
                             detail=MSG_S3_DOWNLOAD_FAILED
                         )
             except Exception as s3_error:
-                logger.exception(f"Local setup error: {s3_error}")
+                logger.exception("Local setup error: %s", s3_error)
                 raise HTTPException(status_code = HTTP_STATUS_INTERNAL_ERROR,
                                     detail = MSG_S3_FETCH_ERROR)
             
@@ -293,7 +509,7 @@ class S3Config(BaseSettings):
                 )
 
                 if "Contents" not in response or not response["Contents"]:
-                    logger.warning(f"No files found at S3 prefix: {s3_input_prefix}")
+                    logger.warning("No files found at S3 prefix: %s", s3_input_prefix)
                     return []
 
                 for obj in response["Contents"]:
@@ -313,15 +529,15 @@ class S3Config(BaseSettings):
                             async for chunk in response_stream["Body"]:
                                 await f.write(chunk)
                         downloaded_files.append(local_file_path)
-                        logger.info(f"Downloaded {file_key} to {local_file_path}")
+                        logger.info("Downloaded %s to %s", file_key, local_file_path)
 
                     except Exception as e:
-                        logger.error(f"Failed to download {file_key}: {e}")
+                        logger.error("Failed to download %s: %s", file_key, e)
 
             return downloaded_files
 
         except Exception as err:
-            logger.exception(f"Failed to download semantic input files from {s3_input_prefix}: {err}")
+            logger.exception("Failed to download semantic input files from %s: %s", s3_input_prefix, err)
             raise HTTPException(status_code=500, detail="Failed to download semantic model input files from S3")
     
     async def copy_all_folder_files_to_local_path(
@@ -342,7 +558,7 @@ class S3Config(BaseSettings):
                 async for result in paginator.paginate(Bucket=self.bucket_name, Prefix=s3_folder_prefix.rstrip("/") + "/"):
                     contents = result.get("Contents", [])
                     if not contents:
-                        logger.warning(f"No files found in S3 folder: {s3_folder_prefix}")
+                        logger.warning("No files found in S3 folder: %s", s3_folder_prefix)
                         return []
                     for obj in contents:
                         file_key = obj["Key"]
@@ -354,12 +570,12 @@ class S3Config(BaseSettings):
                                 async for chunk in obj_body["Body"]:
                                     await local_file.write(chunk)
                             downloaded_files.append(local_file_path)
-                            logger.info(f"Copied {file_key} to {local_file_path}")
+                            logger.info("Copied %s to %s", file_key, local_file_path)
                         except Exception as e:
-                            logger.error(f"Failed to download {file_key} from S3: {e}")
+                            logger.error("Failed to download %s from S3: %s", file_key, e)
             return downloaded_files
         except Exception as e:
-            logger.error(f"Error copying files from S3 folder {s3_folder_prefix}: {e}")
+            logger.error("Error copying files from S3 folder %s: %s", s3_folder_prefix, e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error in downloading files to local path: {str(e)}"
@@ -371,10 +587,19 @@ class S3Config(BaseSettings):
 class BlobConfig(BaseSettings):
     connection_string: str = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
     container_name: str = os.getenv("AZURE_BLOB_CONTAINER_NAME")
+    _account_name: Optional[str] = PrivateAttr(default=None)
+    _account_key: Optional[str] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        # Parse the connection string once; SAS generation needs the account name and key.
+        conn_str_dict = dict(item.split('=', 1) for item in (self.connection_string or "").split(';') if '=' in item)
+        self._account_name = conn_str_dict.get('AccountName')
+        self._account_key = conn_str_dict.get('AccountKey')
  
     def get_blob_client(self):
         return BlobServiceClient.from_connection_string(self.connection_string)
                 
+    @observe_storage_operation("blob", "upload")
     async def upload_to_blob(self, file_path: str, object_name: str) -> bool:
         try:
             try:
@@ -384,19 +609,75 @@ class BlobConfig(BaseSettings):
                     blob=object_name
                 )
                 with open(file_path, "rb") as f:
-                    await blob_client.upload_blob(f, overwrite=True)
+                    result = await blob_client.upload_blob(f, overwrite=True)
+                await _invalidate_workbook_cache(object_name)
+                size = os.path.getsize(file_path)
+                object_metadata_cache.record_present(self.container_name, object_name, result.get("etag"), size)
+                record_storage_bytes("blob", "upload", size)
+                return True
+            finally:
+                await blob_service_client.close()
+        except Exception as e:
+            logger.error("Upload to Blob failed: %s", e)
+            return False
+
+    @observe_storage_operation("blob", "upload_stream")
+    async def upload_stream(self, chunks, object_name: str) -> bool:
+        """
+        Uploads an async iterable of byte chunks as staged blocks and commits the block list.
+        Application errors raised by the iterator (e.g. size limits) propagate; uncommitted blocks are discarded by Azure.
+        """
+        try:
+            try:
+                blob_service_client = self.get_blob_client()
+                blob_client = blob_service_client.get_blob_client(
+                    container=self.container_name,
+                    blob=object_name
+                )
+                block_ids = []
+                buffer = bytearray()
+                total_size = 0
+
+                async def stage_block():
+                    block_id = base64.b64encode(f"{len(block_ids):08d}".encode()).decode()
+                    await blob_client.stage_block(block_id=block_id, data=bytes(buffer))
+                    block_ids.append(BlobBlock(block_id=block_id))
+                    buffer.clear()
+
+                async for chunk in chunks:
+                    buffer.extend(chunk)
+                    total_size += len(chunk)
+                    if len(buffer) >= UPLOAD_PART_SIZE:
+                        await stage_block()
+                if buffer or not block_ids:
+                    await stage_block()
+                result = await blob_client.commit_block_list(block_ids)
+                await _invalidate_workbook_cache(object_name)
+                object_metadata_cache.record_present(self.container_name, object_name, result.get("etag"), total_size)
+                record_storage_bytes("blob", "upload", total_size)
                 return True
             finally:
                 await blob_service_client.close()
+        except BaseAppException:
+            raise
         except Exception as e:
-            logger.error(f"Upload to Blob failed: {e}")
+            logger.error("Block upload to Blob failed: %s", e)
             return False
 
     async def check_file_exists(self, object_name: str) -> bool:
         """
         Checks whether an object exists in the Blob container.
         Returns True if it exists, False if not found, raises exception for other errors.
+        Recent uploads, deletes and property lookups are answered from object_metadata_cache.
         """
+        cached = object_metadata_cache.get(self.container_name, object_name)
+        if cached is not None:
+            return cached.exists
+        return await self._head_exists(object_name)
+
+    # Timed separately from check_file_exists so cache hits do not count as HEAD latency.
+    @observe_storage_operation("blob", "head", false_is_error=False)
+    async def _head_exists(self, object_name: str) -> bool:
         try:
             try:
                 blob_service_client = self.get_blob_client()
@@ -404,19 +685,43 @@ class BlobConfig(BaseSettings):
                     container=self.container_name, 
                     blob=object_name
                 )
-                await blob_client.get_blob_properties()
+                properties = await blob_client.get_blob_properties()
+                object_metadata_cache.record_present(self.container_name, object_name, properties.etag, properties.size)
                 return True
             finally:
                 await blob_service_client.close()
         except ResourceNotFoundError:
+            object_metadata_cache.record_absent(self.container_name, object_name)
             return False
         except Exception as e:
-            logger.error(f"Error checking Blob file existence: {str(e)}")
+            logger.error("Error checking Blob file existence: %s", e)
             raise
 
-    async def copy_object(self, source_key: str, destination_key: str) -> bool:
+    @observe_storage_operation("blob", "head", none_is_error=True)
+    async def get_object_etag(self, object_name: str) -> Optional[str]:
+        """Returns the blob's ETag, or None if it does not exist or cannot be read."""
+        try:
+            try:
+                blob_service_client = self.get_blob_client()
+                blob_client = blob_service_client.get_blob_client(
+                    container=self.container_name,
+                    blob=object_name
+                )
+                properties = await blob_client.get_blob_properties()
+                object_metadata_cache.record_present(self.container_name, object_name, properties.etag, properties.size)
+                return properties.etag
+            finally:
+                await blob_service_client.close()
+        except Exception as e:
+            logger.error("Error reading Blob ETag: %s", e)
+            return None
+
+    @observe_storage_operation("blob", "copy")
+    async def copy_object(self, source_key: str, destination_key: str, size: Optional[int] = None, wait: bool = False) -> bool:
         """
         Copies an object from source_key to destination_key within the same container.
+        With wait=True the server-side copy is polled until it finishes (up to BLOB_COPY_WAIT_SECONDS),
+        so the source can be deleted safely afterwards. size is accepted for parity with S3Config.
         Returns True if successful, otherwise False.
         """
         try:
@@ -433,14 +738,28 @@ class BlobConfig(BaseSettings):
                 
                 # Get the source blob URL
                 source_url = source_blob_client.url
-                await destination_blob_client.start_copy_from_url(source_url)
+                copy = await destination_blob_client.start_copy_from_url(source_url)
+                if wait and copy.get("copy_status") != "success":
+                    waited = 0
+                    properties = await destination_blob_client.get_blob_properties()
+                    while properties.copy.status == "pending" and waited < BLOB_COPY_WAIT_SECONDS:
+                        await asyncio.sleep(1)
+                        waited += 1
+                        properties = await destination_blob_client.get_blob_properties()
+                    if properties.copy.status != "success":
+                        logger.error("Copy object in Blob did not complete: %s (%s)", source_key, properties.copy.status)
+                        return False
+                await _invalidate_workbook_cache(destination_key)
+                # The server-side copy may still be pending, so the destination's state is left unknown.
+                object_metadata_cache.invalidate(self.container_name, destination_key)
                 return True
             finally:
                 await blob_service_client.close()
         except Exception as e:
-            logger.error(f"Copy object in Blob failed: {e}")
+            logger.error("Copy object in Blob failed: %s", e)
             return False
 
+    @observe_storage_operation("blob", "delete")
     async def delete_object(self, object_key: str) -> bool:
         """
         Deletes an object from the Blob container.
@@ -454,13 +773,95 @@ class BlobConfig(BaseSettings):
                     blob=object_key
                 )
                 await blob_client.delete_blob()
+                await _invalidate_workbook_cache(object_key)
+                presigned_url_cache.invalidate(self.container_name, object_key)
+                object_metadata_cache.record_absent(self.container_name, object_key)
                 return True
             finally:
                 await blob_service_client.close()
         except Exception as e:
-            logger.error(f"Delete object from Blob failed: {e}")
+            logger.error("Delete object from Blob failed: %s", e)
             return False
 
+    @observe_storage_operation("blob", "delete_batch")
+    async def delete_objects(self, object_keys: List[str]) -> List[str]:
+        """
+        Deletes blobs with batch requests of BLOB_DELETE_BATCH_SIZE.
+        Returns the keys that could not be deleted; already missing blobs count as deleted.
+        """
+        failed = []
+        blob_service_client = self.get_blob_client()
+        try:
+            container_client = blob_service_client.get_container_client(self.container_name)
+            for start in range(0, len(object_keys), BLOB_DELETE_BATCH_SIZE):
+                batch = object_keys[start:start + BLOB_DELETE_BATCH_SIZE]
+                try:
+                    responses = await container_client.delete_blobs(*batch, raise_on_any_failure=False)
+                    statuses = [response.status_code async for response in responses]
+                except Exception as e:
+                    logger.error("Batch delete from Blob failed: %s", e)
+                    statuses = [None] * len(batch)
+                deleted = []
+                for key, status_code in zip(batch, statuses):
+                    if status_code not in (202, 404):
+                        failed.append(key)
+                        continue
+                    deleted.append(key)
+                    presigned_url_cache.invalidate(self.container_name, key)
+                    object_metadata_cache.record_absent(self.container_name, key)
+                await _invalidate_workbook_cache(*deleted)
+        finally:
+            await blob_service_client.close()
+        return failed
+
+    @observe_storage_operation("blob", "list")
+    async def list_objects(self, prefix: str) -> Dict[str, int]:
+        """Returns {name: size} for every blob under prefix."""
+        objects = {}
+        blob_service_client = self.get_blob_client()
+        try:
+            container_client = blob_service_client.get_container_client(self.container_name)
+            async for blob in container_client.list_blobs(name_starts_with=prefix):
+                objects[blob.name] = blob.size
+                object_metadata_cache.record_present(self.container_name, blob.name, blob.etag, blob.size)
+        finally:
+            await blob_service_client.close()
+        return objects
+
+    @observe_storage_operation("blob", "read_json")
+    async def read_json(self, object_name: str) -> Optional[Any]:
+        """Returns a small JSON document from the container, or None if it does not exist."""
+        blob_service_client = self.get_blob_client()
+        try:
+            blob_client = blob_service_client.get_blob_client(container=self.container_name, blob=object_name)
+            download_stream = await blob_client.download_blob()
+            return json.loads(await download_stream.readall())
+        except ResourceNotFoundError:
+            return None
+        finally:
+            await blob_service_client.close()
+
+    @observe_storage_operation("blob", "write_json")
+    async def write_json(self, object_name: str, data: Any) -> None:
+        blob_service_client = self.get_blob_client()
+        try:
+            blob_client = blob_service_client.get_blob_client(container=self.container_name, blob=object_name)
+            result = await blob_client.upload_blob(json.dumps(data).encode("utf-8"), overwrite=True)
+            object_metadata_cache.record_present(self.container_name, object_name, result.get("etag"))
+        finally:
+            await blob_service_client.close()
+
+    async def rename_prefix(self, source_prefix: str, destination_prefix: str, job_id: Optional[str] = None) -> Dict[str, Any]:
+        """Moves every blob under source_prefix with server-side copies; see storage_move.move_prefix."""
+        from app.core.storage_move import move_prefix
+        return await move_prefix(self, source_prefix, destination_prefix, job_id, copy_options={"wait": True})
+
+    async def rename_object(self, source_key: str, destination_key: str) -> bool:
+        """Moves the single blob at source_key; see storage_move.move_object."""
+        from app.core.storage_move import move_object
+        return await move_object(self, source_key, destination_key, copy_options={"wait": True})
+
+    @observe_storage_operation("blob", "download")
     async def download_file(self, object_name: str, file_path: str) -> None:
         """Downloads an object from Blob to a local file."""
         try:
@@ -475,6 +876,7 @@ class BlobConfig(BaseSettings):
                     download_stream = await blob_client.download_blob()
                     async for chunk in download_stream.chunks():
                         await f.write(chunk)
+                record_storage_bytes("blob", "download", os.path.getsize(file_path))
             finally:
                 await blob_service_client.close()
         except Exception as e:
@@ -485,9 +887,12 @@ class BlobConfig(BaseSettings):
 
     async def generate_presigned_url(self, object_key: str, expiration: int = 3600) -> Optional[str]:
         try:
-            conn_str_dict = dict(item.split('=', 1) for item in self.connection_string.split(';') if '=' in item)
-            account_name = conn_str_dict.get('AccountName')
-            account_key = conn_str_dict.get('AccountKey')
+            cached_url = presigned_url_cache.get(self.container_name, object_key, expiration)
+            if cached_url is not None:
+                return cached_url
+
+            account_name = self._account_name
+            account_key = self._account_key
             
             if not account_name or not account_key:
                 logger.error("Could not extract account credentials from connection string for SAS generation")
@@ -509,12 +914,17 @@ class BlobConfig(BaseSettings):
             
             encoded_blob_name = quote(object_key, safe='/')
             blob_url = f"https://{account_name}.blob.core.windows.net/{self.container_name}/{encoded_blob_name}?{sas_token}"
+            presigned_url_cache.set(self.container_name, object_key, expiration, blob_url, start_time.timestamp())
             return blob_url
             
         except Exception as e:
-            logger.error(f"Error generating presigned URL for Azure Blob: {e}")
+            logger.error("Error generating presigned URL for Azure Blob: %s", e)
             return None
         
+    async def generate_presigned_urls(self, object_keys: List[str], expiration: int = 3600) -> Dict[str, Optional[str]]:
+        """Signs many keys at once (e.g. a listing page); SAS tokens are computed locally."""
+        return {key: await self.generate_presigned_url(key, expiration) for key in object_keys}
+
     @staticmethod
     def extract_blob_key(filepath: str, container_name: str) -> str:
         return filepath.replace(f"blob://{container_name}/", "")
@@ -598,7 +1008,7 @@ class BlobConfig(BaseSettings):
                                 await local_file.write(chunk)
                         return [str(local_file_path)]
                     except Exception as error:
-                        logger.exception(f"Blob download error: {error}")
+                        logger.exception("Blob download error: %s", error)
                         raise HTTPException(
                             status_code=HTTP_STATUS_INTERNAL_ERROR,
                             detail=MSG_S3_DOWNLOAD_FAILED
@@ -606,7 +1016,7 @@ class BlobConfig(BaseSettings):
                 finally:
                     await blob_service_client.close()
             except Exception as blob_error:
-                logger.exception(f"Local setup error: {blob_error}")
+                logger.exception("Local setup error: %s", blob_error)
                 raise HTTPException(status_code = HTTP_STATUS_INTERNAL_ERROR,
                                     detail = MSG_S3_FETCH_ERROR)
             
@@ -640,7 +1050,7 @@ class BlobConfig(BaseSettings):
                 blob_files = list(blob_list)
 
                 if not blob_files:
-                    logger.warning(f"No files found at Blob prefix: {blob_input_prefix}")
+                    logger.warning("No files found at Blob prefix: %s", blob_input_prefix)
                     return []
 
                 for blob in blob_files:
@@ -664,16 +1074,16 @@ class BlobConfig(BaseSettings):
                             async for chunk in download_stream.chunks():
                                 await f.write(chunk)
                         downloaded_files.append(local_file_path)
-                        logger.info(f"Downloaded {file_key} to {local_file_path}")
+                        logger.info("Downloaded %s to %s", file_key, local_file_path)
 
                     except Exception as e:
-                        logger.error(f"Failed to download {file_key}: {e}")
+                        logger.error("Failed to download %s: %s", file_key, e)
 
                 return downloaded_files
             finally:
                 await blob_service_client.close()
         except Exception as err:
-            logger.exception(f"Failed to download semantic input files from {blob_input_prefix}: {err}")
+            logger.exception("Failed to download semantic input files from %s: %s", blob_input_prefix, err)
             raise HTTPException(status_code=500, detail="Failed to download semantic model input files from Blob")
     
     async def copy_all_folder_files_to_local_path(
@@ -697,7 +1107,7 @@ class BlobConfig(BaseSettings):
                     blob_files.append(blob)
 
                 if not blob_files:
-                    logger.warning(f"No files found in Blob folder: {blob_folder_key}")
+                    logger.warning("No files found in Blob folder: %s", blob_folder_key)
                     return []
                 for blob in blob_files:
                     file_key = blob.name
@@ -707,16 +1117,16 @@ class BlobConfig(BaseSettings):
                     try:
                         await self.download_file(file_key, local_file_path)
                         downloaded_files.append(local_file_path)
-                        logger.info(f"Copied {file_key} to {local_file_path}")
+                        logger.info("Copied %s to %s", file_key, local_file_path)
                     except Exception as e:
-                        logger.error(f"Failed to download {file_key} from blob: {e}")
+                        logger.error("Failed to download %s from blob: %s", file_key, e)
 
                 return downloaded_files
             finally:
                 await blob_service_client.close()
 
         except Exception as e:
-            logger.error(f"Error copying files from blob folder {blob_folder_key}: {e}")
+            logger.error("Error copying files from blob folder %s: %s", blob_folder_key, e)
             raise HTTPException(status_code=500, detail="Error occured in Images downloading to the local path")
 
 
@@ -728,6 +1138,9 @@ class OpenAIConfig(BaseSettings):
 
     def get_openai_client(self):
         return OpenAI(api_key=self.api_key)
+
+    def get_async_openai_client(self):
+        return AsyncOpenAI(api_key=self.api_key)
     
 
 class AzureOpenAIConfig(BaseSettings):
@@ -744,6 +1157,13 @@ class AzureOpenAIConfig(BaseSettings):
             azure_endpoint=self.azure_endpoint
         )
 
+    def get_async_openai_client(self):
+        return AsyncAzureOpenAI(
+            api_key=self.api_key,
+            api_version=self.api_version,
+            azure_endpoint=self.azure_endpoint
+        )
+
 
 class DBConfig:
     db_uri = os.getenv("DB_URI")
@@ -761,6 +1181,58 @@ class JWTConfig(BaseSettings):
 ACCESS_TOKEN_EXPIRY = int(os.getenv("ACCESS_TOKEN_EXPIRY", 500))  # in minutes
 REFRESH_TOKEN_EXPIRY = int(os.getenv("REFRESH_TOKEN_EXPIRY", 60 * 3)) # in minutes
 
+WORKBOOK_DOWNLOAD_CONCURRENCY = int(os.getenv("WORKBOOK_DOWNLOAD_CONCURRENCY", 4))  # per Tableau server
+WORKBOOK_DOWNLOAD_TIMEOUT = int(os.getenv("WORKBOOK_DOWNLOAD_TIMEOUT", 60 * 30))  # in seconds
+
+USAGE_STATS_MAX_CONCURRENCY = int(os.getenv("USAGE_STATS_MAX_CONCURRENCY", 16))  # per Tableau server
+USAGE_STATS_CACHE_TTL = int(os.getenv("USAGE_STATS_CACHE_TTL", 60 * 15))  # in seconds
+USAGE_STATS_CACHE_SIZE = int(os.getenv("USAGE_STATS_CACHE_SIZE", 50000))  # workbooks kept per worker
+
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 5 * 1024 * 1024 * 1024))  # in bytes
+ZIP_UPLOAD_CONCURRENCY = int(os.getenv("ZIP_UPLOAD_CONCURRENCY", 8))  # concurrent uploads per zip
+TWB_PRUNE_THRESHOLD = int(os.getenv("TWB_PRUNE_THRESHOLD", 50 * 1024 * 1024))  # in bytes of .twb XML
+TWB_TRACE_MEMORY = os.getenv("TWB_TRACE_MEMORY", "false").lower().strip() == "true"  # tracemalloc per parse; slows it
+WORKBOOK_CACHE_DIR = os.getenv("WORKBOOK_CACHE_DIR", "./cache/workbooks")
+WORKBOOK_CACHE_MAX_BYTES = int(os.getenv("WORKBOOK_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))  # in bytes
+WORKBOOK_CACHE_MIN_AGE = int(os.getenv("WORKBOOK_CACHE_MIN_AGE", 60 * 10))  # seconds a used blob is safe from eviction
+
+# Kept out of ./storage, which other code removes wholesale.
+SCRATCH_ROOT = os.getenv("SCRATCH_ROOT", "./scratch/jobs")
+SCRATCH_TMPFS_ROOT = os.getenv("SCRATCH_TMPFS_ROOT")  # e.g. /dev/shm/biport; unset disables tmpfs workspaces
+SCRATCH_QUOTA_BYTES = int(os.getenv("SCRATCH_QUOTA_BYTES", 20 * 1024 * 1024 * 1024))  # in bytes, per root
+SCRATCH_USAGE_TTL = int(os.getenv("SCRATCH_USAGE_TTL", 5))  # seconds a measured root size is reused
+
+COMPUTE_POOL_WORKERS = int(os.getenv("COMPUTE_POOL_WORKERS", os.cpu_count() or 2))
+COMPUTE_POOL_MAX_QUEUE = int(os.getenv("COMPUTE_POOL_MAX_QUEUE", 4 * (os.cpu_count() or 2)))  # running + waiting tasks
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))  # in-flight completions per worker
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", 150000))  # prompt + completion budget
+LLM_BATCH_TOKEN_LIMIT = int(os.getenv("LLM_BATCH_TOKEN_LIMIT", 6000))  # formula tokens packed per request
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 5))
+
+POWERBI_TEMPLATE_CACHE_DIR = os.getenv("POWERBI_TEMPLATE_CACHE_DIR", "./cache/powerbi_template")
+POWERBI_TEMPLATE_REVALIDATE_SECONDS = int(os.getenv("POWERBI_TEMPLATE_REVALIDATE_SECONDS", 300))  # ETag check interval
+POWERBI_TEMPLATE_RETAIN_SECONDS = int(os.getenv("POWERBI_TEMPLATE_RETAIN_SECONDS", 3600))  # superseded versions kept this long
+
+POWER_QUERY_CACHE_DIR = os.getenv("POWER_QUERY_CACHE_DIR", "./cache/power_query")
+POWER_QUERY_CACHE_MAX_BYTES = int(os.getenv("POWER_QUERY_CACHE_MAX_BYTES", 256 * 1024 * 1024))  # in bytes
+POWER_QUERY_LEVEL_CONCURRENCY = int(os.getenv("POWER_QUERY_LEVEL_CONCURRENCY", 8))  # nodes generated at once per level
+TMDL_WRITE_CONCURRENCY = int(os.getenv("TMDL_WRITE_CONCURRENCY", 16))  # files written at once
+DATE_TABLE_MODE = os.getenv("DATE_TABLE_MODE", "local").lower().strip()  # "local" (one per date column) | "shared"
+
+# Bearer token Prometheus sends to GET /metrics; unset, the endpoint refuses every request.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+PRESIGNED_URL_CACHE_SIZE = int(os.getenv("PRESIGNED_URL_CACHE_SIZE", 10000))  # signed URLs kept per worker
+presigned_url_cache = PresignedUrlCache(max_entries=PRESIGNED_URL_CACHE_SIZE)
+# Close to the absent TTL: another worker may delete or overwrite a key this process saw.
+OBJECT_METADATA_TTL = int(os.getenv("OBJECT_METADATA_TTL", 30))  # seconds a known-present key is trusted
+OBJECT_ABSENT_TTL = int(os.getenv("OBJECT_ABSENT_TTL", 15))  # seconds a known-absent key is trusted
+object_metadata_cache = ObjectMetadataCache(present_ttl=OBJECT_METADATA_TTL, absent_ttl=OBJECT_ABSENT_TTL)
+STORAGE_COPY_CONCURRENCY = int(os.getenv("STORAGE_COPY_CONCURRENCY", 16))  # server-side copies in flight per prefix move
+# How long a synchronous report delete waits for its archive move; above BLOB_COPY_WAIT_SECONDS per object.
+STORAGE_MOVE_TIMEOUT = int(os.getenv("STORAGE_MOVE_TIMEOUT", 1800))
+
 
 class TableauConfig(BaseSettings):
     server_url: str = os.getenv("TABLEAU_SERVER_URL")
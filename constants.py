@@ -110,6 +110,15 @@ LOCAL_DIR = "static"
 LOCAL_DOWNLOAD_PATH = "./storage/{organization_name}/{user_email}/{process_id}/twb_files"
 LOCAL_WORKBOOKS_DOWNLOAD_PATH = "./storage/My_workspace/workbooks/{workbook_id}/twb_files"
 MAX_UPLOAD_RETRIES = 3
+MAX_DOWNLOAD_RETRIES = 5
+UPLOAD_READ_CHUNK_SIZE = 1024 * 1024
+UPLOAD_PART_SIZE = 8 * 1024 * 1024  # S3 multipart parts must be at least 5 MB
+S3_MAX_COPY_OBJECT_SIZE = 5 * 1024 * 1024 * 1024  # larger objects need multipart UploadPartCopy
+S3_COPY_PART_SIZE = 512 * 1024 * 1024
+S3_DELETE_BATCH_SIZE = 1000  # DeleteObjects limit
+BLOB_DELETE_BATCH_SIZE = 256  # blob batch delete limit
+BLOB_COPY_WAIT_SECONDS = 600  # how long a waited-for server-side blob copy may stay pending
+STORAGE_MOVE_MANIFEST_PATH = "BI-Portfinal/_jobs/prefix_moves/{job_id}.json"
 MIGRATE_OUTPUT_DIR = "My_workspace/workbooks/migrate_outputs"
 MIGRATE_REPORT_TYPE = "migrated_files"
 MSG_S3_DOWNLOAD_FAILED = "Failed to download file from S3."
@@ -214,6 +223,22 @@ Return ONLY a JSON array. No markdown, no commentary.
 - Is the output valid JSON? -> **FIX IT**: Ensure escaping of quotes.
 """
 
+# Variant for callers that send pipe-encoded metadata (prompt_context.metadata_for_formulas,
+# as dax_graph does); callers of the prompt above attach JSON, pruned with
+# prompt_context.json_metadata_for_formulas.
+OPENAI_PBI_PIPE_PROMPT = OPENAI_PBI_PROMPT.replace(
+    "[JSON SCHEMA ATTACHED AT RUNTIME]",
+    "[ATTACHED AT RUNTIME: pipe-separated table, header row of keys, one row per referenced column]"
+)
+
+# Appended to the DAX user message when earlier dependency levels are already converted.
+DAX_CONVERTED_REFERENCES_NOTE = """
+### C. ALREADY CONVERTED FIELDS
+The fields below are already defined in the model. This overrides SECTION 3 for these fields only:
+do NOT inline their logic. Reference a measure by its naked name [Caption] and a column as 'Table'[Caption].
+{converted_fields}
+"""
+
 PATCH = "PATCH"
 
 HTTP_STATUS_OK = 200
@@ -250,6 +275,9 @@ PROJECTS_URL = "{server_url}/api/{version}/sites/{site_id}/projects"
 RETRY_BACKOFF_BASE = 2
 
 POWER_BI_PATH = "Prep_files/powerbi/Superstore_prep.zip"
+# Binary template assets nothing in the prep pipeline writes; overlays hardlink these and
+# copy every other file, so no edit can reach the shared template.
+POWERBI_TEMPLATE_LINK_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".svg", ".ttf", ".otf", ".woff", ".woff2")
 
 # S3 endpoint template
 S3_ENDPOINT_FORMAT = "https://s3.{region}.amazonaws.com"
@@ -290,9 +318,20 @@ STORAGE_BASE_DIR = Path("./storage")
 TABLEAU_VERSION = '3.25'
 TOO_MANY_FILES = "You are allowed for only {remaining_allowed_files} file(s) for migration"
 WORKBOOK_DOWNLOAD_URL = "{server_url}/api/{version}/sites/{site_id}/workbooks/{workbook_id}/content"
+WORKBOOK_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+WORKBOOK_PARTIAL_SUFFIX = ".part"
+WORKBOOK_VALIDATOR_SUFFIX = ".validator"  # ETag/Last-Modified of a .part, sent as If-Range on resume
+# Object keys that can be in the workbook cache; storage writes to any other key skip invalidation.
+WORKBOOK_CACHE_KEY_MARKER = "/tableau_file/"
+WORKBOOK_CACHE_KEY_SUFFIXES = (".twb", ".twbx", ".tfl", ".tflx")
+TABLEAU_AUTH_HEADER = "X-Tableau-Auth"
+# Workbook subtrees dropped while parsing large .twb files; none of the pipelines read them.
+TWB_PRUNED_TAGS = frozenset({"thumbnails", "thumbnail", "images", "embedded-fonts"})
 WORKBOOK_URL = "{server_url}/api/{version}/sites/{site_id}/workbooks"
 WORKBOOK_DETAILS_URL = "{server_url}/api/{version}/sites/{site_id}/workbooks/{workbook_id}"
 WORKBOOK_USAGE_STATISTICS_URL = "{server_url}/api/-/content/usage-stats/workbooks/{workbook_id}"
+USAGE_STATS_HITS_KEY = "hitsTotal"
+USAGE_STATS_LAST_ACCESS_KEY = "lastAccessTime"
 WORKBOOKS_PATH = "My_workspace/workbooks"
 WORKBOOK_ID = "workbook_id"
 XMLNS = {'t': 'http://tableau.com/api'}
@@ -471,6 +510,105 @@ LOCAL_DATE_TEMPLATE = '''table {local_date_table_ref}
 	annotation __PBI_LocalDateTable = true
 '''
 
+SHARED_DATE_TABLE_NAME = "Date"
+
+# One marked Date dimension shared by every date column (DATE_TABLE_MODE=shared); the
+# calendar spans all date columns via nested MIN/MAX expressions.
+SHARED_DATE_TABLE_TEMPLATE = '''table '{table_name}'
+	dataCategory: Time
+	lineageTag: {table_lineage_tag}
+
+	column Date
+		dataType: dateTime
+		isKey
+		formatString: Long Date
+		lineageTag: {date_lineage_tag}
+		summarizeBy: none
+		sourceColumn: [Date]
+
+		annotation SummarizationSetBy = Automatic
+
+	column Year = YEAR([Date])
+		dataType: int64
+		formatString: 0
+		lineageTag: {year_lineage_tag}
+		summarizeBy: none
+
+		annotation SummarizationSetBy = User
+
+	column MonthNo = MONTH([Date])
+		dataType: int64
+		isHidden
+		formatString: 0
+		lineageTag: {month_no_lineage_tag}
+		summarizeBy: none
+
+		annotation SummarizationSetBy = User
+
+	column Month = FORMAT([Date], "MMMM")
+		dataType: string
+		lineageTag: {month_lineage_tag}
+		summarizeBy: none
+		sortByColumn: MonthNo
+
+		annotation SummarizationSetBy = User
+
+	column QuarterNo = INT(([MonthNo] + 2) / 3)
+		dataType: int64
+		isHidden
+		formatString: 0
+		lineageTag: {quarter_no_lineage_tag}
+		summarizeBy: none
+
+		annotation SummarizationSetBy = User
+
+	column Quarter = "Qtr " & [QuarterNo]
+		dataType: string
+		lineageTag: {quarter_lineage_tag}
+		summarizeBy: none
+		sortByColumn: QuarterNo
+
+		annotation SummarizationSetBy = User
+
+	column Day = DAY([Date])
+		dataType: int64
+		formatString: 0
+		lineageTag: {day_lineage_tag}
+		summarizeBy: none
+
+		annotation SummarizationSetBy = User
+
+	hierarchy 'Date Hierarchy'
+		lineageTag: {hierarchy_lineage_tag}
+
+		level Year
+			lineageTag: {hierarchy_year_lineage_tag}
+			column: Year
+
+		level Quarter
+			lineageTag: {hierarchy_quarter_lineage_tag}
+			column: Quarter
+
+		level Month
+			lineageTag: {hierarchy_month_lineage_tag}
+			column: Month
+
+		level Day
+			lineageTag: {hierarchy_day_lineage_tag}
+			column: Day
+
+	partition '{table_name}' = calculated
+		mode: import
+		source = Calendar(Date(Year({min_date_expression}), 1, 1), Date(Year({max_date_expression}), 12, 31))
+'''
+
+# Relationship from a date column to the shared Date table; only one per source table can be active.
+DATE_RELATIONSHIP_TEMPLATE = '''relationship {relationship_id}
+{inactive_line}	joinOnDateBehavior: datePartOnly
+	fromColumn: '{table_name}'.'{column_name}'
+	toColumn: '{date_table_name}'.Date
+'''
+
 UNCOVERED_TEXT_BOX = "This visual is not supported in this version. This will be added in future versions."
 VISUAL_GENERATION_ERROR = "Error occured during genration of this file."
 
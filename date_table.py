@@ -0,0 +1,147 @@
+import uuid
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from app.core.config import DATE_TABLE_MODE
+from app.core.constants import (
+    LOCAL_DATE_TEMPLATE, SHARED_DATE_TABLE_TEMPLATE, SHARED_DATE_TABLE_NAME, DATE_RELATIONSHIP_TEMPLATE
+)
+from app.core.logger_setup import logger
+
+# Lineage tags and relationship ids are derived from names, so re-rendering an unchanged
+# model yields identical TMDL and the incremental writer can skip it.
+_LINEAGE_NAMESPACE = uuid.UUID("6f1c2b1e-58a4-4f43-9d35-3b2f0c1a7e52")
+
+_LINEAGE_FIELDS = (
+    "table", "date", "year", "month_no", "month", "quarter_no", "quarter", "day",
+    "hierarchy", "hierarchy_year", "hierarchy_quarter", "hierarchy_month", "hierarchy_day",
+)
+
+
+class DateColumn(NamedTuple):
+    table_name: str
+    column_name: str
+
+
+class DateTables(NamedTuple):
+    mode: str
+    # TMDL file name (relative to the tables folder) -> content
+    tables: Dict[str, str]
+    # date column -> name of the date table it points at
+    targets: Dict[DateColumn, str]
+    # relationship blocks for relationships.tmdl
+    relationships: List[str]
+
+
+def _stable_id(*parts: str) -> str:
+    return str(uuid.uuid5(_LINEAGE_NAMESPACE, "|".join(parts)))
+
+
+def _lineage_tags(*parts: str) -> Dict[str, str]:
+    return {f"{field}_lineage_tag": _stable_id(*parts, field) for field in _LINEAGE_FIELDS}
+
+
+def _quote_name(name: str) -> str:
+    return name.replace("'", "''")
+
+
+def _column_ref(column: DateColumn) -> str:
+    return f"'{_quote_name(column.table_name)}'[{column.column_name.replace(']', ']]')}]"
+
+
+def _nested(function: str, expressions: List[str]) -> str:
+    """DAX MIN/MAX take two scalars, so N columns become MIN(MIN(a), MIN(MIN(b), MIN(c)))."""
+    if len(expressions) == 1:
+        return expressions[0]
+    return f"{function}({expressions[0]}, {_nested(function, expressions[1:])})"
+
+
+def render_local_date_tables(date_columns: Iterable[DateColumn]) -> DateTables:
+    """One hidden LocalDateTable per date column (Power BI's auto date/time layout)."""
+    tables, targets = {}, {}
+    for column in date_columns:
+        ref = f"LocalDateTable_{_stable_id('local', column.table_name, column.column_name)}"
+        tables[f"{ref}.tmdl"] = LOCAL_DATE_TEMPLATE.format(
+            local_date_table_ref=ref,
+            table_name=_quote_name(column.table_name),
+            column_name=column.column_name.replace("]", "]]"),
+            **_lineage_tags("local", column.table_name, column.column_name)
+        )
+        targets[column] = ref
+    return DateTables("local", tables, targets, [])
+
+
+def unique_table_name(name: str, existing_tables: Iterable[str]) -> str:
+    """``name``, or ``name 2``, ``name 3``... when the model already has it (table names ignore case)."""
+    taken = {table.lower() for table in existing_tables}
+    candidate, suffix = name, 2
+    while candidate.lower() in taken:
+        candidate, suffix = f"{name} {suffix}", suffix + 1
+    return candidate
+
+
+def render_shared_date_table(
+    date_columns: Iterable[DateColumn],
+    table_name: str = SHARED_DATE_TABLE_NAME,
+    existing_tables: Iterable[str] = (),
+    fact_tables: Optional[Iterable[str]] = None
+) -> DateTables:
+    """
+    A single marked Date dimension spanning every date column, plus a relationship
+    from each column. ``table_name`` is suffixed when it collides with one of
+    ``existing_tables``.
+
+    The first date column of each table gets the active relationship; the others
+    are inactive (use USERELATIONSHIP in measures). When tables holding date
+    columns are also related to each other (e.g. Orders -> Customers), that gives
+    Date more than one active path to the same table and Power BI rejects the
+    model as ambiguous; pass ``fact_tables`` to activate only those tables'
+    relationships and leave every other one inactive.
+    """
+    columns = list(dict.fromkeys(date_columns))
+    if not columns:
+        return DateTables("shared", {}, {}, [])
+    table_name = unique_table_name(table_name, existing_tables)
+    allowed = None if fact_tables is None else set(fact_tables)
+
+    table = SHARED_DATE_TABLE_TEMPLATE.format(
+        table_name=_quote_name(table_name),
+        min_date_expression=_nested("MIN", [f"MIN({_column_ref(c)})" for c in columns]),
+        max_date_expression=_nested("MAX", [f"MAX({_column_ref(c)})" for c in columns]),
+        **_lineage_tags("shared", table_name)
+    )
+
+    relationships = []
+    active_tables = set()
+    for column in columns:
+        active = column.table_name not in active_tables and (allowed is None or column.table_name in allowed)
+        if active:
+            active_tables.add(column.table_name)
+        relationships.append(DATE_RELATIONSHIP_TEMPLATE.format(
+            relationship_id=_stable_id("relationship", column.table_name, column.column_name, table_name),
+            inactive_line="" if active else "\tisActive: false\n",
+            table_name=_quote_name(column.table_name),
+            column_name=_quote_name(column.column_name),
+            date_table_name=_quote_name(table_name),
+        ))
+    return DateTables("shared", {f"{table_name}.tmdl": table}, {c: table_name for c in columns}, relationships)
+
+
+def build_date_tables(
+    date_columns: Iterable[DateColumn],
+    mode: str = DATE_TABLE_MODE,
+    existing_tables: Iterable[str] = (),
+    fact_tables: Optional[Iterable[str]] = None
+) -> DateTables:
+    """
+    Render date tables in the configured mode ("local" or "shared"). ``existing_tables``
+    and ``fact_tables`` only apply to the shared table; see ``render_shared_date_table``.
+    """
+    columns = list(date_columns)
+    if mode == "shared":
+        result = render_shared_date_table(columns, existing_tables=existing_tables, fact_tables=fact_tables)
+    else:
+        if mode != "local":
+            logger.warning("[DATE_TABLE] Unknown DATE_TABLE_MODE '%s'; using local date tables", mode)
+        result = render_local_date_tables(columns)
+    logger.info("[DATE_TABLE] %s date columns -> %s date tables (%s)", len(columns), len(result.tables), result.mode)
+    return result
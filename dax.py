@@ -6,12 +6,16 @@ from app.models.users import User
 from app.services.dax.dax_processor import DaxProcessor
 from app.core.dependencies import get_current_user
 from app.schemas.analyse import SuccessResponse
+from app.core.metrics import track_stage, organization_label, report_type_label
 
 dax_router = APIRouter()
 
 @dax_router.post("/calc-dax/{report_id}", response_model=SuccessResponse)
 async def calc_dax_api( report_id: UUID, user: User = Depends(get_current_user)):
-    response = await DaxProcessor.convert_dax(report_id, user)
+    report_type = await report_type_label([report_id])
+    with track_stage("dax", organization_label(user), report_type) as stage:
+        response = await DaxProcessor.convert_dax(report_id, user)
+        stage.set_status_code(response.status_code)
 
     return JSONResponse(
         status_code=response.status_code,
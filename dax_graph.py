@@ -0,0 +1,273 @@
+import json
+import asyncio
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+from app.core.constants import DAX_CONVERTED_REFERENCES_NOTE, OPENAI_PBI_PIPE_PROMPT
+from app.core.field_reference import iter_field_references
+from app.core.logger_setup import logger
+from app.core.prompt_context import metadata_for_formulas
+
+
+class CalculationNode(NamedTuple):
+    """A calculated field; ``name`` is Tableau's internal name (e.g. ``[Calculation_123]``)."""
+    name: str
+    caption: str
+    formula: str
+    role: Optional[str] = None
+
+
+class CalculationGraph:
+    """
+    Dependency DAG of a workbook's calculated fields.
+
+    A calculation depends on every other calculation its formula references,
+    by internal name or by caption. ``levels`` groups the fields with Kahn's
+    algorithm over the strongly connected components: everything in a level
+    depends only on earlier levels, so a level can be converted in parallel once
+    its predecessors are done. The members of a dependency cycle get a level of
+    their own, and the fields that depend on them are leveled after it.
+    """
+
+    def __init__(self, calculations: List[CalculationNode]):
+        self.nodes: Dict[str, CalculationNode] = {c.name: c for c in calculations}
+        lookup: Dict[str, str] = {}
+        for calc in calculations:
+            lookup[calc.name.strip("[]")] = calc.name
+            lookup[calc.caption] = calc.name
+
+        self.dependencies: Dict[str, Set[str]] = {name: set() for name in self.nodes}
+        self.dependents: Dict[str, Set[str]] = {name: set() for name in self.nodes}
+        for calc in calculations:
+            for reference in iter_field_references(calc.formula or ""):
+                target = lookup.get(reference.name)
+                if target and target != calc.name:
+                    self.dependencies[calc.name].add(target)
+                    self.dependents[target].add(calc.name)
+
+        self.levels: List[List[str]] = self._topological_levels()
+
+    def _components(self) -> List[List[str]]:
+        """Strongly connected components (Tarjan's algorithm, iterative)."""
+        index: Dict[str, int] = {}
+        lowlink: Dict[str, int] = {}
+        stack: List[str] = []
+        on_stack: Set[str] = set()
+        components: List[List[str]] = []
+
+        for root in sorted(self.nodes):
+            if root in index:
+                continue
+            work = [(root, iter(sorted(self.dependencies[root])))]
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                name, deps = work[-1]
+                dep = next(deps, None)
+                if dep is not None:
+                    if dep not in index:
+                        index[dep] = lowlink[dep] = len(index)
+                        stack.append(dep)
+                        on_stack.add(dep)
+                        work.append((dep, iter(sorted(self.dependencies[dep]))))
+                    elif dep in on_stack:
+                        lowlink[name] = min(lowlink[name], index[dep])
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[name])
+                if lowlink[name] == index[name]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == name:
+                            break
+                    components.append(sorted(component))
+        return components
+
+    def _topological_levels(self) -> List[List[str]]:
+        components = self._components()
+        component_of = {name: i for i, component in enumerate(components) for name in component}
+        in_degree = [0] * len(components)
+        dependents: List[Set[int]] = [set() for _ in components]
+        for name, deps in self.dependencies.items():
+            for dep in deps:
+                if component_of[dep] != component_of[name] and component_of[name] not in dependents[component_of[dep]]:
+                    dependents[component_of[dep]].add(component_of[name])
+                    in_degree[component_of[name]] += 1
+
+        levels = []
+        current = [i for i, degree in enumerate(in_degree) if degree == 0]
+        while current:
+            acyclic = sorted(components[i][0] for i in current if len(components[i]) == 1)
+            if acyclic:
+                levels.append(acyclic)
+            cyclic = sorted(name for i in current if len(components[i]) > 1 for name in components[i])
+            if cyclic:
+                # Cycles cannot be ordered; their members are converted together with full
+                # inlining as the prompt instructs, before anything that depends on them.
+                logger.warning("[DAX_GRAPH] %s calculations form dependency cycles: %s", len(cyclic), cyclic)
+                levels.append(cyclic)
+            following = []
+            for i in current:
+                for dependent in dependents[i]:
+                    in_degree[dependent] -= 1
+                    if in_degree[dependent] == 0:
+                        following.append(dependent)
+            current = following
+        return levels
+
+
+def _format_item(node: CalculationNode, captions: Dict[str, str]) -> str:
+    # Internal names such as [Calculation_123] are replaced with captions so they line up
+    # with the converted-field list the model is given.
+    formula = node.formula or ""
+    for reference in iter_field_references(formula):
+        caption = captions.get(reference.name)
+        if reference.datasource is None and caption:
+            formula = formula.replace(reference.raw, f"[{caption}]")
+    return f"{node.caption} ({node.role or 'calculation'}) = {formula}"
+
+
+def _format_converted(caption: str, field: Dict[str, Any]) -> str:
+    # Same reference forms as DAX_CONVERTED_REFERENCES_NOTE: [Measure] and 'Table'[Column].
+    kind = field.get("type") or "measure"
+    table = field.get("table")
+    if kind == "column" and table:
+        return "- '" + table.replace("'", "''") + f"'[{caption}] (column)"
+    return f"- [{caption}] ({kind})"
+
+
+async def convert_by_dependency_levels(
+    calculations: List[CalculationNode],
+    metadata: Any,
+    gateway=None,
+    system_message: str = OPENAI_PBI_PIPE_PROMPT,
+    model: Optional[str] = None,
+    compiler=None,
+    organization_id=None,
+    cache=None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Convert calculations level by level through the LLM gateway.
+
+    Each level is sent concurrently (packed into batches). Formulas that depend on
+    already-converted fields get those fields listed by name and kind instead of
+    having their logic inlined again. When a ``TableauDaxCompiler`` holding the
+    workbook's field bindings is given, formulas it can compile skip the LLM.
+    With an ``organization_id``, translations are looked up in and saved to the
+    organization's ``DaxTranslationCacheManager`` cache, so a formula seen before
+    with the same referenced columns, prompt and model skips the LLM too.
+    Returns ``{caption: {"dax": ..., "type": ...}}``.
+    """
+    if gateway is None:
+        from app.core.llm_gateway import llm_gateway as gateway
+    if organization_id is not None:
+        from app.core.dax_translation_cache import DaxTranslationCacheManager, prompt_version
+        cache = cache or DaxTranslationCacheManager
+        version = prompt_version(system_message)
+        model_name = gateway.model_name(model)
+
+    graph = CalculationGraph(calculations)
+    converted: Dict[str, Dict[str, Any]] = {}
+    captions = {name.strip("[]"): node.caption for name, node in graph.nodes.items()}
+    items_by_name = {name: _format_item(node, captions) for name, node in graph.nodes.items()}
+
+    def converted_references(names: List[str]) -> List[str]:
+        referenced = []
+        for name in names:
+            for dep in sorted(graph.dependencies[name]):
+                caption = graph.nodes[dep].caption
+                if caption in converted and caption not in referenced:
+                    referenced.append(caption)
+        return referenced
+
+    def build_user_message(names: List[str]) -> str:
+        # Only the columns this batch references, pipe-encoded, rather than the whole schema as JSON.
+        metadata_text = metadata_for_formulas(metadata, [graph.nodes[name].formula for name in names])
+        message = (
+            f"### A. METADATA SCHEMA\n{metadata_text}\n### B. FORMULAS TO COMPILE\n"
+            + "\n".join(items_by_name[name] for name in names)
+        )
+        referenced = converted_references(names)
+        if referenced:
+            listing = "\n".join(_format_converted(c, converted[c]) for c in referenced)
+            message += DAX_CONVERTED_REFERENCES_NOTE.format(converted_fields=listing)
+        return message
+
+    def cache_key(name: str) -> Dict[str, str]:
+        # Everything the prompt says about this formula: caption, role and rewritten formula,
+        # the referenced columns, and how the fields it builds on were converted.
+        node = graph.nodes[name]
+        columns = [{"metadata": metadata_for_formulas(metadata, [node.formula])}]
+        columns.extend(
+            {"converted": c, "type": converted[c].get("type"), "table": converted[c].get("table")}
+            for c in converted_references([name])
+        )
+        return cache.build_cache_key(items_by_name[name], columns, model_name, version)
+
+    def accept(name: str, result: Dict[str, Any]) -> None:
+        node = graph.nodes[name]
+        converted[node.caption] = {"dax": result.get("dax"), "type": result.get("type"), "table": result.get("table")}
+        if compiler and result.get("type") == "measure":
+            # Columns from the LLM have no known home table, so only measures can be bound.
+            compiler.add_field(node.caption, kind="measure", aliases=[name])
+
+    def store(names: List[str], keys: Dict[str, Dict[str, str]]) -> None:
+        for name in names:
+            node = graph.nodes[name]
+            cache.store(organization_id, keys[name], node.formula, json.dumps(converted[node.caption]))
+
+    for depth, level in enumerate(graph.levels):
+        pending = []
+        for name in level:
+            node = graph.nodes[name]
+            compiled = compiler.try_compile(node.formula, node.role) if compiler else None
+            if compiled is None:
+                pending.append(name)
+                continue
+            converted[node.caption] = {"dax": compiled.dax, "type": compiled.type, "table": compiled.table}
+            compiler.add_field(
+                node.caption, table=compiled.table, kind=compiled.type,
+                datatype=compiled.datatype, aliases=[name]
+            )
+
+        cached = 0
+        keys: Dict[str, Dict[str, str]] = {}
+        if pending and organization_id is not None:
+            keys = {name: cache_key(name) for name in pending}
+            hits = await asyncio.to_thread(
+                cache.get_many, organization_id, [parts["cache_key"] for parts in keys.values()]
+            )
+            for name in list(pending):
+                hit = hits.get(keys[name]["cache_key"])
+                if hit is not None:
+                    accept(name, json.loads(hit))
+                    pending.remove(name)
+                    cached += 1
+
+        results = []
+        if pending:
+            results = await gateway.complete_batched(
+                system_message, [items_by_name[name] for name in pending],
+                lambda indexes: build_user_message([pending[i] for i in indexes]), model=model
+            )
+        fresh = []
+        for name, result in zip(pending, results):
+            if isinstance(result, dict):
+                accept(name, result)
+                if keys:
+                    fresh.append(name)
+        if fresh:
+            await asyncio.to_thread(store, fresh, keys)
+        logger.info(
+            "[DAX_GRAPH] Level %s/%s: compiled %s, cached %s, converted %s/%s via LLM",
+            depth + 1, len(graph.levels), len(level) - len(pending) - cached, cached,
+            sum(r is not None for r in results), len(pending)
+        )
+    if compiler:
+        compiler.log_coverage()
+    return converted
@@ -0,0 +1,218 @@
+import re
+import json
+import uuid
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import Column, DateTime, String, Integer, Text, UniqueConstraint, func, text
+from sqlalchemy.dialects.postgresql import UUID, insert
+from app.core.session import Base, scoped_context
+from app.core.logger_setup import logger
+from app.core.constants import OPENAI_PBI_PROMPT
+
+
+def prompt_version(system_message: str) -> str:
+    """Changes whenever a system prompt is edited, so stale translations stop matching."""
+    return hashlib.sha256(system_message.encode("utf-8")).hexdigest()[:12]
+
+
+CURRENT_PROMPT_VERSION = prompt_version(OPENAI_PBI_PROMPT)
+
+# Scanned left to right, so "//" or "/*" inside a string literal or [field name] is part of
+# that token, not a comment. Unterminated tokens run to the end of the formula.
+_TOKENS = re.compile(
+    r"(?P<keep>\"(?:[^\"]|\"\")*(?:\"|\Z)|'(?:[^']|'')*(?:'|\Z)|\[(?:[^\]]|\]\])*(?:\]|\Z))"
+    r"|(?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))",
+    re.DOTALL
+)
+
+
+class DaxTranslationCache(Base):
+    __tablename__ = "dax_translation_cache"
+    __table_args__ = (
+        UniqueConstraint("organization_id", "cache_key", name="uq_dax_translation_cache_org_key"),
+        {"schema": "biporttest"},
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    organization_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    cache_key = Column(String(64), nullable=False)
+    formula_hash = Column(String(64), nullable=False)
+    schema_fingerprint = Column(String(64), nullable=False)
+    prompt_version = Column(String(32), nullable=False)
+    model_name = Column(String(100), nullable=False)
+    tableau_formula = Column(Text, nullable=False)
+    dax_output = Column(Text, nullable=False)
+    hit_count = Column(Integer, server_default=text("0"), nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    last_hit_at = Column(DateTime, nullable=True)
+
+
+class DaxTranslationCacheManager:
+    """
+    Org-wide cache of validated Tableau-to-DAX translations.
+
+    Entries are keyed by the normalized formula, a fingerprint of the referenced
+    columns' metadata, the prompt version and the model, so identical
+    calculations in near-duplicate workbooks are converted once per organization.
+    """
+
+    _stats_lock = threading.Lock()
+    _hits = 0
+    _misses = 0
+
+    @staticmethod
+    def normalize_formula(formula: str) -> str:
+        """Drop comments and collapse whitespace outside string literals and field names."""
+        formula = formula or ""
+        parts = []
+        last = 0
+        for match in _TOKENS.finditer(formula):
+            parts.append(" ".join(formula[last:match.start()].split()))
+            if match.group("keep"):
+                parts.append(match.group("keep"))
+            last = match.end()
+        parts.append(" ".join(formula[last:].split()))
+        return " ".join(p for p in parts if p).strip()
+
+    @staticmethod
+    def schema_fingerprint(columns: Iterable[dict]) -> str:
+        """
+        Hash the metadata of the columns a formula references.
+
+        Each column dict should carry whatever the prompt is given about it
+        (name, datatype, role, aggregation, ...); ordering does not matter.
+        """
+        canonical = sorted(json.dumps(c, sort_keys=True, default=str) for c in columns)
+        return hashlib.sha256("\n".join(canonical).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def build_cache_key(formula: str, columns: Iterable[dict], model_name: str,
+                        prompt_version: str = CURRENT_PROMPT_VERSION) -> Dict[str, str]:
+        formula_hash = hashlib.sha256(DaxTranslationCacheManager.normalize_formula(formula).encode("utf-8")).hexdigest()
+        fingerprint = DaxTranslationCacheManager.schema_fingerprint(columns)
+        cache_key = hashlib.sha256(
+            f"{formula_hash}|{fingerprint}|{prompt_version}|{model_name}".encode("utf-8")
+        ).hexdigest()
+        return {
+            "cache_key": cache_key,
+            "formula_hash": formula_hash,
+            "schema_fingerprint": fingerprint,
+            "prompt_version": prompt_version,
+            "model_name": model_name,
+        }
+
+    @staticmethod
+    def _record(hits: int, misses: int) -> None:
+        with DaxTranslationCacheManager._stats_lock:
+            DaxTranslationCacheManager._hits += hits
+            DaxTranslationCacheManager._misses += misses
+
+    @staticmethod
+    def get_many(organization_id, cache_keys: List[str]) -> Dict[str, str]:
+        """Return {cache_key: dax_output} for the keys that are cached, bumping their hit counters."""
+        if not cache_keys:
+            return {}
+        unique_keys = list(set(cache_keys))
+        with scoped_context() as session:
+            rows = session.query(DaxTranslationCache.cache_key, DaxTranslationCache.dax_output).filter(
+                DaxTranslationCache.organization_id == organization_id,
+                DaxTranslationCache.cache_key.in_(unique_keys)
+            ).all()
+            found = {row.cache_key: row.dax_output for row in rows}
+            if found:
+                session.query(DaxTranslationCache).filter(
+                    DaxTranslationCache.organization_id == organization_id,
+                    DaxTranslationCache.cache_key.in_(list(found))
+                ).update(
+                    {
+                        DaxTranslationCache.hit_count: DaxTranslationCache.hit_count + 1,
+                        DaxTranslationCache.last_hit_at: datetime.utcnow()
+                    },
+                    synchronize_session=False
+                )
+                session.commit()
+
+        DaxTranslationCacheManager._record(len(found), len(unique_keys) - len(found))
+        return found
+
+    @staticmethod
+    def get(organization_id, cache_key: str) -> Optional[str]:
+        return DaxTranslationCacheManager.get_many(organization_id, [cache_key]).get(cache_key)
+
+    @staticmethod
+    def _is_valid_output(dax_output: str) -> bool:
+        if not dax_output or not dax_output.strip():
+            return False
+        stripped = dax_output.strip()
+        if stripped[0] in "[{":
+            try:
+                json.loads(stripped)
+            except ValueError:
+                return False
+        return True
+
+    @staticmethod
+    def store(organization_id, key_parts: Dict[str, str], tableau_formula: str, dax_output: str) -> bool:
+        """Persist a validated translation; invalid or empty output is never cached."""
+        if not DaxTranslationCacheManager._is_valid_output(dax_output):
+            logger.warning("[DAX_CACHE] Not caching invalid DAX output for key %s", key_parts.get('cache_key'))
+            return False
+
+        values = {
+            "id": uuid.uuid4(),
+            "organization_id": organization_id,
+            "tableau_formula": tableau_formula,
+            "dax_output": dax_output,
+            **key_parts,
+        }
+        stmt = insert(DaxTranslationCache.__table__).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_dax_translation_cache_org_key",
+            set_={"dax_output": stmt.excluded.dax_output}
+        )
+        with scoped_context() as session:
+            try:
+                session.execute(stmt)
+                session.commit()
+                return True
+            except Exception as e:
+                session.rollback()
+                logger.error("[DAX_CACHE] Failed to store translation: %s", e)
+                return False
+
+    @staticmethod
+    def invalidate_prompt_version(current_version: str = CURRENT_PROMPT_VERSION, organization_id=None) -> int:
+        """Delete translations produced by any other prompt version; returns the number removed."""
+        with scoped_context() as session:
+            query = session.query(DaxTranslationCache).filter(DaxTranslationCache.prompt_version != current_version)
+            if organization_id is not None:
+                query = query.filter(DaxTranslationCache.organization_id == organization_id)
+            removed = query.delete(synchronize_session=False)
+            session.commit()
+        logger.info("[DAX_CACHE] Removed %s translations from prompt versions other than %s", removed, current_version)
+        return removed
+
+    @staticmethod
+    def get_stats(organization_id=None) -> dict:
+        """Hit rate for this process plus persisted entry and hit totals."""
+        with DaxTranslationCacheManager._stats_lock:
+            hits, misses = DaxTranslationCacheManager._hits, DaxTranslationCacheManager._misses
+        with scoped_context() as session:
+            query = session.query(
+                func.count(DaxTranslationCache.id),
+                func.coalesce(func.sum(DaxTranslationCache.hit_count), 0)
+            )
+            if organization_id is not None:
+                query = query.filter(DaxTranslationCache.organization_id == organization_id)
+            entries, total_hits = query.one()
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "lifetime_hits": int(total_hits),
+            "prompt_version": CURRENT_PROMPT_VERSION,
+        }
@@ -1,4 +1,5 @@
 import json
+import secrets
 from app.core.enums import RoleEnum
 from app.models.roles import RoleManager
 from app.models.users import User, UserManager
@@ -6,6 +7,7 @@ from app.core import AuthenticationError, AuthorizationError, BLOCKED_EMAILS, lo
 from fastapi import Depends, Header, HTTPException, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.services.auth import decode_secure_jwt, decode_base
+from app.core.config import METRICS_TOKEN
 
 
 from app.core import scoped_context
@@ -129,4 +131,10 @@ async def check_if_admin(
     role_name = RoleManager.get_role_name(user.role_id)
     if role_name != RoleEnum.ADMIN:
         raise AuthorizationError("Only Admins are authorized to access this endpoint.")
-    return user
\ No newline at end of file
+    return user
+
+def require_metrics_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> None:
+    """Guards GET /metrics: the scraper must send METRICS_TOKEN as its bearer token."""
+    if not METRICS_TOKEN or not secrets.compare_digest(credentials.credentials.encode(), METRICS_TOKEN.encode()):
+        logger.warning("[require_metrics_token] Rejected metrics scrape")
+        raise AuthorizationError("Invalid metrics token")
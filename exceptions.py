@@ -58,3 +58,24 @@ class ValidationError(BaseAppException):
     
     def __init__(self, detail: Optional[str] = None):
         super().__init__(status_code=400, detail=detail, default_message="Validation error")
+
+
+class PayloadTooLargeError(BaseAppException):
+    """Exception for uploads exceeding the configured size limit (413)."""
+
+    def __init__(self, detail: Optional[str] = None):
+        super().__init__(status_code=413, detail=detail, default_message="Uploaded file is too large")
+
+
+class ServiceUnavailableError(BaseAppException):
+    """Exception for temporarily exhausted capacity such as queues or scratch disk (503)."""
+
+    def __init__(self, detail: Optional[str] = None):
+        super().__init__(status_code=503, detail=detail, default_message="Service temporarily unavailable, please retry")
+
+
+class StorageMoveError(BaseAppException):
+    """Exception for a storage prefix move that left objects behind; re-running the move resumes it (500)."""
+
+    def __init__(self, detail: Optional[str] = None):
+        super().__init__(status_code=500, detail=detail, default_message="Storage move did not complete")
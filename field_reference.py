@@ -0,0 +1,66 @@
+import re
+from functools import lru_cache
+from typing import Iterator, NamedTuple, Optional
+
+from app.core.regex_enums import Regex
+
+# "<derivation>:<name>:<type>" with an optional trailing ":<n>" (table-calc ordinal), e.g.
+# "none:Category:nk", "yr:Order Date:ok", "usr:Calculation_123:qk:2".
+_QUALIFIED_FIELD = re.compile(r'^(?P<derivation>[^:]+):(?P<name>.+):(?P<type>[a-z]{2})(?::(?P<ordinal>\d+))?$')
+
+
+class FieldReference(NamedTuple):
+    """A Tableau field reference such as ``[federated.1x2y].[sum:Sales:qk]``, parsed once."""
+    raw: str
+    datasource: Optional[str]
+    name: str
+    derivation: Optional[str] = None
+    type_code: Optional[str] = None
+    ordinal: Optional[int] = None
+
+    @property
+    def is_qualified(self) -> bool:
+        """True for the ``derivation:name:type`` form used by column instances."""
+        return self.derivation is not None
+
+    @property
+    def bracketed_name(self) -> str:
+        return f"[{self.name.replace(']', ']]')}]"
+
+
+def _unescape(value: str) -> str:
+    return value.replace("]]", "]")
+
+
+@lru_cache(maxsize=65536)
+def parse_field_reference(raw: str) -> Optional[FieldReference]:
+    """
+    Parse ``[ds].[field]`` / ``[field]`` into a FieldReference, or return None if ``raw``
+    is not a single field reference. Results are cached, so repeated lookups of the same
+    reference across worksheets cost a dict hit.
+    """
+    match = Regex.FIELD_REFERENCE.compiled.fullmatch(raw.strip())
+    if not match:
+        return None
+    datasource = match.group("datasource")
+    field = _unescape(match.group("field"))
+    qualified = _QUALIFIED_FIELD.match(field)
+    if not qualified:
+        return FieldReference(raw, _unescape(datasource) if datasource is not None else None, field)
+    ordinal = qualified.group("ordinal")
+    return FieldReference(
+        raw=raw,
+        datasource=_unescape(datasource) if datasource is not None else None,
+        name=qualified.group("name"),
+        derivation=qualified.group("derivation"),
+        type_code=qualified.group("type"),
+        ordinal=int(ordinal) if ordinal else None,
+    )
+
+
+def iter_field_references(text: str) -> Iterator[FieldReference]:
+    """Yield every field reference in a formula, shelf or filter expression, in order."""
+    for match in Regex.FIELD_REFERENCE.compiled.finditer(text):
+        reference = parse_field_reference(match.group(0))
+        if reference is not None:
+            yield reference
@@ -1,7 +1,9 @@
 from app.core.config import OpenAIConfig, AzureOpenAIConfig
 from openai import APIConnectionError, AuthenticationError
+from app.core.llm_usage import llm_usage_tracker
 from app.core.logger_setup import logger
 import os
+import time
 
 
 cloud_provider = os.getenv("CLOUD_PROVIDER", "aws").lower().strip()
@@ -20,6 +22,8 @@ def gpt_model(model, system_message, user_message, response_format):
             model_or_deployment = openai_config.deployment_name
         else:
             model_or_deployment = model if model else openai_config.model_name
+        # Keep system_message static (prompt constants only) so repeated calls share a cacheable prefix.
+        started = time.perf_counter()
         response = client.chat.completions.create(
             model = model_or_deployment,
             messages=[
@@ -46,6 +50,7 @@ def gpt_model(model, system_message, user_message, response_format):
                 "type": response_format
             }
         )
+        llm_usage_tracker.record(response, model_or_deployment, (time.perf_counter() - started) * 1000)
 
         return response.choices[0].message.content
     except APIConnectionError as e:
@@ -54,3 +59,9 @@ def gpt_model(model, system_message, user_message, response_format):
     except AuthenticationError as e:
         logger.error(f"OpenAI key or token was invalid, expired, or revoked.: {str(e)}")
         raise ValueError('OpenAI key or token was invalid, expired, or revoked.')  
+
+
+async def async_gpt_model(model, system_message, user_message, response_format):
+    """Non-blocking counterpart of gpt_model for async pipelines; see llm_gateway for batching."""
+    from app.core.llm_gateway import llm_gateway
+    return await llm_gateway.complete(system_message, user_message, response_format=response_format, model=model)
@@ -0,0 +1,257 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+from typing import Any, Callable, List, Optional, Sequence
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError, AuthenticationError, RateLimitError
+
+from app.core.config import (
+    OpenAIConfig, AzureOpenAIConfig, LLM_MAX_CONCURRENCY, LLM_TOKENS_PER_MINUTE,
+    LLM_BATCH_TOKEN_LIMIT, LLM_MAX_RETRIES
+)
+from app.core.constants import RETRY_BACKOFF_BASE
+from app.core.llm_usage import llm_usage_tracker
+from app.core.logger_setup import logger
+
+_CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+# Rough characters-per-token ratio for English text and formulas; good enough for budgeting.
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text or "") // _CHARS_PER_TOKEN)
+
+
+class TokenBudget:
+    """
+    Token bucket refilled continuously at ``tokens_per_minute``; callers wait for capacity.
+
+    Each caller reserves its tokens under the lock (the balance may go
+    negative) and then sleeps outside it until the refill covers the debt, so
+    waiters are served in arrival order without blocking each other's bookkeeping.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = max(1, tokens_per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> None:
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            now = time.monotonic()
+            self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+            self.updated = now
+            self.available -= tokens
+            wait_time = -self.available / self.rate if self.available < 0 else 0.0
+        if wait_time:
+            await asyncio.sleep(wait_time)
+
+
+class LLMGateway:
+    """
+    Async front door for chat completions.
+
+    Requests run concurrently up to ``LLM_MAX_CONCURRENCY`` and are paced by a
+    tokens-per-minute budget. 429s, 5xx responses and transient connection
+    errors are retried with backoff, honouring ``Retry-After``. When the primary model stays
+    rate-limited the request moves to ``fallback_model`` / ``fallback_deployment``.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+        max_retries: int = LLM_MAX_RETRIES
+    ):
+        self.is_azure = os.getenv("CLOUD_PROVIDER", "aws").lower().strip() == "azure"
+        self.config = AzureOpenAIConfig() if self.is_azure else OpenAIConfig()
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(1, max_retries)
+        self.budget = TokenBudget(tokens_per_minute)
+        self._client = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self.config.get_async_openai_client()
+        return self._client
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _models(self, model: Optional[str]) -> List[str]:
+        if self.is_azure:
+            primary, fallback = self.config.deployment_name, self.config.fallback_deployment
+        else:
+            primary, fallback = model or self.config.model_name, self.config.fallback_model
+        return [primary] if not fallback or fallback == primary else [primary, fallback]
+
+    def model_name(self, model: Optional[str] = None) -> str:
+        """The model (or Azure deployment) a request for ``model`` is sent to first."""
+        return self._models(model)[0]
+
+    @staticmethod
+    def _retry_after(error: Exception, attempt: int) -> float:
+        response = getattr(error, "response", None)
+        header = response.headers.get("retry-after") if response is not None else None
+        if header:
+            try:
+                return float(header)
+            except ValueError:
+                pass
+        return RETRY_BACKOFF_BASE ** attempt + random.uniform(0, 1)
+
+    async def _create(self, model_name: str, system_message: str, user_message: str, response_format: str):
+        # The static prompt goes first and alone in the system message so the provider can
+        # serve it from its prompt cache; everything call-specific belongs in user_message.
+        return await self.client.chat.completions.create(
+            model=model_name,
+            messages=[
+                {"role": "system", "content": [{"type": "text", "text": system_message}]},
+                {"role": "user", "content": [{"type": "text", "text": user_message}]},
+            ],
+            response_format={"type": response_format}
+        )
+
+    async def complete(
+        self,
+        system_message: str,
+        user_message: str,
+        response_format: str = "text",
+        model: Optional[str] = None,
+        expected_output_tokens: int = 1024
+    ) -> str:
+        """Return the completion text, retrying and falling back as needed."""
+        estimated = estimate_tokens(system_message) + estimate_tokens(user_message) + expected_output_tokens
+        last_error: Optional[Exception] = None
+
+        for model_name in self._models(model):
+            for attempt in range(1, self.max_retries + 1):
+                await self.budget.acquire(estimated)
+                try:
+                    async with self._get_semaphore():
+                        started = time.perf_counter()
+                        response = await self._create(model_name, system_message, user_message, response_format)
+                    llm_usage_tracker.record(response, model_name, (time.perf_counter() - started) * 1000)
+                    return response.choices[0].message.content
+                except RateLimitError as e:
+                    last_error = e
+                    wait_time = self._retry_after(e, attempt)
+                    logger.warning(
+                        "[LLM_GATEWAY] 429 from %s (attempt %s); retrying in %.1fs", model_name, attempt, wait_time
+                    )
+                except (APIConnectionError, APITimeoutError) as e:
+                    last_error = e
+                    wait_time = RETRY_BACKOFF_BASE ** attempt
+                    logger.warning("[LLM_GATEWAY] Connection issue with %s (attempt %s): %s", model_name, attempt, e)
+                except AuthenticationError as e:
+                    logger.error("OpenAI key or token was invalid, expired, or revoked.: %s", e)
+                    raise ValueError('OpenAI key or token was invalid, expired, or revoked.')
+                except APIStatusError as e:
+                    if e.status_code < 500:
+                        raise
+                    last_error = e
+                    wait_time = self._retry_after(e, attempt)
+                    logger.warning(
+                        "[LLM_GATEWAY] %s from %s (attempt %s); retrying in %.1fs",
+                        e.status_code, model_name, attempt, wait_time
+                    )
+                if attempt < self.max_retries:
+                    await asyncio.sleep(wait_time)
+            logger.warning("[LLM_GATEWAY] Giving up on %s after %s attempts", model_name, self.max_retries)
+
+        if isinstance(last_error, APIConnectionError):
+            raise ValueError('Issue in connecting to OpenAI API')
+        raise ValueError(f"LLM request failed after retries: {last_error}")
+
+    @staticmethod
+    def pack_batches(items: Sequence[str], token_limit: int = LLM_BATCH_TOKEN_LIMIT) -> List[List[int]]:
+        """Group item indexes so each batch's estimated tokens stay under ``token_limit`` (oversized items go alone)."""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+        for i, item in enumerate(items):
+            tokens = estimate_tokens(item)
+            if current and current_tokens + tokens > token_limit:
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def parse_json_array(content: str) -> List[Any]:
+        data = json.loads(_CODE_FENCE.sub("", (content or "").strip()))
+        if isinstance(data, dict):
+            # Some models wrap the array in an object despite the instructions.
+            data = next((v for v in data.values() if isinstance(v, list)), [data])
+        if not isinstance(data, list):
+            raise ValueError("Expected a JSON array")
+        return data
+
+    async def complete_batched(
+        self,
+        system_message: str,
+        items: Sequence[str],
+        build_user_message: Callable[[List[int]], str],
+        model: Optional[str] = None,
+        token_limit: int = LLM_BATCH_TOKEN_LIMIT
+    ) -> List[Optional[Any]]:
+        """
+        Send ``items`` (e.g. "Caption (Type) = Formula" strings) packed into as few
+        prompts as the token limit allows, concurrently. ``build_user_message``
+        receives the positions in ``items`` of one batch. Returns one entry per item,
+        in ``items`` order: ``result[i]`` is the reply element for ``items[i]``, or
+        None when that item failed.
+
+        A batch whose reply is not a valid array, or does not hold exactly one
+        element per item, is split in half and retried, so one bad formula cannot
+        spoil its neighbours; a single item is retried once before it is marked failed.
+        """
+        results: List[Optional[Any]] = [None] * len(items)
+
+        async def run_batch(indexes: List[int], retries_left: int = 1) -> None:
+            content = await self.complete(
+                system_message, build_user_message(indexes), model=model,
+                expected_output_tokens=sum(estimate_tokens(items[i]) for i in indexes) * 2
+            )
+            try:
+                entries = self.parse_json_array(content)
+                if len(entries) != len(indexes):
+                    raise ValueError(f"expected {len(indexes)} results, got {len(entries)}")
+            except ValueError as e:
+                if len(indexes) == 1:
+                    if retries_left:
+                        logger.warning("[LLM_GATEWAY] Bad response for item %s: %s; retrying", indexes[0], e)
+                        await run_batch(indexes, retries_left - 1)
+                    else:
+                        logger.error("[LLM_GATEWAY] Bad response for item %s: %s; marking failed", indexes[0], e)
+                    return
+                mid = len(indexes) // 2
+                logger.warning("[LLM_GATEWAY] Bad response for batch of %s (%s); splitting", len(indexes), e)
+                await asyncio.gather(run_batch(indexes[:mid]), run_batch(indexes[mid:]))
+                return
+            for i, entry in zip(indexes, entries):
+                results[i] = entry
+
+        batches = self.pack_batches(items, token_limit)
+        logger.info("[LLM_GATEWAY] Sending %s items in %s batches", len(items), len(batches))
+        await asyncio.gather(*(run_batch(b) for b in batches))
+        failed = sum(1 for entry in results if entry is None)
+        if failed:
+            logger.warning("[LLM_GATEWAY] %s of %s items have no result", failed, len(items))
+        return results
+
+
+llm_gateway = LLMGateway()
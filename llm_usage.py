@@ -0,0 +1,72 @@
+import threading
+from typing import Any, Dict, NamedTuple, Optional
+
+from app.core.logger_setup import logger
+from app.core.metrics import record_llm_call
+
+
+class LLMUsage(NamedTuple):
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    latency_ms: float
+
+
+class LLMUsageTracker:
+    """
+    Per-call token and latency accounting for chat completions.
+
+    ``cached_tokens`` is the part of the prompt the provider served from its
+    prompt cache (``usage.prompt_tokens_details.cached_tokens``); it only grows
+    when the system message is byte-identical across calls, which is why every
+    caller keeps static prompts in the system message and dynamic content in
+    the user message.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def extract(response: Any, model: str, latency_ms: float) -> LLMUsage:
+        usage = getattr(response, "usage", None)
+        details = getattr(usage, "prompt_tokens_details", None)
+        return LLMUsage(
+            model=getattr(response, "model", None) or model,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+            latency_ms=latency_ms,
+        )
+
+    def record(self, response: Any, model: str, latency_ms: float) -> LLMUsage:
+        usage = self.extract(response, model, latency_ms)
+        with self._lock:
+            totals = self._totals.setdefault(usage.model, {
+                "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "latency_ms": 0.0
+            })
+            totals["calls"] += 1
+            totals["prompt_tokens"] += usage.prompt_tokens
+            totals["completion_tokens"] += usage.completion_tokens
+            totals["cached_tokens"] += usage.cached_tokens
+            totals["latency_ms"] += usage.latency_ms
+        record_llm_call(usage.model, usage.latency_ms, usage.prompt_tokens, usage.completion_tokens, usage.cached_tokens)
+        logger.info(
+            "[LLM_USAGE] %s: prompt=%s (cached=%s) completion=%s latency=%.0fms",
+            usage.model, usage.prompt_tokens, usage.cached_tokens, usage.completion_tokens, usage.latency_ms
+        )
+        return usage
+
+    def summary(self, model: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """Totals per model since start-up, with the cached share of prompt tokens and mean latency."""
+        with self._lock:
+            snapshot = {name: dict(totals) for name, totals in self._totals.items() if model in (None, name)}
+        for totals in snapshot.values():
+            prompt = totals["prompt_tokens"]
+            totals["cache_hit_rate"] = round(totals["cached_tokens"] / prompt, 4) if prompt else 0.0
+            totals["avg_latency_ms"] = round(totals["latency_ms"] / totals["calls"], 1) if totals["calls"] else 0.0
+        return snapshot
+
+
+llm_usage_tracker = LLMUsageTracker()
@@ -1,23 +1,162 @@
+import os
+import sys
+import json
+import uuid
+import queue
+import atexit
+import random
 import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+# Read directly from the environment: app.core.config imports this module.
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG").upper().strip()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower().strip()  # "json" | "text"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))  # records buffered before new ones are dropped
+# e.g. "dax_graph=0.1,config=0.5": keep that fraction of a module's DEBUG/INFO records
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+TEXT_LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s"
+
+# LogRecord attributes that are not user-supplied ``extra`` fields.
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+# Arguments of these types cannot change after the call, so merging them can wait for the listener.
+_IMMUTABLE_ARG_TYPES = (str, int, float, bool, uuid.UUID, type(None))
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """Parse ``LOG_SAMPLE_RATES``; malformed entries are reported on stderr and skipped."""
+    rates = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        module, _, rate = item.partition("=")
+        try:
+            parsed = float(rate)
+        except ValueError:
+            parsed = None
+        if not module.strip() or parsed is None or parsed != parsed:
+            # The logger is not set up yet, so this cannot go through it.
+            print(f"Ignoring invalid LOG_SAMPLE_RATES entry '{item.strip()}'", file=sys.stderr)
+            continue
+        rates[module.strip()] = min(1.0, max(0.0, parsed))
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; ``extra={...}`` fields are included as keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a configured fraction of DEBUG/INFO records per module (source file).
+    Warnings and errors are never dropped.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.module)
+        return rate is None or random.random() < rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread, formatting as little as possible.
+
+    The stock QueueHandler formats the message on the calling thread. Here the
+    ``%`` arguments are only merged by the listener when they are immutable
+    scalars; anything else (dicts, lists, ORM objects...) could change before
+    the listener runs, so such messages are merged on the calling thread. A
+    full queue drops the record instead of blocking the request.
+    """
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        # A lone dict argument is stored as the mapping itself (and is mutable either way).
+        if args and (isinstance(args, dict) or not all(isinstance(arg, _IMMUTABLE_ARG_TYPES) for arg in args)):
+            record = logging.makeLogRecord(record.__dict__)
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+def _build_formatter() -> logging.Formatter:
+    if LOG_FORMAT == "text":
+        return logging.Formatter(TEXT_LOG_FORMAT)
+    return JsonFormatter()
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _start_listener() -> logging.handlers.QueueListener:
+    global _listener
+    if _listener is None:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(_build_formatter())
+        _listener = logging.handlers.QueueListener(
+            queue.Queue(maxsize=LOG_QUEUE_SIZE), console_handler, respect_handler_level=True
+        )
+        _listener.start()
+        # Flush whatever is still queued when the process exits.
+        atexit.register(_listener.stop)
+    return _listener
 
 
 def setup_logger(logger_name: str) -> logging.Logger:
     logger = logging.getLogger(logger_name)
-    logger.setLevel(logging.DEBUG)
+    level = logging.getLevelName(LOG_LEVEL)
+    logger.setLevel(level if isinstance(level, int) else logging.DEBUG)
+    logger.propagate = False
 
     # Clear existing handlers if the logger was already configured
     if logger.hasHandlers():
         logger.handlers.clear()
 
-    # Console handler for logging to stdout
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(
-        logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(filename)s:\
-                %(lineno)d - %(message)s"
-        )
-    )
-    logger.addHandler(console_handler)
+    # Records are queued here and written to stdout by a background listener thread
+    queue_handler = NonBlockingQueueHandler(_start_listener().queue)
+    sample_rates = parse_sample_rates(LOG_SAMPLE_RATES)
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+    logger.addHandler(queue_handler)
 
     return logger
 
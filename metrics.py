@@ -0,0 +1,206 @@
+import time
+import asyncio
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+from app.core.logger_setup import logger
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+except ImportError:  # optional: without prometheus_client every hook below is a no-op
+    Counter = Gauge = Histogram = generate_latest = None
+    CONTENT_TYPE_LATEST = "text/plain; charset=utf-8"
+
+METRICS_ENABLED = Histogram is not None
+
+# Pipeline stages take seconds to many minutes; storage and DB calls milliseconds to seconds.
+_STAGE_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+_IO_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+if METRICS_ENABLED:
+    PIPELINE_STAGE_SECONDS = Histogram(
+        "biport_pipeline_stage_seconds", "Duration of a pipeline stage run",
+        ["stage", "organization_id", "report_type", "status"], buckets=_STAGE_BUCKETS
+    )
+    STORAGE_OPERATION_SECONDS = Histogram(
+        "biport_storage_operation_seconds", "Latency of S3Config/BlobConfig operations",
+        ["provider", "operation", "status"], buckets=_IO_BUCKETS
+    )
+    STORAGE_BYTES = Counter(
+        "biport_storage_bytes", "Bytes moved to or from cloud storage", ["provider", "operation"]
+    )
+    DB_QUERY_SECONDS = Histogram(
+        "biport_db_query_seconds", "Latency of SQL statements", ["statement"], buckets=_IO_BUCKETS
+    )
+    DB_QUERIES_PER_REQUEST = Histogram(
+        "biport_db_queries_per_request", "SQL statements executed while serving one HTTP request",
+        ["route"], buckets=_COUNT_BUCKETS
+    )
+    DB_POOL_CONNECTIONS = Gauge(
+        "biport_db_pool_connections", "SQLAlchemy connection pool state", ["state"]
+    )
+    HTTP_REQUEST_SECONDS = Histogram(
+        "biport_http_request_seconds", "HTTP request latency", ["route", "method", "status_code"], buckets=_IO_BUCKETS
+    )
+    LLM_REQUEST_SECONDS = Histogram(
+        "biport_llm_request_seconds", "Latency of chat completion calls", ["model"], buckets=_IO_BUCKETS
+    )
+    LLM_TOKENS = Counter(
+        "biport_llm_tokens", "Tokens used by chat completion calls", ["model", "kind"]
+    )
+    QUEUE_DEPTH = Gauge(
+        "biport_queue_depth", "Tasks running or waiting in a background queue", ["queue"]
+    )
+
+# Mutable per-request query counter; the middleware sets it, SQLAlchemy hooks bump it.
+_request_queries: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("biport_request_queries", default=None)
+
+
+def organization_label(user: Any) -> str:
+    """
+    The user's organization id: scrapes then do not list customer names, and
+    reading a plain column never lazy-loads on a detached instance.
+    """
+    organization_id = getattr(user, "organization_id", None)
+    return str(organization_id) if organization_id is not None else "unknown"
+
+
+class StageTracker:
+    def __init__(self):
+        self.status = "success"
+
+    def set_status_code(self, status_code: int) -> None:
+        self.status = "success" if status_code < 400 else "error"
+
+
+@contextmanager
+def track_stage(stage: str, organization_id: str = "unknown", report_type: str = "unknown") -> Iterator[StageTracker]:
+    """
+    Time a pipeline stage (analyse, dax, migrate, semantic, prep).
+
+    An exception marks the run as an error; handlers that turn failures into
+    responses call ``set_status_code`` on the yielded tracker instead.
+    """
+    tracker = StageTracker()
+    started = time.perf_counter()
+    try:
+        yield tracker
+    except BaseException:
+        tracker.status = "error"
+        raise
+    finally:
+        if METRICS_ENABLED:
+            PIPELINE_STAGE_SECONDS.labels(stage, organization_id or "unknown", report_type or "unknown", tracker.status).observe(
+                time.perf_counter() - started
+            )
+
+
+def observe_storage_operation(
+    provider: str, operation: str, false_is_error: bool = True, none_is_error: bool = False
+) -> Callable:
+    """
+    Decorator for async S3Config/BlobConfig methods. A raised exception counts
+    as an error, and so does a ``False`` result (the helpers' failure
+    convention) unless ``false_is_error`` is off, e.g. for existence checks.
+    ``none_is_error`` does the same for helpers that return None on failure.
+    """
+    def decorator(fn: Callable) -> Callable:
+        if not METRICS_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            status = "error"
+            try:
+                result = await fn(*args, **kwargs)
+                failed = (result is False and false_is_error) or (result is None and none_is_error)
+                status = "error" if failed else "success"
+                return result
+            finally:
+                STORAGE_OPERATION_SECONDS.labels(provider, operation, status).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def record_storage_bytes(provider: str, operation: str, nbytes: Optional[int]) -> None:
+    if METRICS_ENABLED and nbytes:
+        STORAGE_BYTES.labels(provider, operation).inc(nbytes)
+
+
+def record_llm_call(model: str, latency_ms: float, prompt_tokens: int, completion_tokens: int, cached_tokens: int) -> None:
+    if not METRICS_ENABLED:
+        return
+    LLM_REQUEST_SECONDS.labels(model).observe(latency_ms / 1000)
+    LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+    LLM_TOKENS.labels(model, "cached").inc(cached_tokens)
+
+
+def register_queue_depth(queue_name: str, depth: Callable[[], float]) -> None:
+    """Report ``depth()`` as the queue's depth at every scrape."""
+    if METRICS_ENABLED:
+        QUEUE_DEPTH.labels(queue_name).set_function(depth)
+
+
+def instrument_engine(engine) -> None:
+    """Time every SQL statement, count statements per request and expose pool state."""
+    if not METRICS_ENABLED:
+        return
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("biport_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["biport_query_started"].pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_SECONDS.labels(verb).observe(time.perf_counter() - started)
+        counter = _request_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("biport_query_started"):
+            connection.info["biport_query_started"].pop()
+
+    pool = engine.pool
+    for state, method in (("size", "size"), ("checked_out", "checkedout"), ("overflow", "overflow"), ("checked_in", "checkedin")):
+        reading = getattr(pool, method, None)
+        if callable(reading):
+            DB_POOL_CONNECTIONS.labels(state).set_function(reading)
+    logger.info("[METRICS] SQLAlchemy engine instrumented")
+
+
+def begin_request() -> Tuple[contextvars.Token, list]:
+    counter = [0]
+    return _request_queries.set(counter), counter
+
+
+def end_request(token: contextvars.Token, counter: list, route: str, method: str, status_code: int, seconds: float) -> None:
+    _request_queries.reset(token)
+    if METRICS_ENABLED:
+        DB_QUERIES_PER_REQUEST.labels(route).observe(counter[0])
+        HTTP_REQUEST_SECONDS.labels(route, method, str(status_code)).observe(seconds)
+
+
+async def report_type_label(report_ids) -> str:
+    """``ReportDetailManager.get_report_type_label`` off the event loop; "unknown" if the lookup fails."""
+    from app.models.report_details import ReportDetailManager
+    try:
+        return await asyncio.to_thread(ReportDetailManager.get_report_type_label, report_ids)
+    except Exception as e:
+        logger.warning("[METRICS] Could not read report type for metrics: %s", e)
+        return "unknown"
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """The Prometheus exposition payload and its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -9,6 +9,7 @@ from app.services.migrate.migration_processor import MigrateProcessor
 from app.models.users import User
 from app.core.dependencies import get_current_user
 from app.core import logger
+from app.core.metrics import track_stage, organization_label, report_type_label
 
 
 migrate_router = APIRouter()
@@ -24,7 +25,10 @@ async def migrate_report_to_powerbi(
     logger.info(f"[Migration API] Starting migration for report_id: {report_id}, user: {user.email}")
 
     try:
-        response = await MigrateProcessor.migrate_single_report(report_id, user)
+        report_type = await report_type_label([report_id])
+        with track_stage("migrate", organization_label(user), report_type) as stage:
+            response = await MigrateProcessor.migrate_single_report(report_id, user)
+            stage.set_status_code(response.status_code)
         
         # Determine status and message based on response
         if response.status_code == 200:
@@ -0,0 +1,19 @@
+-- Org-wide cache of Tableau-to-DAX translations (app.core.dax_translation_cache.DaxTranslationCache).
+CREATE TABLE IF NOT EXISTS biporttest.dax_translation_cache (
+    id UUID PRIMARY KEY,
+    organization_id UUID NOT NULL,
+    cache_key VARCHAR(64) NOT NULL,
+    formula_hash VARCHAR(64) NOT NULL,
+    schema_fingerprint VARCHAR(64) NOT NULL,
+    prompt_version VARCHAR(32) NOT NULL,
+    model_name VARCHAR(100) NOT NULL,
+    tableau_formula TEXT NOT NULL,
+    dax_output TEXT NOT NULL,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    last_hit_at TIMESTAMP NULL,
+    CONSTRAINT uq_dax_translation_cache_org_key UNIQUE (organization_id, cache_key)
+);
+
+CREATE INDEX IF NOT EXISTS ix_dax_translation_cache_organization_id
+    ON biporttest.dax_translation_cache (organization_id);
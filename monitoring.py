@@ -0,0 +1,39 @@
+import time
+from fastapi import APIRouter, Depends, FastAPI, Request
+from fastapi.responses import Response
+
+from app.core.dependencies import require_metrics_token
+from app.core.exceptions import ServiceUnavailableError
+from app.core.metrics import METRICS_ENABLED, begin_request, end_request, render_latest
+
+monitoring_router = APIRouter()
+
+
+@monitoring_router.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+def get_metrics():
+    """Prometheus scrape endpoint; requires ``Authorization: Bearer <METRICS_TOKEN>``."""
+    if not METRICS_ENABLED:
+        raise ServiceUnavailableError("Metrics are disabled: prometheus_client is not installed")
+    payload, content_type = render_latest()
+    return Response(content=payload, media_type=content_type)
+
+
+async def metrics_middleware(request: Request, call_next):
+    """Per-request latency and SQL statement count; registered by ``setup_monitoring``."""
+    token, counter = begin_request()
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Route templates (/calc-dax/{report_id}) keep label cardinality bounded.
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        end_request(token, counter, route, request.method, status_code, time.perf_counter() - started)
+
+
+def setup_monitoring(app: FastAPI) -> None:
+    """Mount GET /metrics and the request metrics middleware; call once from the application factory."""
+    app.include_router(monitoring_router)
+    app.middleware("http")(metrics_middleware)
@@ -0,0 +1,231 @@
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, TextIO, Tuple
+
+from app.core.config import POWER_QUERY_CACHE_DIR, POWER_QUERY_CACHE_MAX_BYTES, POWER_QUERY_LEVEL_CONCURRENCY
+from app.core.logger_setup import logger
+
+# Bump when the M code emitted for an unchanged node definition changes.
+M_CODE_GENERATOR_VERSION = "1"
+
+
+def node_definition_hash(node: Any, context: str = "", upstream_hashes: Iterable[str] = ()) -> str:
+    """
+    Stable hash of a Prep node definition (key order ignored), any caller context
+    and the hashes of the nodes feeding it. A node's M code depends on its inputs'
+    columns, so an edit upstream changes the key of everything downstream.
+    """
+    canonical = json.dumps(node, sort_keys=True, separators=(",", ":"), default=str)
+    upstream = ",".join(sorted(upstream_hashes))
+    return hashlib.sha256(f"{M_CODE_GENERATOR_VERSION}|{context}|{upstream}|{canonical}".encode("utf-8")).hexdigest()
+
+
+def _prep_node_id(node: Any) -> Optional[str]:
+    return node.get("id") if isinstance(node, dict) else None
+
+
+def _prep_next_node_ids(node: Any) -> List[str]:
+    if not isinstance(node, dict):
+        return []
+    return [n["nextNodeId"] for n in node.get("nextNodes") or [] if isinstance(n, dict) and n.get("nextNodeId")]
+
+
+class MCodeCache:
+    """
+    Generated M code per node-definition hash, in memory (LRU) and on disk.
+
+    Re-running an edited flow only regenerates nodes whose definition changed;
+    everything else is served from here. Files are touched on every disk hit, and
+    once the directory grows past ``max_disk_bytes`` the least recently used are
+    deleted down to 90% of it.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = POWER_QUERY_CACHE_DIR,
+        max_memory_entries: int = 4096,
+        max_disk_bytes: int = POWER_QUERY_CACHE_MAX_BYTES
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        # get/set run in worker threads
+        self._lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None  # estimate; measured on first write
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.m"
+
+    def _remember(self, key: str, code: str) -> None:
+        with self._lock:
+            self._memory[key] = code
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            code = self._memory.get(key)
+            if code is not None:
+                self._memory.move_to_end(key)
+                return code
+        path = self._path(key)
+        try:
+            code = path.read_text(encoding="utf-8")
+            os.utime(path)
+        except OSError:
+            return None
+        self._remember(key, code)
+        return code
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        if self.cache_dir.is_dir():
+            for shard in os.scandir(self.cache_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.is_file() and entry.name.endswith(".m"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self) -> None:
+        """Delete least-recently-used files until the directory is at 90% of max_disk_bytes."""
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_disk_bytes * 0.9
+        removed = 0
+        if total > self.max_disk_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            logger.info("[PQ_CACHE] Evicted %s M code files; %s bytes left", removed, total)
+        self._disk_bytes = total
+
+    def set(self, key: str, code: str) -> None:
+        self._remember(key, code)
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            tmp_path.write_text(code, encoding="utf-8")
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("[PQ_CACHE] Could not persist M code %s: %s", key[:12], e)
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._evict()
+            else:
+                self._disk_bytes += len(code.encode("utf-8"))
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict()
+
+
+m_code_cache = MCodeCache()
+
+
+async def _generate_level(
+    nodes: Sequence[Any],
+    generate_node: Callable[[Any], Awaitable[str]],
+    cache: Optional[MCodeCache] = m_code_cache,
+    max_concurrency: int = POWER_QUERY_LEVEL_CONCURRENCY,
+    context: Callable[[Any], str] = lambda node: "",
+    upstream_hashes: Callable[[Any], Iterable[str]] = lambda node: ()
+) -> Tuple[List[str], List[str]]:
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    keys = [node_definition_hash(node, context(node), upstream_hashes(node)) for node in nodes]
+    hits = 0
+
+    async def run(node: Any, key: str) -> str:
+        nonlocal hits
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                hits += 1
+                return cached
+        async with semaphore:
+            code = await generate_node(node)
+        if cache is not None and code:
+            await asyncio.to_thread(cache.set, key, code)
+        return code
+
+    codes = await asyncio.gather(*(run(node, key) for node, key in zip(nodes, keys)))
+    logger.info("[PQ_LEVELS] Generated %s nodes (%s from cache)", len(nodes), hits)
+    return list(codes), keys
+
+
+async def generate_level(
+    nodes: Sequence[Any],
+    generate_node: Callable[[Any], Awaitable[str]],
+    cache: Optional[MCodeCache] = m_code_cache,
+    max_concurrency: int = POWER_QUERY_LEVEL_CONCURRENCY,
+    context: Callable[[Any], str] = lambda node: "",
+    upstream_hashes: Callable[[Any], Iterable[str]] = lambda node: ()
+) -> List[str]:
+    """
+    Generate M code for the nodes of one execution level concurrently.
+
+    Nodes in a level only depend on earlier levels, so they can run in any
+    order; results are returned in input order. ``context`` adds anything
+    besides the node itself that shapes its code (e.g. upstream query names)
+    to the cache key, and ``upstream_hashes`` the cache keys of its inputs.
+    """
+    codes, _ = await _generate_level(nodes, generate_node, cache, max_concurrency, context, upstream_hashes)
+    return codes
+
+
+async def generate_levels(
+    levels: Iterable[Tuple[str, Sequence[Any]]],
+    generate_node: Callable[[Any], Awaitable[str]],
+    node_id: Callable[[Any], Optional[str]] = _prep_node_id,
+    next_node_ids: Callable[[Any], Iterable[str]] = _prep_next_node_ids,
+    **kwargs
+) -> List[Tuple[str, str]]:
+    """
+    Run levels in order, each one concurrently; returns ``(level_name, code)`` blocks.
+
+    Each node's cache key includes the keys of the nodes that feed it, found
+    through ``next_node_ids`` (Prep's ``nextNodes`` by default).
+    """
+    hashes_by_id: Dict[str, str] = {}
+    parents: Dict[str, List[str]] = defaultdict(list)
+
+    def upstream_hashes(node: Any) -> List[str]:
+        return [hashes_by_id[parent] for parent in parents.get(node_id(node), ()) if parent in hashes_by_id]
+
+    blocks = []
+    for level_name, nodes in levels:
+        codes, keys = await _generate_level(nodes, generate_node, upstream_hashes=upstream_hashes, **kwargs)
+        for node, key in zip(nodes, keys):
+            current_id = node_id(node)
+            if current_id is None:
+                continue
+            hashes_by_id[current_id] = key
+            for child in next_node_ids(node):
+                parents[child].append(current_id)
+        blocks.append((level_name, "\n".join(code for code in codes if code)))
+    return blocks
+
+
+def write_power_query_blocks(blocks: Iterable[Tuple[str, str]], stream: TextIO) -> None:
+    """Write ``(level_name, code)`` blocks in the endpoint's output format without building one big string."""
+    for level_name, code in blocks:
+        stream.write(f"// ===== {level_name} =====\n")
+        stream.write(code)
+        stream.write("\n\n")
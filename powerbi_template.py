@@ -0,0 +1,282 @@
+import io
+import os
+import stat
+import time
+import uuid
+import shutil
+import asyncio
+import hashlib
+import zipfile
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from app.core.compute_pool import compute_pool
+from app.core.config import (
+    POWERBI_TEMPLATE_CACHE_DIR, POWERBI_TEMPLATE_REVALIDATE_SECONDS, POWERBI_TEMPLATE_RETAIN_SECONDS
+)
+from app.core.constants import POWER_BI_PATH, LOCAL_POWER_BI_PATH, POWERBI_TEMPLATE_LINK_SUFFIXES
+from app.core.logger_setup import logger
+
+_COMPLETE_MARKER = ".complete"
+_SUPERSEDED_MARKER = ".superseded"
+# Version key used when storage returns no ETag and nothing is cached yet. Its directory
+# cannot be validated, so it is downloaded afresh every time; the next revalidation
+# replaces it as soon as a real ETag is available.
+_UNVERSIONED = "unversioned"
+_READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+class TemplateVersion(NamedTuple):
+    etag: str
+    directory: Path
+    # Zip of the files overlays hardlink (never edited), compressed once per version.
+    base_zip: bytes
+    # relative path -> (size, mtime_ns) of every file in base_zip
+    base_entries: Dict[str, Tuple[int, int]]
+
+
+def _iter_files(root: str):
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            if name in (_COMPLETE_MARKER, _SUPERSEDED_MARKER):
+                continue
+            abs_path = os.path.join(dirpath, name)
+            yield abs_path, os.path.relpath(abs_path, root).replace(os.sep, "/")
+
+
+def _signature(abs_path: str) -> Tuple[int, int]:
+    st = os.stat(abs_path)
+    return st.st_size, st.st_mtime_ns
+
+
+def _is_linked(rel_path: str) -> bool:
+    return rel_path.lower().endswith(POWERBI_TEMPLATE_LINK_SUFFIXES)
+
+
+def extract_template(zip_path: str, target_dir: str) -> None:
+    """Extract the template and mark every file read-only; runs in the compute pool."""
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        zip_ref.extractall(target_dir)
+    for abs_path, _ in _iter_files(target_dir):
+        os.chmod(abs_path, _READ_ONLY)
+
+
+def build_base_zip(template_dir: str, arc_prefix: str) -> Tuple[bytes, Dict[str, Tuple[int, int]]]:
+    """Deflate the template files that overlays share by hardlink; runs in the compute pool."""
+    buffer = io.BytesIO()
+    entries = {}
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
+        for abs_path, rel_path in _iter_files(template_dir):
+            if not _is_linked(rel_path):
+                continue
+            entries[rel_path] = _signature(abs_path)
+            zipf.write(abs_path, f"{arc_prefix}/{rel_path}")
+    return buffer.getvalue(), entries
+
+
+def build_overlay_zip(
+    overlay_dir: str,
+    arc_prefix: str,
+    base_zip: bytes,
+    base_entries: Dict[str, Tuple[int, int]],
+    replacements: Optional[Dict[str, Optional[bytes]]] = None
+) -> bytes:
+    """
+    Zip an overlay in memory; runs in the compute pool.
+
+    When every shared file is still the template's, the precompressed base zip
+    is reused and only the copied/new files are deflated and appended.
+    Otherwise the whole overlay is zipped. ``replacements`` (e.g. from
+    ``TmdlModel.pending_entries(prefix=...)``, keyed relative to the overlay
+    root) override overlay files with in-memory content, or drop them when the
+    value is None, without writing to disk.
+    """
+    replacements = replacements or {}
+    files = dict((rel, abs_path) for abs_path, rel in _iter_files(overlay_dir))
+    for rel_path in replacements:
+        files.pop(rel_path, None)
+    unchanged = not any(rel_path in base_entries for rel_path in replacements)
+    if unchanged:
+        for rel_path, signature in base_entries.items():
+            abs_path = files.get(rel_path)
+            if abs_path is None or _signature(abs_path) != signature:
+                unchanged = False
+                break
+
+    if unchanged:
+        buffer = io.BytesIO(base_zip)
+        buffer.seek(0, io.SEEK_END)
+        mode, pending = "a", [rel for rel in files if rel not in base_entries]
+    else:
+        buffer = io.BytesIO()
+        mode, pending = "w", list(files)
+
+    with zipfile.ZipFile(buffer, mode, zipfile.ZIP_DEFLATED) as zipf:
+        for rel_path in pending:
+            zipf.write(files[rel_path], f"{arc_prefix}/{rel_path}")
+        for rel_path, data in replacements.items():
+            if data is not None:
+                zipf.writestr(f"{arc_prefix}/{rel_path}", data)
+    return buffer.getvalue()
+
+
+class PowerBITemplateCache:
+    """
+    Local, immutable copy of the Power BI template used by the prep pipeline.
+
+    The template zip is downloaded once per ETag, extracted read-only under
+    ``POWERBI_TEMPLATE_CACHE_DIR/<etag hash>`` and revalidated against storage
+    at most every ``POWERBI_TEMPLATE_REVALIDATE_SECONDS``; a superseded version
+    stays on disk for ``POWERBI_TEMPLATE_RETAIN_SECONDS`` so requests still
+    building overlays from it are not affected. Requests work on an
+    overlay: files the pipeline edits (``POWERBI_TEMPLATE_LINK_SUFFIXES``) are
+    copied, everything else is hardlinked, and the result is zipped in memory
+    reusing the precompressed shared files.
+    """
+
+    def __init__(
+        self,
+        object_key: str = POWER_BI_PATH,
+        cache_dir: str = POWERBI_TEMPLATE_CACHE_DIR,
+        arc_prefix: str = LOCAL_POWER_BI_PATH.name,
+        revalidate_seconds: int = POWERBI_TEMPLATE_REVALIDATE_SECONDS,
+        retain_seconds: int = POWERBI_TEMPLATE_RETAIN_SECONDS
+    ):
+        self.object_key = object_key
+        self.cache_dir = Path(cache_dir)
+        self.arc_prefix = arc_prefix
+        self.revalidate_seconds = revalidate_seconds
+        self.retain_seconds = retain_seconds
+        self._current: Optional[TemplateVersion] = None
+        self._checked_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _version_dir(self, etag: str) -> Path:
+        return self.cache_dir / hashlib.sha256(etag.encode("utf-8")).hexdigest()[:16]
+
+    async def get(self, storage) -> TemplateVersion:
+        """Return the current template, downloading it only when the ETag has changed."""
+        if self._current and time.monotonic() - self._checked_at < self.revalidate_seconds:
+            return self._current
+
+        async with self._get_lock():
+            if self._current and time.monotonic() - self._checked_at < self.revalidate_seconds:
+                return self._current
+
+            etag = await storage.get_object_etag(self.object_key)
+            if etag is None and self._current:
+                logger.warning("[PBI_TEMPLATE] Could not revalidate template; keeping cached copy")
+            elif etag is None:
+                logger.warning("[PBI_TEMPLATE] Template has no ETag; caching it unversioned until one is available")
+                self._current = await self._load(storage, _UNVERSIONED)
+            elif not self._current or etag != self._current.etag:
+                self._current = await self._load(storage, etag)
+            self._checked_at = time.monotonic()
+            return self._current
+
+    async def _load(self, storage, etag: str) -> TemplateVersion:
+        directory = self._version_dir(etag)
+        # A copy left by an earlier process under _UNVERSIONED may be any older template.
+        if etag == _UNVERSIONED or not (directory / _COMPLETE_MARKER).exists():
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            staging = self.cache_dir / f".staging-{uuid.uuid4().hex}"
+            zip_path = f"{staging}.zip"
+            try:
+                await storage.download_file(self.object_key, zip_path)
+                await compute_pool.run(extract_template, zip_path, str(staging))
+                (staging / _COMPLETE_MARKER).touch()
+                if directory.exists():
+                    # An incomplete, discarded or unversioned copy may still be read by an overlay; retire it.
+                    await asyncio.to_thread(self._retire, directory)
+                os.replace(staging, directory)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+                if os.path.exists(zip_path):
+                    os.remove(zip_path)
+            logger.info("[PBI_TEMPLATE] Cached template %s (ETag %s) at %s", self.object_key, etag, directory)
+
+        base_zip, base_entries = await compute_pool.run(build_base_zip, str(directory), self.arc_prefix)
+        await asyncio.to_thread(self._remove_other_versions, directory)
+        return TemplateVersion(etag, directory, base_zip, base_entries)
+
+    @staticmethod
+    def _retire(directory: Path) -> None:
+        retired = directory.with_name(f"{directory.name}.retired-{uuid.uuid4().hex[:8]}")
+        os.replace(directory, retired)
+        (retired / _SUPERSEDED_MARKER).touch()
+
+    def _remove_other_versions(self, keep: Path) -> None:
+        """
+        Mark every other version superseded and delete those superseded for longer
+        than ``retain_seconds``. A request may still be hardlinking files out of a
+        version it fetched just before the switch, so nothing is removed right away.
+        """
+        now = time.time()
+        for entry in self.cache_dir.iterdir():
+            if not entry.is_dir() or entry == keep or entry.name.startswith(".staging-"):
+                continue
+            marker = entry / _SUPERSEDED_MARKER
+            try:
+                superseded_at = marker.stat().st_mtime
+            except FileNotFoundError:
+                marker.touch()
+                continue
+            if now - superseded_at >= self.retain_seconds:
+                shutil.rmtree(entry, ignore_errors=True)
+                logger.info("[PBI_TEMPLATE] Removed superseded template version %s", entry.name)
+
+    @staticmethod
+    def _create_overlay(template_dir: Path, target_dir: Path) -> None:
+        for abs_path, rel_path in _iter_files(str(template_dir)):
+            destination = target_dir / rel_path
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            if _is_linked(rel_path):
+                try:
+                    os.link(abs_path, destination)
+                    continue
+                except OSError:
+                    pass  # e.g. scratch space on another filesystem; fall back to a copy
+            shutil.copy2(abs_path, destination)
+            os.chmod(destination, _READ_ONLY | stat.S_IWUSR)
+
+    async def create_overlay(self, storage, target_dir: Path) -> TemplateVersion:
+        """Populate ``target_dir`` with a per-request view of the template and return its version."""
+        version = await self.get(storage)
+        await asyncio.to_thread(self._create_overlay, version.directory, Path(target_dir))
+        return version
+
+    def _verify(self, version: TemplateVersion) -> None:
+        # Hardlinked files share the template's inode; an in-place write by a request would
+        # otherwise leak into every later one, so a modified template is dropped and re-fetched.
+        for rel_path, signature in version.base_entries.items():
+            try:
+                intact = _signature(version.directory / rel_path) == signature
+            except OSError:
+                intact = False
+            if not intact:
+                logger.error("[PBI_TEMPLATE] Cached template file %s was modified; discarding cache", rel_path)
+                (version.directory / _COMPLETE_MARKER).unlink(missing_ok=True)
+                if self._current is version:
+                    self._current = None
+                return
+
+    async def build_zip(
+        self,
+        version: TemplateVersion,
+        overlay_dir: Path,
+        replacements: Optional[Dict[str, Optional[bytes]]] = None
+    ) -> bytes:
+        """Zip the overlay in memory, then check that the request left the shared files untouched."""
+        data = await compute_pool.run(
+            build_overlay_zip, str(overlay_dir), self.arc_prefix, version.base_zip, version.base_entries, replacements
+        )
+        await asyncio.to_thread(self._verify, version)
+        return data
+
+
+powerbi_template_cache = PowerBITemplateCache()
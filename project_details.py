@@ -464,74 +464,125 @@ class ProjectDetailManager:
     @staticmethod
     async def process_zip_upload(extract_dir, project_id, filename, user, org_name, cloud_storage, cloud_provider, ReportDetailManager, twbx_extractor=None):
         import os
+        import asyncio
         from fastapi import HTTPException
         import uuid as uuidlib
         from app.core.session import scoped_context
-        with scoped_context() as session:
-            async def process_folder(abs_path, parent_project_id, rel_path):
-                folder_name = os.path.basename(abs_path)
-                if rel_path == '':
-                    project_name = os.path.splitext(filename)[0]
-                else:
-                    project_name = folder_name
-                if ProjectDetailManager.is_duplicate_project(project_name, user.id, parent_id=parent_project_id):
-                    raise HTTPException(status_code=409, detail=f"Project '{project_name}' already exists.")
-                project = ProjectDetailManager.add_folder(
+        from app.core.config import ZIP_UPLOAD_CONCURRENCY
+        from app.core.logger_setup import logger
+        from app.models.report_details import ReportDetail
+
+        def _normalize_name(name: str) -> str:
+            n = name.strip()
+            n = re.sub(r"\s+\.(twb|twbx)$", r".\1", n, flags=re.IGNORECASE)
+            n = re.sub(r"\s+", " ", n)
+            return n
+
+        # Walk the extracted tree up front so invalid files are rejected before anything is written.
+        # Projects are collected parents-first, which is also the order they must be inserted in.
+        projects = []
+        reports = []
+        pending_files = []
+
+        def collect_folder(abs_path, parent_project_id, rel_path):
+            project_name = os.path.splitext(filename)[0] if rel_path == '' else os.path.basename(abs_path)
+            project = ProjectDetail(
+                id=uuidlib.uuid4(),
+                name=project_name,
+                site_id=None,
+                server_id=None,
+                user_id=user.id,
+                parent_id=parent_project_id,
+                created_by=user.id,
+                updated_by=user.id,
+                is_upload=True
+            )
+            projects.append(project)
+            seen_names = set()
+            for entry in os.listdir(abs_path):
+                entry_path = os.path.join(abs_path, entry)
+                entry_rel_path = os.path.join(rel_path, entry) if rel_path else entry
+                if os.path.isdir(entry_path):
+                    collect_folder(entry_path, project.id, entry_rel_path)
+                    continue
+                if not (entry.endswith('.twb') or entry.endswith('.twbx')):
+                    raise HTTPException(status_code=400, detail=f"Invalid file '{entry_rel_path}': only .twb/.twbx files allowed.")
+
+                normalized_entry = _normalize_name(entry)
+                # Every project here is new, so the only possible duplicates come from this upload.
+                if normalized_entry in seen_names:
+                    continue
+                seen_names.add(normalized_entry)
+
+                file_ext = os.path.splitext(normalized_entry)[1].lower().replace('.', '')
+                report = ReportDetail(
                     id=uuidlib.uuid4(),
-                    name=project_name,
-                    user_id=user.id,
-                    parent_id=parent_project_id,
+                    name=normalized_entry,
+                    report_id=str(uuidlib.uuid4()),
+                    project_id=project.id,
                     created_by=user.id,
                     updated_by=user.id,
-                    is_upload=True,
-                    session=session
+                    view_count=0,
+                    report_type=file_ext if file_ext in ['twb', 'twbx'] else None
                 )
-                for entry in os.listdir(abs_path):
-                    entry_path = os.path.join(abs_path, entry)
-                    entry_rel_path = os.path.join(rel_path, entry) if rel_path else entry
-                    if os.path.isdir(entry_path):
-                        await process_folder(entry_path, project.id, entry_rel_path)
-                    else:
-                        if not (entry.endswith('.twb') or entry.endswith('.twbx')):
-                            raise HTTPException(status_code=400, detail=f"Invalid file '{entry_rel_path}': only .twb/.twbx files allowed.")
-                        
-                        def _normalize_name(name: str) -> str:
-                            n = name.strip()
-                            n = re.sub(r"\s+\.(twb|twbx)$", r".\1", n, flags=re.IGNORECASE)
-                            n = re.sub(r"\s+", " ", n)
-                            return n
-                        normalized_entry = _normalize_name(entry)
-
-                        if ReportDetailManager.is_duplicate_report(normalized_entry, project.id, user.id):
-                            continue
-                        # Extract file extension for report type (only for Tableau files)
-                        # file_ext = os.path.splitext(entry)[1].lower().replace('.', '')
-                        file_ext = os.path.splitext(normalized_entry)[1].lower().replace('.', '')
-
-                        report_type = file_ext if file_ext in ['twb', 'twbx'] else None
-                        report = ReportDetailManager.add_report(
-                            id=uuidlib.uuid4(),
-                            name=normalized_entry,
-                            report_id=str(uuidlib.uuid4()),
-                            project_id=project.id,
-                            created_by=user.id,
-                            updated_by=user.id,
-                            report_type=report_type,
-                            session=session
-                        )
-                        cloud_path = f"BI-Portfinal/{org_name}/{report.report_id}/tableau_file/{normalized_entry}"
-                        if cloud_provider == "azure":
-                            await cloud_storage.upload_to_blob(file_path=entry_path, object_name=cloud_path)
-                        else:
-                            await cloud_storage.upload_to_s3(file_path=entry_path, object_name=cloud_path)
-
-                        # Check if it's a TWBX file and extract its contents
-                        if entry.endswith('.twbx') and twbx_extractor:
-                            await twbx_extractor(entry_path, org_name, report.report_id, cloud_storage)
-                return project
-            await process_folder(extract_dir, project_id, '')
+                reports.append(report)
+                pending_files.append((entry, entry_path, normalized_entry, report.report_id))
+
+        collect_folder(extract_dir, project_id, '')
+
+        root_project = projects[0]
+        if ProjectDetailManager.is_duplicate_project(root_project.name, user.id, parent_id=project_id):
+            raise HTTPException(status_code=409, detail=f"Project '{root_project.name}' already exists.")
+
+        semaphore = asyncio.Semaphore(max(1, ZIP_UPLOAD_CONCURRENCY))
+        started_report_ids = []
+
+        async def upload_file(entry, entry_path, normalized_entry, report_id):
+            async with semaphore:
+                started_report_ids.append(report_id)
+                cloud_path = f"BI-Portfinal/{org_name}/{report_id}/tableau_file/{normalized_entry}"
+                if cloud_provider == "azure":
+                    uploaded = await cloud_storage.upload_to_blob(file_path=entry_path, object_name=cloud_path)
+                else:
+                    uploaded = await cloud_storage.upload_to_s3(file_path=entry_path, object_name=cloud_path)
+                if not uploaded:
+                    raise HTTPException(status_code=500, detail=f"Failed to upload '{normalized_entry}' to cloud storage.")
+
+                # Check if it's a TWBX file and extract its contents
+                if entry.endswith('.twbx') and twbx_extractor:
+                    await twbx_extractor(entry_path, org_name, report_id, cloud_storage)
+
+        async def remove_uploaded():
+            # Objects written for reports whose rows are being rolled back.
+            for report_id in started_report_ids:
+                prefix = f"BI-Portfinal/{org_name}/{report_id}/"
+                try:
+                    keys = list(await cloud_storage.list_objects(prefix))
+                    if keys:
+                        await cloud_storage.delete_objects(keys)
+                except Exception as e:
+                    logger.error(f"[ZIP_UPLOAD] Could not clean up {prefix}: {e}")
+
+        with scoped_context() as session:
+            # Same-mapper rows are inserted in add order (parents before children),
+            # and reports after their projects, all in a single flush.
+            session.add_all(projects)
+            session.add_all(reports)
+            session.flush()
+
+            tasks = [asyncio.create_task(upload_file(*item)) for item in pending_files]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # One failed upload fails the whole zip: stop the rest before rolling back.
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                session.rollback()
+                await remove_uploaded()
+                raise
             session.commit()
-    
+
     @staticmethod
     def get_sub_projects_with_reports(parent_ids: list[UUID]):
         from app.models.report_details import ReportDetail
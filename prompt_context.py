@@ -0,0 +1,93 @@
+import json
+from typing import Any, Dict, Iterable, List, Set
+
+from app.core.field_reference import iter_field_references
+
+# Keys tried, in order, for a column's name in metadata entries.
+_NAME_KEYS = ("caption", "name", "column", "column_name")
+
+
+def referenced_fields(formulas: Iterable[str]) -> Set[str]:
+    """Names of every field referenced by ``formulas`` (brackets stripped)."""
+    return {reference.name for formula in formulas for reference in iter_field_references(formula or "")}
+
+
+def _entry_names(entry: Dict[str, Any]) -> Set[str]:
+    return {str(entry[key]).strip("[]") for key in _NAME_KEYS if entry.get(key)}
+
+
+def prune_metadata(metadata: Any, formulas: Iterable[str]) -> Any:
+    """
+    Keep only the columns the formulas reference.
+
+    Accepts a list of column dicts, a ``{field_name: info}`` dict, or a
+    ``{table: [column dicts]}`` dict, and returns the same shape. Anything
+    else is returned unchanged.
+    """
+    names = referenced_fields(formulas)
+
+    def keep(columns: list) -> list:
+        return [c for c in columns if isinstance(c, dict) and _entry_names(c) & names]
+
+    if isinstance(metadata, list):
+        return keep(metadata)
+    if isinstance(metadata, dict):
+        if metadata and all(isinstance(v, list) for v in metadata.values()):
+            pruned = {table: keep(columns) for table, columns in metadata.items()}
+            return {table: columns for table, columns in pruned.items() if columns}
+        return {key: info for key, info in metadata.items()
+                if key.strip("[]") in names or (isinstance(info, dict) and _entry_names(info) & names)}
+    return metadata
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    return str(value).replace("\\", "\\\\").replace("|", "\\|").replace("\n", " ")
+
+
+def encode_metadata(metadata: Any) -> str:
+    """
+    Encode column metadata as a pipe-separated table: one header line with the
+    union of keys, then one line per column. For column lists this is a third
+    or less of the tokens of the equivalent JSON.
+    """
+    rows: List[Dict[str, Any]] = []
+    if isinstance(metadata, list):
+        rows = [c for c in metadata if isinstance(c, dict)]
+    elif isinstance(metadata, dict):
+        for key, value in metadata.items():
+            if isinstance(value, list):
+                rows.extend({"table": key, **c} for c in value if isinstance(c, dict))
+            elif isinstance(value, dict):
+                rows.append({"name": key, **value})
+            else:
+                rows.append({"name": key, "value": value})
+    elif isinstance(metadata, str):
+        return metadata
+    if not rows:
+        return "(no referenced columns)"
+
+    header: List[str] = []
+    for row in rows:
+        header.extend(k for k in row if k not in header)
+    lines = ["|".join(header)]
+    lines.extend("|".join(_cell(row.get(k)) for k in header) for row in rows)
+    return "\n".join(lines)
+
+
+def metadata_for_formulas(metadata: Any, formulas: Iterable[str]) -> str:
+    """Pruned, compactly encoded metadata for the formulas in one prompt."""
+    if isinstance(metadata, str):
+        return metadata
+    return encode_metadata(prune_metadata(metadata, list(formulas)))
+
+
+def json_metadata_for_formulas(metadata: Any, formulas: Iterable[str]) -> str:
+    """
+    Pruned metadata kept as JSON, for prompts built on ``OPENAI_PBI_PROMPT``,
+    whose input section still announces a JSON schema.
+    """
+    if isinstance(metadata, str):
+        return metadata
+    return json.dumps(prune_metadata(metadata, list(formulas)), ensure_ascii=False, separators=(",", ":"))
@@ -1,3 +1,4 @@
+import re
 from enum import Enum
 
 
@@ -17,3 +18,27 @@ class Regex(Enum):
     COLUMNS_IN_WS = r'\[(?!federated\.)[^\]]+\]'
     LIST_IN_LIST_FOLLOWED = r'\[[^\]]+\]'
     STARTS_WITH_COLON_IN_LIST = r'^\[[^:]+:[^:]+:[^\]]+\]$'
+    # Optional "[datasource]." prefix followed by "[field]"; "]]" is Tableau's escaped "]".
+    FIELD_REFERENCE = r'(?:\[(?P<datasource>(?:[^\]]|\]\])*)\]\.)?\[(?P<field>(?:[^\]]|\]\])*)\]'
+
+    @property
+    def compiled(self) -> "re.Pattern":
+        """The member's pattern compiled once; only members that are regular expressions have one."""
+        pattern = _COMPILED.get(self)
+        if pattern is None:
+            if self.name not in _PATTERN_MEMBERS:
+                raise ValueError(f"Regex.{self.name} is a literal separator, not a pattern")
+            pattern = _COMPILED[self] = re.compile(self.value)
+        return pattern
+
+
+# Members whose values are regular expressions; the rest are literal strings used with str methods.
+_PATTERN_MEMBERS = frozenset({
+    "BETWEEN_SQUARE_BRACKETS",
+    "BETWEEN_SQUARE_BRACKETS_FOLLOWED_BY_DOT",
+    "COLUMNS_IN_WS",
+    "LIST_IN_LIST_FOLLOWED",
+    "STARTS_WITH_COLON_IN_LIST",
+    "FIELD_REFERENCE",
+})
+_COMPILED: dict = {}
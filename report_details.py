@@ -3,7 +3,7 @@ import asyncio
 import os
 from datetime import datetime
 from fastapi import BackgroundTasks
-from sqlalchemy import Column, DateTime, Enum, String, Boolean, Integer, ForeignKey, func, text, or_, case
+from sqlalchemy import Column, DateTime, Enum, String, Boolean, Integer, ForeignKey, func, text, or_, case, bindparam
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship, Query, joinedload, aliased
 from sqlalchemy import Enum as PgEnum
@@ -22,6 +22,9 @@ from app.models.duplicate_analysis import DuplicateAnalysisManager
 from app.models.report_logs import ReportLog
 import threading
 import queue
+from app.core.config import STORAGE_MOVE_TIMEOUT
+from app.core.constants import REPORT_PATH
+from app.core.exceptions import StorageMoveError, NotFoundError, ConflictError
 
 class ReportDetail(Base, AuditMixin):
     __tablename__ = "report_details"
@@ -111,7 +114,7 @@ class ReportDetailManager:
                 # Parse ISO format timestamp from Tableau (e.g., "2025-08-15T08:57:58Z")
                 created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
             except ValueError as e:
-                logger.warning(f"Failed to parse created_at timestamp '{created_at}': {e}")
+                logger.warning("Failed to parse created_at timestamp '%s': %s", created_at, e)
                 created_at = None
                 
         if updated_at and isinstance(updated_at, str):
@@ -119,7 +122,7 @@ class ReportDetailManager:
                 # Parse ISO format timestamp from Tableau (e.g., "2025-08-15T08:57:59Z")
                 updated_at = datetime.fromisoformat(updated_at.replace('Z', '+00:00'))
             except ValueError as e:
-                logger.warning(f"Failed to parse updated_at timestamp '{updated_at}': {e}")
+                logger.warning("Failed to parse updated_at timestamp '%s': %s", updated_at, e)
                 updated_at = None
         
         if session is None:
@@ -185,7 +188,7 @@ class ReportDetailManager:
         if not updates:
             return 0
 
-        logger.info(f"Updating last viewed dates for {len(updates)} reports.")
+        logger.info("Updating last viewed dates for %s reports.", len(updates))
         updated_count = 0
         
         with scoped_context() as session:
@@ -205,13 +208,13 @@ class ReportDetailManager:
                     )
                     updated_count += result
                 except ValueError:
-                    logger.warning(f"Invalid UUID format for report_id: {item.get('report_id')}")
+                    logger.warning("Invalid UUID format for report_id: %s", item.get('report_id'))
                 except Exception as e:
-                    logger.error(f"Error updating report {item.get('report_id')}: {e}")
+                    logger.error("Error updating report %s: %s", item.get('report_id'), e)
             
             session.commit()
             
-        logger.info(f"Successfully updated {updated_count} reports with last viewed dates.")
+        logger.info("Successfully updated %s reports with last viewed dates.", updated_count)
         return updated_count
 
     @staticmethod
@@ -226,7 +229,7 @@ class ReportDetailManager:
         if not updates:
             return 0
 
-        logger.info(f"Updating tableau_usercount for {len(updates)} reports.")
+        logger.info("Updating tableau_usercount for %s reports.", len(updates))
         updated_count = 0
         
         with scoped_context() as session:
@@ -246,14 +249,90 @@ class ReportDetailManager:
                     )
                     updated_count += result
                 except ValueError:
-                    logger.warning(f"Invalid UUID format for report_id: {item.get('report_id')}")
+                    logger.warning("Invalid UUID format for report_id: %s", item.get('report_id'))
                 except Exception as e:
-                    logger.error(f"Error updating report {item.get('report_id')}: {e}")
+                    logger.error("Error updating report %s: %s", item.get('report_id'), e)
                     raise e
             
             session.commit()
             
-        logger.info(f"Successfully updated {updated_count} reports with last viewed dates.")
+        logger.info("Successfully updated %s reports with last viewed dates.", updated_count)
+        return updated_count
+
+    @staticmethod
+    def update_usage_statistics(updates: list[dict]):
+        """
+        Bulk-updates view_count and tableau_report_last_viewed for a list of reports.
+
+        Rows are grouped by the columns they carry and written with one executemany
+        UPDATE per group instead of a query per report. Rows with an invalid report_id
+        or view_count are skipped, and if a group's bulk UPDATE still fails it is
+        retried row by row so one bad row cannot sink the batch.
+
+        Returns the number of rows submitted without error; a report_id that matches
+        no report still counts, since executemany does not report per-row matches.
+
+        Args:
+            updates: List of dictionaries containing 'report_id' and at least one of
+                'view_count' / 'last_viewed'.
+        """
+        if not updates:
+            return 0
+
+        columns = {"view_count": "view_count", "last_viewed": "tableau_report_last_viewed"}
+        groups: dict[tuple, list[dict]] = {}
+        for item in updates:
+            report_id_val = item.get("report_id")
+            if not report_id_val:
+                continue
+            try:
+                report_id_val = report_id_val if isinstance(report_id_val, uuid.UUID) else uuid.UUID(str(report_id_val))
+                if item.get("view_count") is not None:
+                    item = {**item, "view_count": int(item["view_count"])}
+            except (ValueError, TypeError):
+                logger.warning("Invalid usage statistics row for report_id: %s", item.get('report_id'))
+                continue
+            present = tuple(key for key in columns if item.get(key) is not None)
+            if not present:
+                continue
+            row = {"b_report_id": report_id_val}
+            row.update({f"b_{key}": item[key] for key in present})
+            groups.setdefault(present, []).append(row)
+
+        logger.info("Bulk updating usage statistics for %s reports.", sum(len(rows) for rows in groups.values()))
+        updated_count = 0
+        table = ReportDetail.__table__
+
+        with scoped_context() as session:
+            try:
+                for present, rows in groups.items():
+                    stmt = (
+                        table.update()
+                        .where(table.c.report_id == bindparam("b_report_id"))
+                        .values({columns[key]: bindparam(f"b_{key}") for key in present})
+                    )
+                    try:
+                        with session.begin_nested():
+                            session.connection().execute(stmt, rows)
+                        # rowcount is unreliable for executemany under psycopg2's batch mode,
+                        # so the count is of rows submitted, not rows matched.
+                        updated_count += len(rows)
+                    except Exception as e:
+                        logger.warning("Bulk usage update failed (%s); retrying %s rows individually", e, len(rows))
+                        for row in rows:
+                            try:
+                                with session.begin_nested():
+                                    session.connection().execute(stmt, row)
+                                updated_count += 1
+                            except Exception as row_error:
+                                logger.error("Error updating report %s: %s", row['b_report_id'], row_error)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error("Error bulk updating usage statistics: %s", e)
+                raise
+
+        logger.info("Successfully submitted usage statistics for %s reports.", updated_count)
         return updated_count
 
     # @staticmethod
@@ -294,6 +373,18 @@ class ReportDetailManager:
             reports = session.query(ReportDetail.id).filter(ReportDetail.project_id.in_(project_ids)).all()
             return [report[0] for report in reports]
 
+    @staticmethod
+    def get_report_type_label(report_ids) -> str:
+        """Report type of the given reports for metrics labels ("mixed" when they differ)."""
+        if not report_ids:
+            return "unknown"
+        with scoped_context() as session:
+            rows = session.query(ReportDetail.report_type).filter(ReportDetail.id.in_(report_ids)).distinct().all()
+        types = {row[0] or "unknown" for row in rows}
+        if len(types) == 1:
+            return types.pop()
+        return "mixed" if types else "unknown"
+
            
 
       
@@ -320,7 +411,7 @@ class ReportDetailManager:
 
                 return "/".join(path_parts)
         except Exception as e:
-            logger.exception(f"Failed to build project path for project_id {project_id}: {e}")
+            logger.exception("Failed to build project path for project_id %s: %s", project_id, e)
             return ""
     
     @staticmethod
@@ -343,7 +434,7 @@ class ReportDetailManager:
 
                 return current_project.name.strip() if current_project else ""
         except Exception as e:
-            logger.exception(f"Failed to get root project name for project_id {project_id}: {e}")
+            logger.exception("Failed to get root project name for project_id %s: %s", project_id, e)
             return ""
 
 
@@ -363,9 +454,9 @@ class ReportDetailManager:
                         db_report.report_status = ReportStatusEnum.ANALYSIS_FAILED.value
 
                     session.commit()
-                    logger.info(f"Report {report_id} marked as analyzed: {status.value}")
+                    logger.info("Report %s marked as analyzed: %s", report_id, status.value)
         except Exception as e:
-            logger.exception(f"Failed to update analyzed status for report {report_id}: {e}")
+            logger.exception("Failed to update analyzed status for report %s: %s", report_id, e)
 
 
     @staticmethod
@@ -383,9 +474,9 @@ class ReportDetailManager:
                         db_report.report_status = ReportStatusEnum.DAX_CALCULATION_FAILED.value
 
                     session.commit()
-                    logger.info(f"Report {report_id} marked as converted (DAX): {status.value}")
+                    logger.info("Report %s marked as converted (DAX): %s", report_id, status.value)
         except Exception as e:
-            logger.exception(f"Failed to update converted status for report {report_id}: {e}")
+            logger.exception("Failed to update converted status for report %s: %s", report_id, e)
 
 
     @staticmethod
@@ -403,9 +494,9 @@ class ReportDetailManager:
                         db_report.report_status = ReportStatusEnum.MIGRATION_FAILED.value
 
                     session.commit()
-                    logger.info(f"Report {report_id} marked as migrated: {status.value}")
+                    logger.info("Report %s marked as migrated: %s", report_id, status.value)
         except Exception as e:
-            logger.exception(f"Failed to update migrated status for report {report_id}: {e}")
+            logger.exception("Failed to update migrated status for report %s: %s", report_id, e)
 
 
     @staticmethod
@@ -423,9 +514,9 @@ class ReportDetailManager:
                         db_report.report_status = ReportStatusEnum.SEMANTIC_MODEL_FAILED
 
                     session.commit()
-                    logger.info(f"Report {report_id} marked as semantic: {status.value}")
+                    logger.info("Report %s marked as semantic: %s", report_id, status.value)
         except Exception as e:
-            logger.exception(f"Failed to update semantic status for report {report_id}: {e}")
+            logger.exception("Failed to update semantic status for report %s: %s", report_id, e)
 
 
     # @staticmethod
@@ -556,6 +647,11 @@ class ReportDetailManager:
         Hard delete a report along with its analysis and logs.
         Archives all storage objects to an archive folder and deletes originals.
         Works for AWS S3 and Azure Blob based on CLOUD_PROVIDER.
+
+        The database rows are only deleted once the archive move has finished.
+        If it fails (or times out), the report is kept and StorageMoveError is
+        raised (logged in background mode); deleting the report again resumes
+        the move from its manifest.
         """
 
         class StorageManager:
@@ -571,145 +667,90 @@ class ReportDetailManager:
                     raise ValueError(f"Unsupported CLOUD_PROVIDER={self.provider}")
 
             async def archive_and_delete(self, org_name, report_id):
-                if self.provider == "aws":
-                    await self._archive_and_delete_s3(org_name, report_id)
-                else:
-                    await self._archive_and_delete_blob(org_name, report_id)
-
-            async def _archive_and_delete_s3(self, org_name, report_id):
-                import aioboto3
-
-                bucket = self.config.bucket_name
+                # Server-side prefix move: parallel copies, batched deletes, resumable via its manifest.
                 source_prefix = f"BI-Portfinal/{org_name}/{report_id}/"
                 archive_prefix = f"BI-Portfinal/Archive/{org_name}/{report_id}/"
+                manifest = await self.config.rename_prefix(source_prefix, archive_prefix)
+                logger.info("[soft_delete_report] Archived %s object(s) to %s", len(manifest['objects']), archive_prefix)
 
-                session = aioboto3.Session()
-                async with session.client("s3") as s3:
-                    paginator = s3.get_paginator("list_objects_v2")
-                    async for result in paginator.paginate(Bucket=bucket, Prefix=source_prefix):
-                        for obj in result.get("Contents", []):
-                            source_key = obj["Key"]
-                            dest_key = source_key.replace(source_prefix, archive_prefix, 1)
-
-                            logger.info(f"[S3] Copy {source_key} → {dest_key}")
-                            await s3.copy_object(
-                                Bucket=bucket,
-                                CopySource={"Bucket": bucket, "Key": source_key},
-                                Key=dest_key,
-                            )
-
-                            logger.info(f"[S3] Delete {source_key}")
-                            await s3.delete_object(Bucket=bucket, Key=source_key)
-
-            async def _archive_and_delete_blob(self, org_name, report_id):
-                from azure.storage.blob.aio import BlobServiceClient
-                try:
-                    blob_service: BlobServiceClient = self.config.get_blob_client()
-                    container_client = blob_service.get_container_client(self.config.container_name)
-                except Exception as e:
-                    logger.error(f"[Blob] Failed to connect to Azure Blob Storage: {e}")
-                    raise
-
-                source_prefix = f"BI-Portfinal/{org_name}/{report_id}/"
-                archive_prefix = f"BI-Portfinal/Archive/{org_name}/{report_id}/"
-
-                failed_blobs = []
-                
-                async for blob in container_client.list_blobs(name_starts_with=source_prefix):
-                    source_blob = blob.name
-                    dest_blob = source_blob.replace(source_prefix, archive_prefix, 1)
-
-                    try:
-                        source_client = container_client.get_blob_client(source_blob)
-                        source_url = source_client.url
-                        dest_client = container_client.get_blob_client(dest_blob)
-
-                        # Start the copy
-                        try:
-                            await dest_client.start_copy_from_url(source_url)
-
-                            # Poll copy status with timeout
-                            max_wait = 30  # 30 seconds max
-                            waited = 0
-                            props = await dest_client.get_blob_properties()
-                            
-                            while props.copy.status == "pending" and waited < max_wait:
-                                await asyncio.sleep(1)
-                                waited += 1
-                                props = await dest_client.get_blob_properties()
-
-                        except Exception:
-                            pass
-
-                        await container_client.delete_blob(source_blob)
-                        
-                    except Exception:
-                        failed_blobs.append(source_blob)
-                        continue
-                    
-                if failed_blobs:
-                    raise Exception(f"Failed to delete {len(failed_blobs)} blob(s)")
-
+        def delete_records():
+            with scoped_context() as session:
+                report = session.query(ReportDetail).filter(ReportDetail.id == report_id).first()
+                if not report:
+                    return
+                # Delete logs and analysis
+                session.query(ReportLog).filter(ReportLog.report_id == report_id).delete(synchronize_session=False)
+                session.query(ReportAnalysis).filter(ReportAnalysis.report_id == report_id).delete(synchronize_session=False)
+                DuplicateAnalysisManager.delete_duplicate_analysis(report.id)
+                # Delete report record
+                session.delete(report)
+                session.commit()
+                logger.info("[soft_delete_report] Successfully deleted report_id=%s from DB", report_id)
 
         with scoped_context() as session:
             report = session.query(ReportDetail).filter(ReportDetail.id == report_id).first()
             if not report:
-                logger.warning(f"[soft_delete_report] Report not found in DB for report_id={report_id}")
+                logger.warning("[soft_delete_report] Report not found in DB for report_id=%s", report_id)
                 return {"message": "Report not found", "report_id": report_id}
+            s3_report_id = report.report_id
 
-            # Delete logs and analysis
-            session.query(ReportLog).filter(ReportLog.report_id == report_id).delete(synchronize_session=False)
-            session.query(ReportAnalysis).filter(ReportAnalysis.report_id == report_id).delete(synchronize_session=False)
-            DuplicateAnalysisManager.delete_duplicate_analysis(report.id)
+        storage = StorageManager()
 
-            storage = StorageManager()
+        async def run_storage_tasks():
+            await storage.archive_and_delete(org_name, s3_report_id)
 
-            async def run_storage_tasks():
+        # Run async safely
+        if background_tasks:
+            async def archive_then_delete():
                 try:
-                    await storage.archive_and_delete(org_name, report.report_id)
+                    await run_storage_tasks()
                 except Exception as e:
-                    logger.error(f"[soft_delete_report] Archive/delete failed: {e}")
+                    logger.error(
+                        "[soft_delete_report] Archive failed for report_id=%s; report kept, "
+                        "delete it again to resume the move: %s",
+                        report_id, e
+                    )
+                    return
+                await asyncio.to_thread(delete_records)
 
-            # Run async safely
-            if background_tasks:
-                background_tasks.add_task(run_storage_tasks)
-            else:
-                # When called synchronously (e.g., from delete-server), run archive in a new thread
-                error_queue = queue.Queue()
+            background_tasks.add_task(archive_then_delete)
+            return {"message": "Report deleted successfully", "report_id": report_id}
 
-                def run_in_thread():
-                    try:
-                        new_loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(new_loop)
-                        try:
-                            new_loop.run_until_complete(run_storage_tasks())
-                        finally:
-                            new_loop.close()
-                    except Exception as e:
-                        logger.error(f"[soft_delete_report] Thread execution failed: {e}")
-                        logger.exception(e)
-                        error_queue.put(e)
-                
-                thread = threading.Thread(target=run_in_thread)
-                thread.start()
-                thread.join(timeout=300)  # Wait for archive to complete before continuing
-
-                if thread.is_alive():
-                    logger.error(f"[soft_delete_report] Archive/delete operation timed out...")
-                    raise TimeoutError(f"Archive/delete operation timed out for report {report.report_id}")
-
-                # Check if there were any errors in the thread
-                if not error_queue.empty():
-                    error = error_queue.get()
-                    logger.error(f"[soft_delete_report] Archive/delete failed with error: {error}")
-                    raise error
-
-            # Delete report record
-            session.delete(report)
-            session.commit()
-            logger.info(f"[soft_delete_report] Successfully deleted report_id={report_id} from DB")
+        # When called synchronously (e.g., from delete-server), run archive in a new thread
+        error_queue = queue.Queue()
 
-            return {"message": "Report deleted successfully", "report_id": report_id}
+        def run_in_thread():
+            try:
+                new_loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(new_loop)
+                try:
+                    new_loop.run_until_complete(run_storage_tasks())
+                finally:
+                    new_loop.close()
+            except Exception as e:
+                logger.error("[soft_delete_report] Thread execution failed: %s", e)
+                logger.exception(e)
+                error_queue.put(e)
+
+        thread = threading.Thread(target=run_in_thread)
+        thread.start()
+        # Blob copies are each polled for up to BLOB_COPY_WAIT_SECONDS, so wait longer than that.
+        thread.join(timeout=STORAGE_MOVE_TIMEOUT)
+
+        if thread.is_alive():
+            logger.error("[soft_delete_report] Archive/delete operation timed out; report kept")
+            raise StorageMoveError(f"Archive/delete operation timed out for report {s3_report_id}; retry to resume")
+
+        # Check if there were any errors in the thread
+        if not error_queue.empty():
+            error = error_queue.get()
+            logger.error("[soft_delete_report] Archive/delete failed with error: %s; report kept", error)
+            if isinstance(error, StorageMoveError):
+                raise error
+            raise StorageMoveError(f"Archive/delete failed for report {s3_report_id}: {error}") from error
+
+        delete_records()
+        return {"message": "Report deleted successfully", "report_id": report_id}
 
     @staticmethod
     def update_report_name(report_id: uuid.UUID, new_name: str):
@@ -722,7 +763,52 @@ class ReportDetailManager:
             report.name = new_name
             session.commit()
             session.refresh(report)
+            # The stored tableau_file key is derived from the report name.
+            from app.core.workbook_cache import workbook_cache
+            workbook_cache.invalidate_report(report.report_id)
+            return report
+
+    @staticmethod
+    async def rename_report(report_id: uuid.UUID, new_name: str, user: User):
+        """
+        Rename a report of the user's organization and move its uploaded workbook
+        to the matching tableau_file key.
+
+        Raises NotFoundError when the report does not exist or belongs to another
+        organization, and ConflictError when the project already has a report of
+        that name. The workbook object is moved server-side first, then the name
+        is saved; if saving fails the object is moved back. Outputs that embed the
+        report name (analysed/migrated zips) keep their old keys until they are
+        regenerated. Returns the updated report.
+        """
+        from app.models.organization_details import OrganizationDetailManager
+
+        report = await asyncio.to_thread(ReportDetailManager.get_report_for_organization, report_id, user.organization_id)
+        if not report:
+            raise NotFoundError("Report not found")
+        if report.name == new_name:
             return report
+        if await asyncio.to_thread(ReportDetailManager.is_duplicate_report, new_name, report.project_id, user.id):
+            raise ConflictError(f"Report '{new_name}' already exists")
+
+        # Loaded by id: user.organization would lazy-load on a detached instance.
+        org_name = await asyncio.to_thread(OrganizationDetailManager.get_name_by_id, user.organization_id)
+        if os.getenv("CLOUD_PROVIDER", "aws").lower().strip() == "azure":
+            from app.core.config import BlobConfig
+            storage = BlobConfig()
+        else:
+            from app.core.config import S3Config
+            storage = S3Config()
+        base_path = REPORT_PATH.format(organization_name=org_name, s3_report_id=report.report_id)
+        old_key, new_key = f"{base_path}/{report.name}", f"{base_path}/{new_name}"
+        moved = await storage.rename_object(old_key, new_key)
+        try:
+            return await asyncio.to_thread(ReportDetailManager.update_report_name, report_id, new_name)
+        except Exception:
+            logger.error("[rename_report] Saving name failed for report_id=%s; moving workbook back", report_id)
+            if moved:
+                await storage.rename_object(new_key, old_key)
+            raise
 
     @staticmethod
     def is_duplicate_report(name: str, project_id: uuid.UUID, user_id: uuid.UUID) -> bool:
@@ -742,6 +828,18 @@ class ReportDetailManager:
         with scoped_context() as session:
             return session.query(ReportDetail).filter(ReportDetail.id == report_id).first()
 
+    @staticmethod
+    def get_report_for_organization(report_id: uuid.UUID, organization_id: uuid.UUID):
+        """The report, or None when it does not exist or its project belongs to another organization."""
+        with scoped_context() as session:
+            return session.query(ReportDetail).join(
+                ProjectDetail, ReportDetail.project_id == ProjectDetail.id
+            ).join(ProjectDetail.creator).filter(
+                ReportDetail.id == report_id,
+                ReportDetail.is_deleted == False,
+                User.organization_id == organization_id
+            ).first()
+
     @staticmethod
     def get_reports_with_context(parent_ids: list[UUID]):
         with scoped_context() as session:
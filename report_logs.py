@@ -99,7 +99,7 @@ class ReportLogManager:
                     )
                     db_session.add(log_entry)
                     db_session.commit()
-                    logger.info(f"Created report log: {normalized_status} - {message} for report {report_id}")
+                    logger.info("Created report log: %s - %s for report %s", normalized_status, message, report_id)
                     return log_entry
             else:
                 log_entry = ReportLog(
@@ -111,10 +111,10 @@ class ReportLogManager:
                 )
                 session.add(log_entry)
                 session.commit()
-                logger.info(f"Created report log: {normalized_status} - {message} for report {report_id}")
+                logger.info("Created report log: %s - %s for report %s", normalized_status, message, report_id)
                 return log_entry
         except Exception as e:
-            logger.error(f"Failed to create report log: {e}", exc_info=True)
+            logger.error("Failed to create report log: %s", e, exc_info=True)
             if session:
                 session.rollback()
             raise
@@ -149,7 +149,7 @@ class ReportLogManager:
             return logs
             
         except Exception as e:
-            logger.error(f"Failed to get report logs: {e}", exc_info=True)
+            logger.error("Failed to get report logs: %s", e, exc_info=True)
             raise
 
     @staticmethod
@@ -0,0 +1,153 @@
+import os
+import time
+import uuid
+import shutil
+import asyncio
+import threading
+from pathlib import Path
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from app.core.config import logger, SCRATCH_ROOT, SCRATCH_TMPFS_ROOT, SCRATCH_QUOTA_BYTES, SCRATCH_USAGE_TTL
+from app.core.exceptions import ServiceUnavailableError
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except FileNotFoundError:
+                        continue
+        except FileNotFoundError:
+            continue
+    return total
+
+
+class ScratchWorkspace:
+    """A private working directory for one job; removed when its last holder releases it."""
+
+    def __init__(self, manager: "ScratchManager", job_id: str, path: Path, quota_bytes: int):
+        self.manager = manager
+        self.job_id = job_id
+        self.path = path
+        self.quota_bytes = quota_bytes
+        self.refcount = 0
+
+    def __truediv__(self, other) -> Path:
+        return self.path / other
+
+    def usage(self) -> int:
+        return _directory_size(str(self.path))
+
+    def ensure_capacity(self, required_bytes: int) -> None:
+        """Raise before a large write that would push this workspace's root over its quota."""
+        self.manager.ensure_capacity(self.path.parent, required_bytes)
+
+    def acquire(self) -> "ScratchWorkspace":
+        self.manager._acquire(self)
+        return self
+
+    def release(self) -> None:
+        self.manager._release(self)
+
+
+class ScratchManager:
+    """
+    Hands out unique per-job scratch directories under ``SCRATCH_ROOT``.
+
+    Each job gets its own directory named by a full UUID, so concurrent requests
+    never share (or delete) each other's files. Workspaces are reference counted:
+    background work can ``share`` a request's workspace and it is removed only
+    when the last holder releases it. Creation is refused with 503 while the
+    root is over ``SCRATCH_QUOTA_BYTES``; the root's size is measured at most
+    every ``SCRATCH_USAGE_TTL`` seconds. Async callers use ``async_workspace``
+    so the measuring and the final ``rmtree`` run in a worker thread.
+    """
+
+    def __init__(self, root: str = SCRATCH_ROOT, tmpfs_root: Optional[str] = SCRATCH_TMPFS_ROOT, quota_bytes: int = SCRATCH_QUOTA_BYTES):
+        self.root = Path(root)
+        self.tmpfs_root = Path(tmpfs_root) if tmpfs_root else None
+        self.quota_bytes = quota_bytes
+        self._lock = threading.Lock()
+        self._workspaces: Dict[str, ScratchWorkspace] = {}
+        # root -> (measured_at, bytes used)
+        self._usage: Dict[Path, Tuple[float, int]] = {}
+
+    def _root_usage(self, root: Path) -> int:
+        with self._lock:
+            cached = self._usage.get(root)
+        if cached and time.monotonic() - cached[0] < SCRATCH_USAGE_TTL:
+            return cached[1]
+        used = _directory_size(str(root)) if root.exists() else 0
+        with self._lock:
+            self._usage[root] = (time.monotonic(), used)
+        return used
+
+    def ensure_capacity(self, root: Path, required_bytes: int = 0) -> None:
+        used = self._root_usage(root)
+        if used + required_bytes > self.quota_bytes:
+            logger.warning("[SCRATCH] Quota exceeded on %s: %s bytes used, %s requested", root, used, required_bytes)
+            raise ServiceUnavailableError(detail="Scratch storage is full; please retry shortly")
+
+    def create(self, prefix: str = "job", tmpfs: bool = False) -> ScratchWorkspace:
+        root = self.tmpfs_root if tmpfs and self.tmpfs_root else self.root
+        self.ensure_capacity(root)
+        job_id = f"{prefix}-{uuid.uuid4().hex}"
+        path = root / job_id
+        path.mkdir(parents=True, exist_ok=False)
+        workspace = ScratchWorkspace(self, job_id, path, self.quota_bytes)
+        with self._lock:
+            self._workspaces[job_id] = workspace
+        logger.info("[SCRATCH] Created workspace %s", path)
+        return workspace.acquire()
+
+    def share(self, job_id: str) -> Optional[ScratchWorkspace]:
+        """Take another reference on a live workspace, e.g. for a background task outliving the request."""
+        with self._lock:
+            workspace = self._workspaces.get(job_id)
+            if workspace is None:
+                return None
+            workspace.refcount += 1
+            return workspace
+
+    def _acquire(self, workspace: ScratchWorkspace) -> None:
+        with self._lock:
+            workspace.refcount += 1
+
+    def _release(self, workspace: ScratchWorkspace) -> None:
+        with self._lock:
+            workspace.refcount -= 1
+            if workspace.refcount > 0:
+                return
+            self._workspaces.pop(workspace.job_id, None)
+        shutil.rmtree(workspace.path, ignore_errors=True)
+        logger.info("[SCRATCH] Removed workspace %s", workspace.path)
+
+    @contextmanager
+    def workspace(self, prefix: str = "job", tmpfs: bool = False) -> Iterator[ScratchWorkspace]:
+        """Context manager yielding a fresh workspace that is released on exit, even on error."""
+        workspace = self.create(prefix, tmpfs=tmpfs)
+        try:
+            yield workspace
+        finally:
+            workspace.release()
+
+    @asynccontextmanager
+    async def async_workspace(self, prefix: str = "job", tmpfs: bool = False) -> AsyncIterator[ScratchWorkspace]:
+        """``workspace`` for async handlers: the quota check and cleanup stay off the event loop."""
+        workspace = await asyncio.to_thread(self.create, prefix, tmpfs)
+        try:
+            yield workspace
+        finally:
+            await asyncio.to_thread(workspace.release)
+
+
+scratch_manager = ScratchManager()
@@ -4,6 +4,7 @@ from uuid import UUID
 from app.models.users import User
 from app.core.dependencies import get_current_user
 from app.services.migrate.PowerBI.semantic_model.semantic_processor import SemanticProcessor
+from app.core.metrics import track_stage, organization_label, report_type_label
 
 semantic_model_router = APIRouter()
 
@@ -12,5 +13,8 @@ async def generate_semantic_model(report_id: UUID, user: User = Depends(get_curr
     """
     Triggers semantic model generation or returns pre-signed URL if already processed.
     """
-    response = await SemanticProcessor.semantic_processor(report_id, user)
+    report_type = await report_type_label([report_id])
+    with track_stage("semantic", organization_label(user), report_type) as stage:
+        response = await SemanticProcessor.semantic_processor(report_id, user)
+        stage.set_status_code(response.status_code)
     return {"message": response.data.get("message", "Success"),"data": response.data}
\ No newline at end of file
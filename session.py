@@ -4,6 +4,7 @@ from sqlalchemy.orm import declarative_base, sessionmaker
 from contextlib import contextmanager
 from app.core.config import DBConfig
 from app.core.logger_setup import logger
+from app.core.metrics import instrument_engine
 
 # Construct the DATABASE_URL
 DATABASE_URL = DBConfig.db_uri
@@ -16,6 +17,9 @@ except Exception as e:
     logger.error(f"Failed to create database engine: {e}")
     raise
 
+# Query latency, statements per request and pool state for /metrics
+instrument_engine(engine)
+
 # Create a session maker
 SessionLocal = sessionmaker(bind=engine)
 
@@ -0,0 +1,95 @@
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+
+class PresignedUrlCache:
+    """
+    Recently signed download URLs keyed by (namespace, object key, expiry).
+
+    A cached URL is handed out again while at least ``min_remaining_fraction``
+    of its lifetime is left, so callers asking for a one-hour link always get
+    one that stays valid for at least half an hour. ``namespace`` separates
+    buckets/containers.
+    """
+
+    def __init__(self, max_entries: int = 10000, min_remaining_fraction: float = 0.5):
+        self.max_entries = max_entries
+        self.min_remaining_fraction = min_remaining_fraction
+        self._entries: "OrderedDict[Tuple[str, str, int], Tuple[str, float]]" = OrderedDict()
+
+    def get(self, namespace: str, object_key: str, expiration: int) -> Optional[str]:
+        key = (namespace, object_key, expiration)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        url, expires_at = entry
+        if expires_at - time.time() < expiration * self.min_remaining_fraction:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return url
+
+    def set(self, namespace: str, object_key: str, expiration: int, url: str, signed_at: Optional[float] = None) -> None:
+        key = (namespace, object_key, expiration)
+        self._entries[key] = (url, (signed_at or time.time()) + expiration)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, namespace: str, object_key: str) -> None:
+        for key in [k for k in self._entries if k[0] == namespace and k[1] == object_key]:
+            del self._entries[key]
+
+
+class ObjectMetadata(NamedTuple):
+    exists: bool
+    etag: Optional[str] = None
+    size: Optional[int] = None
+
+
+class ObjectMetadataCache:
+    """
+    What this process knows about objects in a bucket/container.
+
+    Writes made through S3Config/BlobConfig record the object as present (with
+    ETag and size when known) and deletes record it as absent; HEAD results
+    are cached too. Present entries are trusted for ``present_ttl`` seconds and
+    absent ones for ``absent_ttl``; both are kept short because deletes and
+    overwrites by other workers are only noticed once an entry expires.
+    """
+
+    def __init__(self, present_ttl: int = 30, absent_ttl: int = 15, max_entries: int = 50000):
+        self.present_ttl = present_ttl
+        self.absent_ttl = absent_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[ObjectMetadata, float]]" = OrderedDict()
+
+    def _store(self, namespace: str, object_key: str, metadata: ObjectMetadata) -> None:
+        ttl = self.present_ttl if metadata.exists else self.absent_ttl
+        key = (namespace, object_key)
+        self._entries[key] = (metadata, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def record_present(self, namespace: str, object_key: str, etag: Optional[str] = None, size: Optional[int] = None) -> None:
+        self._store(namespace, object_key, ObjectMetadata(True, etag, size))
+
+    def record_absent(self, namespace: str, object_key: str) -> None:
+        self._store(namespace, object_key, ObjectMetadata(False))
+
+    def get(self, namespace: str, object_key: str) -> Optional[ObjectMetadata]:
+        """Cached metadata, or None when unknown or expired."""
+        key = (namespace, object_key)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        metadata, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        return metadata
+
+    def invalidate(self, namespace: str, object_key: str) -> None:
+        self._entries.pop((namespace, object_key), None)
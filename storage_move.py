@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+from typing import Any, Dict, Optional
+
+from app.core.config import STORAGE_COPY_CONCURRENCY
+from app.core.constants import STORAGE_MOVE_MANIFEST_PATH
+from app.core.exceptions import StorageMoveError
+from app.core.logger_setup import logger
+
+PENDING = "pending"
+COPIED = "copied"
+DELETED = "deleted"
+
+
+def prefix_move_job_id(source_prefix: str, destination_prefix: str) -> str:
+    """Moves of the same prefixes share a job id, so re-running a failed move resumes it."""
+    return hashlib.sha256(f"{source_prefix}|{destination_prefix}".encode("utf-8")).hexdigest()[:32]
+
+
+async def move_prefix(
+    storage,
+    source_prefix: str,
+    destination_prefix: str,
+    job_id: Optional[str] = None,
+    max_concurrency: int = STORAGE_COPY_CONCURRENCY,
+    copy_options: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Move every object under ``source_prefix`` to ``destination_prefix`` without downloading it.
+
+    ``storage`` is an S3Config or BlobConfig. Objects are copied server-side in
+    parallel, then the sources are batch-deleted. Progress is kept in a JSON
+    manifest at ``STORAGE_MOVE_MANIFEST_PATH``: a move that fails part-way
+    raises StorageMoveError and the next call with the same prefixes (or
+    ``job_id``) only retries what is left. The manifest is deleted once the
+    move completes. Returns the final manifest.
+    """
+    job_id = job_id or prefix_move_job_id(source_prefix, destination_prefix)
+    manifest_key = STORAGE_MOVE_MANIFEST_PATH.format(job_id=job_id)
+
+    manifest = await storage.read_json(manifest_key)
+    if manifest is None or manifest["status"] == "completed":
+        objects = await storage.list_objects(source_prefix)
+        manifest = {
+            "job_id": job_id,
+            "source_prefix": source_prefix,
+            "destination_prefix": destination_prefix,
+            "status": "copying",
+            "objects": {key[len(source_prefix):]: {"size": size, "state": PENDING} for key, size in objects.items()},
+        }
+        await storage.write_json(manifest_key, manifest)
+    else:
+        logger.info("[STORAGE_MOVE] Resuming %s (%s)", job_id, manifest['status'])
+
+    entries = manifest["objects"]
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def copy(rel_key: str) -> None:
+        async with semaphore:
+            copied = await storage.copy_object(
+                source_prefix + rel_key, destination_prefix + rel_key, entries[rel_key]["size"], **(copy_options or {})
+            )
+        if copied:
+            entries[rel_key]["state"] = COPIED
+
+    await asyncio.gather(*(copy(rel_key) for rel_key, entry in entries.items() if entry["state"] == PENDING))
+    not_copied = [rel_key for rel_key, entry in entries.items() if entry["state"] == PENDING]
+    if not_copied:
+        await storage.write_json(manifest_key, manifest)
+        raise StorageMoveError(f"Could not copy {len(not_copied)} object(s) from {source_prefix}; re-run to resume")
+
+    # Sources are only deleted once every copy exists, so an interrupted move never loses data.
+    manifest["status"] = "deleting"
+    await storage.write_json(manifest_key, manifest)
+    to_delete = [rel_key for rel_key, entry in entries.items() if entry["state"] == COPIED]
+    failed = set(await storage.delete_objects([source_prefix + rel_key for rel_key in to_delete]))
+    for rel_key in to_delete:
+        if source_prefix + rel_key not in failed:
+            entries[rel_key]["state"] = DELETED
+    if failed:
+        await storage.write_json(manifest_key, manifest)
+        raise StorageMoveError(f"Could not delete {len(failed)} object(s) under {source_prefix}; re-run to resume")
+
+    manifest["status"] = "completed"
+    if await storage.delete_objects([manifest_key]):
+        # Left behind as completed, so a later move of the same prefixes starts afresh.
+        logger.warning("[STORAGE_MOVE] Could not delete manifest %s", manifest_key)
+        await storage.write_json(manifest_key, manifest)
+    logger.info("[STORAGE_MOVE] Moved %s objects %s -> %s", len(entries), source_prefix, destination_prefix)
+    return manifest
+
+
+async def move_object(
+    storage,
+    source_key: str,
+    destination_key: str,
+    copy_options: Optional[Dict[str, Any]] = None
+) -> bool:
+    """
+    Move exactly one object with a server-side copy followed by a delete.
+
+    Unlike ``move_prefix`` nothing else sharing the key as a prefix is touched.
+    Returns False when the source does not exist; raises StorageMoveError when
+    the copy or the delete fails, leaving the source in place.
+    """
+    objects = await storage.list_objects(source_key)
+    if source_key not in objects:
+        return False
+    if not await storage.copy_object(source_key, destination_key, objects[source_key], **(copy_options or {})):
+        raise StorageMoveError(f"Could not copy {source_key} to {destination_key}")
+    if await storage.delete_objects([source_key]):
+        raise StorageMoveError(f"Copied {source_key} to {destination_key} but could not delete the source")
+    logger.info("[STORAGE_MOVE] Moved %s -> %s", source_key, destination_key)
+    return True
@@ -0,0 +1,98 @@
+import os
+import hashlib
+import aiofiles
+from typing import NamedTuple, Optional
+from fastapi import UploadFile
+
+from app.core.config import logger, MAX_UPLOAD_SIZE
+from app.core.constants import UPLOAD_READ_CHUNK_SIZE
+from app.core.exceptions import PayloadTooLargeError, ServerError
+
+
+class StreamedUpload(NamedTuple):
+    """Result of streaming an ``UploadFile`` to disk or cloud storage."""
+    filename: str
+    size: int
+    sha256: str
+    local_path: Optional[str] = None
+    object_name: Optional[str] = None
+
+
+class UploadChunkReader:
+    """
+    Async iterator over an ``UploadFile`` in fixed-size chunks.
+
+    The SHA-256 digest and byte count are updated as chunks are read, and
+    ``PayloadTooLargeError`` is raised as soon as the stream passes ``max_size``
+    so an oversized upload is never fully buffered.
+    """
+
+    def __init__(self, upload_file: UploadFile, max_size: int = MAX_UPLOAD_SIZE, chunk_size: int = UPLOAD_READ_CHUNK_SIZE):
+        self.upload_file = upload_file
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.size = 0
+        self._hash = hashlib.sha256()
+
+        declared_size = getattr(upload_file, "size", None)
+        if declared_size is not None and declared_size > max_size:
+            raise self._too_large()
+
+    def _too_large(self) -> PayloadTooLargeError:
+        return PayloadTooLargeError(
+            detail=f"File '{self.upload_file.filename}' exceeds the {self.max_size // (1024 * 1024)} MB upload limit"
+        )
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def __aiter__(self):
+        return self._iter_chunks()
+
+    async def _iter_chunks(self):
+        await self.upload_file.seek(0)
+        while True:
+            chunk = await self.upload_file.read(self.chunk_size)
+            if not chunk:
+                break
+            self.size += len(chunk)
+            if self.size > self.max_size:
+                raise self._too_large()
+            self._hash.update(chunk)
+            yield chunk
+
+
+async def save_upload_file(upload_file: UploadFile, destination: str, max_size: int = MAX_UPLOAD_SIZE) -> StreamedUpload:
+    """Stream an upload to ``destination`` in chunks; the partial file is removed if the limit is exceeded."""
+    os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+    reader = UploadChunkReader(upload_file, max_size)
+    try:
+        async with aiofiles.open(destination, "wb") as f:
+            async for chunk in reader:
+                await f.write(chunk)
+    except Exception:
+        if os.path.exists(destination):
+            os.remove(destination)
+        raise
+
+    logger.info("[UPLOAD] Saved %s (%s bytes, sha256=%s)", upload_file.filename, reader.size, reader.sha256)
+    return StreamedUpload(upload_file.filename, reader.size, reader.sha256, local_path=destination)
+
+
+async def stream_upload_to_storage(
+    upload_file: UploadFile,
+    object_name: str,
+    cloud_storage,
+    max_size: int = MAX_UPLOAD_SIZE
+) -> StreamedUpload:
+    """Forward an upload straight to S3 multipart / Azure block upload without a local copy."""
+    reader = UploadChunkReader(upload_file, max_size)
+    if not await cloud_storage.upload_stream(reader, object_name):
+        raise ServerError(detail=f"Failed to upload '{upload_file.filename}' to cloud storage")
+
+    logger.info(
+        "[UPLOAD] Streamed %s to %s (%s bytes, sha256=%s)",
+        upload_file.filename, object_name, reader.size, reader.sha256
+    )
+    return StreamedUpload(upload_file.filename, reader.size, reader.sha256, object_name=object_name)
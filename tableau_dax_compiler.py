@@ -0,0 +1,642 @@
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from app.core.field_reference import parse_field_reference
+from app.core.logger_setup import logger
+from app.core.regex_enums import Regex
+
+
+class UnsupportedFormulaError(ValueError):
+    """Raised when a formula falls outside the subset the rule-based compiler handles."""
+
+
+class FieldBinding(NamedTuple):
+    """Where a Tableau field lives in the semantic model."""
+    table: Optional[str]
+    column: str
+    kind: str = "column"            # "column" (source or calculated column) | "measure"
+    datatype: Optional[str] = None  # Tableau datatype: string, integer, real, date, datetime, boolean
+
+
+class CompiledFormula(NamedTuple):
+    dax: str
+    type: str                    # "measure" | "column"
+    table: Optional[str] = None  # home table of a calculated column
+    datatype: Optional[str] = None
+
+
+class _Token(NamedTuple):
+    kind: str
+    value: str
+    pos: int
+
+
+class _Expr(NamedTuple):
+    dax: str
+    dtype: Optional[str] = None   # "number" | "string" | "boolean" | "date"
+    aggregate: bool = False       # aggregation or measure reference (filter context)
+    row_level: bool = False       # column referenced outside any aggregation (row context)
+    tables: frozenset = frozenset()
+    atomic: bool = True           # safe to use as an operand without parentheses
+    literal: Optional[str] = None  # value of a string literal
+    is_column: bool = False       # a bare column reference
+
+
+_TOKEN_REGEX = re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in (
+    ("SKIP", r"\s+|//[^\n]*|/\*.*?\*/"),
+    ("DATE", r"#[^#]*#"),
+    ("NUMBER", r"(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"),
+    ("STRING", r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\""),
+    ("FIELD", Regex.FIELD_REFERENCE.value),
+    ("OP", r"<=|>=|<>|!=|==|[-+*/%^=<>(),{}:]"),
+    ("NAME", r"[A-Za-z_][A-Za-z0-9_]*"),
+)), re.DOTALL)
+
+_DATE_LITERAL = re.compile(r"^#\s*(\d{4})-(\d{1,2})-(\d{1,2})(?:[ T](\d{1,2}):(\d{2})(?::(\d{2}))?)?\s*#$")
+
+_DATATYPES = {
+    "string": "string", "integer": "number", "real": "number", "number": "number",
+    "date": "date", "datetime": "date", "boolean": "boolean",
+}
+
+_COMPARISONS = {"=": "=", "==": "=", "!=": "<>", "<>": "<>", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+# Tableau aggregation -> (DAX over a column, DAX iterator over an expression, result type; None = argument type)
+_AGGREGATES = {
+    "SUM": ("SUM", "SUMX", "number"),
+    "AVG": ("AVERAGE", "AVERAGEX", "number"),
+    "MEDIAN": ("MEDIAN", "MEDIANX", "number"),
+    "MIN": ("MIN", "MINX", None),
+    "MAX": ("MAX", "MAXX", None),
+    "COUNT": ("COUNT", "COUNTX", "number"),
+    "COUNTD": ("DISTINCTCOUNT", None, "number"),
+}
+
+# Tableau function -> (DAX function, min args, max args, result type; None = first argument's type)
+_SCALAR_FUNCTIONS = {
+    "ABS": ("ABS", 1, 1, "number"),
+    "INT": ("TRUNC", 1, 1, "number"),
+    "SQRT": ("SQRT", 1, 1, "number"),
+    "EXP": ("EXP", 1, 1, "number"),
+    "LN": ("LN", 1, 1, "number"),
+    "SIGN": ("SIGN", 1, 1, "number"),
+    "POWER": ("POWER", 2, 2, "number"),
+    "DIV": ("QUOTIENT", 2, 2, "number"),
+    "LEN": ("LEN", 1, 1, "number"),
+    "LEFT": ("LEFT", 2, 2, "string"),
+    "RIGHT": ("RIGHT", 2, 2, "string"),
+    "UPPER": ("UPPER", 1, 1, "string"),
+    "LOWER": ("LOWER", 1, 1, "string"),
+    "REPLACE": ("SUBSTITUTE", 3, 3, "string"),
+    "CONTAINS": ("CONTAINSSTRINGEXACT", 2, 2, "boolean"),
+    "ISNULL": ("ISBLANK", 1, 1, "boolean"),
+    "IFNULL": ("COALESCE", 2, 2, None),
+    "YEAR": ("YEAR", 1, 1, "number"),
+    "QUARTER": ("QUARTER", 1, 1, "number"),
+    "MONTH": ("MONTH", 1, 1, "number"),
+    "DAY": ("DAY", 1, 1, "number"),
+    "TODAY": ("TODAY", 0, 0, "date"),
+    "NOW": ("NOW", 0, 0, "date"),
+    "MAKEDATE": ("DATE", 3, 3, "date"),
+}
+
+_DATE_PARTS = {
+    "year": "YEAR", "quarter": "QUARTER", "month": "MONTH", "week": "WEEK",
+    "day": "DAY", "hour": "HOUR", "minute": "MINUTE", "second": "SECOND",
+}
+_DATEPART_FUNCTIONS = {
+    "year": "YEAR", "quarter": "QUARTER", "month": "MONTH", "day": "DAY",
+    "hour": "HOUR", "minute": "MINUTE", "second": "SECOND", "weekday": "WEEKDAY", "week": "WEEKNUM",
+}
+
+
+def _quote_table(table: str) -> str:
+    return "'" + table.replace("'", "''") + "'"
+
+
+def _quote_column(column: str) -> str:
+    return "[" + column.replace("]", "]]") + "]"
+
+
+def _quote_string(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _operand(expr: _Expr) -> str:
+    return expr.dax if expr.atomic else f"({expr.dax})"
+
+
+def _tokenize(formula: str) -> List[_Token]:
+    tokens = []
+    pos = 0
+    while pos < len(formula):
+        match = _TOKEN_REGEX.match(formula, pos)
+        if not match:
+            raise UnsupportedFormulaError(f"unexpected character {formula[pos]!r}")
+        kind = match.lastgroup
+        if kind != "SKIP":
+            tokens.append(_Token(kind, match.group(kind), pos))
+        pos = match.end()
+    tokens.append(_Token("EOF", "", pos))
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive-descent parser over Tableau's calculation grammar that emits DAX as it goes.
+
+    Precedence, lowest first: OR, AND, NOT, comparisons, + -, * / %, ^, unary minus.
+    Every expression carries whether it is aggregate or row-level so that
+    formulas mixing the two (an error in Tableau and a wrong result in DAX)
+    are rejected instead of translated.
+    """
+
+    def __init__(self, formula: str, compiler: "TableauDaxCompiler"):
+        self.tokens = _tokenize(formula)
+        self.index = 0
+        self.compiler = compiler
+
+    # -- token helpers -------------------------------------------------------------------------
+
+    @property
+    def current(self) -> _Token:
+        return self.tokens[self.index]
+
+    def _advance(self) -> _Token:
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def _is_op(self, *values: str) -> bool:
+        return self.current.kind == "OP" and self.current.value in values
+
+    def _is_keyword(self, *values: str) -> bool:
+        return self.current.kind == "NAME" and self.current.value.upper() in values
+
+    def _expect_op(self, value: str) -> None:
+        if not self._is_op(value):
+            raise UnsupportedFormulaError(f"expected '{value}' at position {self.current.pos}")
+        self._advance()
+
+    def _expect_keyword(self, value: str) -> None:
+        if not self._is_keyword(value):
+            raise UnsupportedFormulaError(f"expected {value} at position {self.current.pos}")
+        self._advance()
+
+    @staticmethod
+    def _combine(dax: str, dtype: Optional[str], parts: Iterable[_Expr], atomic: bool = False) -> _Expr:
+        parts = list(parts)
+        aggregate = any(p.aggregate for p in parts)
+        row_level = any(p.row_level for p in parts)
+        if aggregate and row_level:
+            raise UnsupportedFormulaError("mixes aggregate and row-level expressions")
+        tables = frozenset().union(*(p.tables for p in parts))
+        return _Expr(dax, dtype, aggregate, row_level, tables, atomic)
+
+    # -- grammar -------------------------------------------------------------------------------
+
+    def parse(self) -> _Expr:
+        expr = self._or()
+        if self.current.kind != "EOF":
+            raise UnsupportedFormulaError(f"unexpected '{self.current.value}' at position {self.current.pos}")
+        return expr
+
+    def _or(self) -> _Expr:
+        left = self._and()
+        while self._is_keyword("OR"):
+            self._advance()
+            right = self._and()
+            left = self._combine(f"{_operand(left)} || {_operand(right)}", "boolean", (left, right))
+        return left
+
+    def _and(self) -> _Expr:
+        left = self._not()
+        while self._is_keyword("AND"):
+            self._advance()
+            right = self._not()
+            left = self._combine(f"{_operand(left)} && {_operand(right)}", "boolean", (left, right))
+        return left
+
+    def _not(self) -> _Expr:
+        if self._is_keyword("NOT"):
+            self._advance()
+            operand = self._not()
+            return self._combine(f"NOT({operand.dax})", "boolean", (operand,), atomic=True)
+        return self._comparison()
+
+    def _comparison(self) -> _Expr:
+        left = self._additive()
+        if self.current.kind == "OP" and self.current.value in _COMPARISONS:
+            op = _COMPARISONS[self._advance().value]
+            right = self._additive()
+            left = self._combine(f"{_operand(left)} {op} {_operand(right)}", "boolean", (left, right))
+        return left
+
+    def _additive(self) -> _Expr:
+        left = self._multiplicative()
+        while self._is_op("+", "-"):
+            op = self._advance().value
+            right = self._multiplicative()
+            if op == "+" and "string" in (left.dtype, right.dtype):
+                left = self._combine(f"{_operand(left)} & {_operand(right)}", "string", (left, right))
+                continue
+            if op == "+" and "number" not in (left.dtype, right.dtype) and left.dtype != "date":
+                # Without a known type "+" could be addition or concatenation.
+                raise UnsupportedFormulaError("cannot infer operand types for '+'")
+            dtype = "date" if "date" in (left.dtype, right.dtype) and op == "+" else "number"
+            left = self._combine(f"{_operand(left)} {op} {_operand(right)}", dtype, (left, right))
+        return left
+
+    def _multiplicative(self) -> _Expr:
+        left = self._power()
+        while self._is_op("*", "/", "%"):
+            op = self._advance().value
+            right = self._power()
+            if op == "*":
+                left = self._combine(f"{_operand(left)} * {_operand(right)}", "number", (left, right))
+            elif op == "/":
+                left = self._combine(f"DIVIDE({left.dax}, {right.dax})", "number", (left, right), atomic=True)
+            else:
+                left = self._combine(f"MOD({left.dax}, {right.dax})", "number", (left, right), atomic=True)
+        return left
+
+    def _power(self) -> _Expr:
+        base = self._unary()
+        if self._is_op("^"):
+            self._advance()
+            exponent = self._power()
+            return self._combine(f"POWER({base.dax}, {exponent.dax})", "number", (base, exponent), atomic=True)
+        return base
+
+    def _unary(self) -> _Expr:
+        if self._is_op("-"):
+            self._advance()
+            operand = self._unary()
+            return self._combine(f"-{_operand(operand)}", "number", (operand,))
+        return self._primary()
+
+    def _primary(self) -> _Expr:
+        token = self.current
+        if token.kind == "NUMBER":
+            self._advance()
+            return _Expr(token.value, "number")
+        if token.kind == "STRING":
+            self._advance()
+            quote = token.value[0]
+            value = token.value[1:-1].replace(quote * 2, quote)
+            return _Expr(_quote_string(value), "string", literal=value)
+        if token.kind == "DATE":
+            self._advance()
+            return self._date_literal(token.value)
+        if token.kind == "FIELD":
+            self._advance()
+            return self._field(token.value)
+        if self._is_op("("):
+            self._advance()
+            expr = self._or()
+            self._expect_op(")")
+            return expr
+        if self._is_op("{"):
+            self._advance()
+            return self._lod()
+        if token.kind == "NAME":
+            keyword = token.value.upper()
+            if keyword in ("TRUE", "FALSE"):
+                self._advance()
+                return _Expr(f"{keyword}()", "boolean")
+            if keyword == "NULL":
+                self._advance()
+                return _Expr("BLANK()")
+            if keyword == "IF":
+                self._advance()
+                return self._if()
+            if keyword == "CASE":
+                self._advance()
+                return self._case()
+            self._advance()
+            if self._is_op("("):
+                self._advance()
+                return self._function(keyword, self._arguments())
+            raise UnsupportedFormulaError(f"unknown identifier {token.value}")
+        raise UnsupportedFormulaError(f"unexpected '{token.value}' at position {token.pos}")
+
+    def _arguments(self) -> List[_Expr]:
+        args = []
+        if not self._is_op(")"):
+            args.append(self._or())
+            while self._is_op(","):
+                self._advance()
+                args.append(self._or())
+        self._expect_op(")")
+        return args
+
+    def _date_literal(self, text: str) -> _Expr:
+        match = _DATE_LITERAL.match(text)
+        if not match:
+            raise UnsupportedFormulaError(f"unsupported date literal {text}")
+        year, month, day, hour, minute, second = match.groups()
+        dax = f"DATE({int(year)}, {int(month)}, {int(day)})"
+        if hour is not None:
+            return _Expr(f"{dax} + TIME({int(hour)}, {int(minute)}, {int(second or 0)})", "date", atomic=False)
+        return _Expr(dax, "date")
+
+    def _field(self, raw: str) -> _Expr:
+        reference = parse_field_reference(raw)
+        binding = self.compiler.resolve(reference.name) if reference else None
+        if binding is None:
+            raise UnsupportedFormulaError(f"unknown field {raw}")
+        dtype = _DATATYPES.get((binding.datatype or "").lower())
+        if binding.kind == "measure":
+            return _Expr(_quote_column(binding.column), dtype, aggregate=True)
+        if not binding.table:
+            raise UnsupportedFormulaError(f"no table for column {raw}")
+        return _Expr(
+            f"{_quote_table(binding.table)}{_quote_column(binding.column)}", dtype,
+            row_level=True, tables=frozenset({binding.table}), is_column=True
+        )
+
+    def _if(self) -> _Expr:
+        branches = []
+        default = None
+        condition = self._or()
+        self._expect_keyword("THEN")
+        branches.append((condition, self._or()))
+        while self._is_keyword("ELSEIF"):
+            self._advance()
+            condition = self._or()
+            self._expect_keyword("THEN")
+            branches.append((condition, self._or()))
+        if self._is_keyword("ELSE"):
+            self._advance()
+            default = self._or()
+        self._expect_keyword("END")
+
+        parts = [e for branch in branches for e in branch] + ([default] if default is not None else [])
+        dtype = next((value.dtype for _, value in branches if value.dtype), default.dtype if default is not None else None)
+        if len(branches) == 1:
+            args = [branches[0][0].dax, branches[0][1].dax] + ([default.dax] if default is not None else [])
+            return self._combine(f"IF({', '.join(args)})", dtype, parts, atomic=True)
+        args = ["TRUE()"] + [e.dax for branch in branches for e in branch] + ([default.dax] if default is not None else [])
+        return self._combine(f"SWITCH({', '.join(args)})", dtype, parts, atomic=True)
+
+    def _case(self) -> _Expr:
+        subject = self._or()
+        pairs = []
+        default = None
+        while self._is_keyword("WHEN"):
+            self._advance()
+            value = self._or()
+            self._expect_keyword("THEN")
+            pairs.append((value, self._or()))
+        if not pairs:
+            raise UnsupportedFormulaError("CASE without WHEN")
+        if self._is_keyword("ELSE"):
+            self._advance()
+            default = self._or()
+        self._expect_keyword("END")
+
+        parts = [subject] + [e for pair in pairs for e in pair] + ([default] if default is not None else [])
+        args = [subject.dax] + [e.dax for pair in pairs for e in pair] + ([default.dax] if default is not None else [])
+        dtype = next((result.dtype for _, result in pairs if result.dtype), default.dtype if default is not None else None)
+        return self._combine(f"SWITCH({', '.join(args)})", dtype, parts, atomic=True)
+
+    def _lod(self) -> _Expr:
+        keyword = self.current.value.upper() if self.current.kind == "NAME" else None
+        dimensions: List[_Expr] = []
+        if keyword in ("FIXED", "INCLUDE", "EXCLUDE"):
+            self._advance()
+            if keyword == "INCLUDE":
+                raise UnsupportedFormulaError("INCLUDE level of detail expression")
+            if not self._is_op(":"):
+                dimensions.append(self._or())
+                while self._is_op(","):
+                    self._advance()
+                    dimensions.append(self._or())
+            self._expect_op(":")
+        else:
+            keyword = "FIXED"
+        body = self._or()
+        self._expect_op("}")
+
+        if not body.aggregate:
+            raise UnsupportedFormulaError("level of detail expression without an aggregation")
+        if any(not d.is_column for d in dimensions):
+            raise UnsupportedFormulaError("level of detail dimension is not a column")
+        tables = body.tables.union(*(d.tables for d in dimensions))
+        if len(tables) != 1:
+            raise UnsupportedFormulaError("level of detail expression spans several tables")
+        table = _quote_table(next(iter(tables)))
+
+        if keyword == "EXCLUDE":
+            if not dimensions:
+                raise UnsupportedFormulaError("EXCLUDE without dimensions")
+            modifiers = ", ".join(f"REMOVEFILTERS({d.dax})" for d in dimensions)
+        elif dimensions:
+            modifiers = f"ALLEXCEPT({table}, {', '.join(d.dax for d in dimensions)})"
+        else:
+            modifiers = f"ALL({table})"
+        # Neither aggregate nor row-level: CALCULATE works in a measure and, via context
+        # transition, in a calculated column, just as Tableau lets LODs mix with both.
+        return _Expr(f"CALCULATE({body.dax}, {modifiers})", body.dtype, tables=frozenset(tables))
+
+    # -- functions -----------------------------------------------------------------------------
+
+    @staticmethod
+    def _arity(name: str, args: List[_Expr], minimum: int, maximum: int) -> None:
+        if not minimum <= len(args) <= maximum:
+            raise UnsupportedFormulaError(f"{name} called with {len(args)} arguments")
+
+    @staticmethod
+    def _date_part(name: str, arg: _Expr, table: Dict[str, str]) -> str:
+        part = (arg.literal or "").lower()
+        if arg.literal is None or part not in table:
+            raise UnsupportedFormulaError(f"{name} with unsupported date part")
+        return table[part]
+
+    def _aggregate(self, name: str, args: List[_Expr]) -> _Expr:
+        column_function, iterator, dtype = _AGGREGATES[name]
+        self._arity(name, args, 1, 1)
+        arg = args[0]
+        if arg.aggregate:
+            raise UnsupportedFormulaError(f"nested aggregation in {name}")
+        dtype = dtype or arg.dtype
+        if arg.is_column:
+            dax = f"{column_function}({arg.dax})"
+        elif arg.row_level and iterator and len(arg.tables) == 1:
+            dax = f"{iterator}({_quote_table(next(iter(arg.tables)))}, {arg.dax})"
+        else:
+            raise UnsupportedFormulaError(f"{name} over an expression")
+        return _Expr(dax, dtype, aggregate=True, tables=arg.tables)
+
+    def _function(self, name: str, args: List[_Expr]) -> _Expr:
+        if name in ("MIN", "MAX") and len(args) == 2:
+            return self._combine(f"{name}({args[0].dax}, {args[1].dax})", args[0].dtype, args, atomic=True)
+        if name in _AGGREGATES:
+            return self._aggregate(name, args)
+
+        if name in _SCALAR_FUNCTIONS:
+            dax_name, minimum, maximum, dtype = _SCALAR_FUNCTIONS[name]
+            self._arity(name, args, minimum, maximum)
+            dtype = dtype or (args[0].dtype if args else None)
+            return self._combine(f"{dax_name}({', '.join(a.dax for a in args)})", dtype, args, atomic=True)
+
+        if name == "ZN":
+            self._arity(name, args, 1, 1)
+            dax, dtype = f"COALESCE({args[0].dax}, 0)", "number"
+        elif name == "STR":
+            self._arity(name, args, 1, 1)
+            dax, dtype = f'FORMAT({args[0].dax}, "@")', "string"
+        elif name == "FLOAT":
+            self._arity(name, args, 1, 1)
+            dax, dtype = f"CONVERT({args[0].dax}, DOUBLE)", "number"
+        elif name == "IIF":
+            self._arity(name, args, 3, 3)
+            dax, dtype = f"IF({args[0].dax}, {args[1].dax}, {args[2].dax})", args[1].dtype or args[2].dtype
+        elif name == "ROUND":
+            self._arity(name, args, 1, 2)
+            digits = args[1].dax if len(args) == 2 else "0"
+            dax, dtype = f"ROUND({args[0].dax}, {digits})", "number"
+        elif name in ("CEILING", "FLOOR"):
+            self._arity(name, args, 1, 1)
+            dax, dtype = f"{name}({args[0].dax}, 1)", "number"
+        elif name == "LOG":
+            self._arity(name, args, 1, 2)
+            base = args[1].dax if len(args) == 2 else "10"
+            dax, dtype = f"LOG({args[0].dax}, {base})", "number"
+        elif name == "MID":
+            self._arity(name, args, 2, 3)
+            length = args[2].dax if len(args) == 3 else f"LEN({args[0].dax})"
+            dax, dtype = f"MID({args[0].dax}, {args[1].dax}, {length})", "string"
+        elif name == "FIND":
+            self._arity(name, args, 2, 3)
+            start = args[2].dax if len(args) == 3 else "1"
+            # Tableau returns 0 when the substring is missing; DAX errors unless told otherwise.
+            dax, dtype = f"FIND({args[1].dax}, {args[0].dax}, {start}, 0)", "number"
+        elif name == "DATEDIFF":
+            self._arity(name, args, 3, 3)
+            part = self._date_part(name, args[0], _DATE_PARTS)
+            dax, dtype = f"DATEDIFF({args[1].dax}, {args[2].dax}, {part})", "number"
+            args = args[1:]
+        elif name == "DATEPART":
+            self._arity(name, args, 2, 2)
+            function = self._date_part(name, args[0], _DATEPART_FUNCTIONS)
+            dax, dtype = f"{function}({args[1].dax})", "number"
+            args = args[1:]
+        elif name == "DATETRUNC":
+            self._arity(name, args, 2, 2)
+            part = self._date_part(name, args[0], {"year": "year", "quarter": "quarter", "month": "month", "day": "day"})
+            date = args[1].dax
+            month = {"year": "1", "quarter": f"(QUARTER({date}) - 1) * 3 + 1"}.get(part, f"MONTH({date})")
+            day = f"DAY({date})" if part == "day" else "1"
+            dax, dtype = f"DATE(YEAR({date}), {month}, {day})", "date"
+            args = args[1:]
+        elif name == "DATEADD":
+            self._arity(name, args, 3, 3)
+            part = self._date_part(name, args[0], {"year": "year", "month": "month", "day": "day"})
+            amount, date = args[1], args[2]
+            if part == "day":
+                dax = f"{_operand(date)} + {_operand(amount)}"
+            else:
+                months = amount.dax if part == "month" else f"{_operand(amount)} * 12"
+                dax = f"EDATE({date.dax}, {months})"
+            dtype = "date"
+            args = args[1:]
+            return self._combine(dax, dtype, args, atomic=part != "day")
+        else:
+            raise UnsupportedFormulaError(f"unsupported function {name}")
+        return self._combine(dax, dtype, args, atomic=True)
+
+
+class TableauDaxCompiler:
+    """
+    Deterministic Tableau-to-DAX compiler for the common subset of calculations.
+
+    Covers literals, operators, IF/ELSEIF/CASE, aggregations (column and
+    iterator forms), the usual scalar, string and date functions, and FIXED /
+    EXCLUDE / table-scoped LOD expressions, following the mappings in section 4
+    of ``OPENAI_PBI_PROMPT``. Anything else raises UnsupportedFormulaError, and
+    ``try_compile`` returns None so the formula can go to the LLM instead.
+
+    Create one compiler per workbook: it holds that workbook's field bindings
+    and counts how many of its formulas were compiled locally.
+    """
+
+    def __init__(self, fields: Optional[Dict[str, FieldBinding]] = None, workbook_name: Optional[str] = None):
+        self.workbook_name = workbook_name
+        self._fields: Dict[str, FieldBinding] = dict(fields or {})
+        self.compiled_count = 0
+        self.fallback_count = 0
+        self.fallback_reasons: Counter = Counter()
+
+    def add_field(
+        self,
+        name: str,
+        table: Optional[str] = None,
+        column: Optional[str] = None,
+        kind: str = "column",
+        datatype: Optional[str] = None,
+        aliases: Iterable[str] = ()
+    ) -> None:
+        """Bind a field (by caption and any internal names) to its model table and column."""
+        binding = FieldBinding(table, column or name, kind, datatype)
+        for key in (name, *aliases):
+            self._fields[key.strip("[]")] = binding
+
+    def resolve(self, name: str) -> Optional[FieldBinding]:
+        return self._fields.get(name.strip("[]"))
+
+    def compile(self, formula: str, role: Optional[str] = None) -> CompiledFormula:
+        """
+        Compile one formula. Aggregate formulas become measures and row-level ones
+        calculated columns; formulas that are neither (constants, bare LODs) follow
+        ``role``, with Tableau's "dimension" giving a column.
+        """
+        if not formula or not formula.strip():
+            raise UnsupportedFormulaError("empty formula")
+        try:
+            expr = _Parser(formula, self).parse()
+        except RecursionError:
+            raise UnsupportedFormulaError("formula nested too deeply")
+
+        if expr.aggregate:
+            return CompiledFormula(expr.dax, "measure", None, expr.dtype)
+        if expr.row_level:
+            if len(expr.tables) != 1:
+                raise UnsupportedFormulaError("row-level formula spans several tables")
+            return CompiledFormula(expr.dax, "column", next(iter(expr.tables)), expr.dtype)
+        if (role or "").lower() == "dimension" and len(expr.tables) == 1:
+            return CompiledFormula(expr.dax, "column", next(iter(expr.tables)), expr.dtype)
+        return CompiledFormula(expr.dax, "measure", None, expr.dtype)
+
+    def try_compile(self, formula: str, role: Optional[str] = None) -> Optional[CompiledFormula]:
+        """Compile ``formula`` or return None (recording why) when the LLM has to handle it."""
+        try:
+            result = self.compile(formula, role)
+        except UnsupportedFormulaError as e:
+            self.fallback_count += 1
+            self.fallback_reasons[str(e)] += 1
+            logger.debug(f"[DAX_COMPILER] Falling back to LLM: {e}")
+            return None
+        self.compiled_count += 1
+        return result
+
+    def coverage(self) -> dict:
+        total = self.compiled_count + self.fallback_count
+        return {
+            "workbook": self.workbook_name,
+            "total": total,
+            "compiled": self.compiled_count,
+            "fallback": self.fallback_count,
+            "coverage_rate": round(self.compiled_count / total, 4) if total else 0.0,
+            "top_fallback_reasons": dict(self.fallback_reasons.most_common(5)),
+        }
+
+    def log_coverage(self) -> dict:
+        stats = self.coverage()
+        logger.info(
+            "[DAX_COMPILER] %s: compiled %s/%s formulas locally (%.0f%%); fallback reasons: %s",
+            stats["workbook"] or "Workbook", stats["compiled"], stats["total"],
+            stats["coverage_rate"] * 100, stats["top_fallback_reasons"]
+        )
+        return stats
@@ -0,0 +1,188 @@
+import re
+import json
+import string
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import logger
+from app.core import templates
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+# Sentinels written as JSON escapes so the skeleton stays valid JSON; both decode to control
+# characters that never occur in the templates themselves.
+_STRING_SLOT = "\\u0000{index}\\u0000"
+_BARE_SLOT = '"\\u0001{index}"'
+_STRING_MARK = "\x00"
+_BARE_MARK = "\x01"
+# Numbers orjson may write differently from json: any exponent form, and decimals below 1e-4.
+# A match inside a string literal only costs a json fallback.
+_ORJSON_FLOAT_MISMATCH = re.compile(r"(?:^|[:,\[])-?(?:\d+(?:\.\d+)?e|0\.0000)")
+
+
+class TemplateBuilder:
+    """
+    Precompiled form of one ``str.format`` visual template from ``templates.py``.
+
+    The template is parsed once into a JSON skeleton with every placeholder
+    replaced by a sentinel, and the location of each slot is recorded. ``build``
+    then copies only the containers on the path to a slot (untouched subtrees
+    are shared with the skeleton) and fills slots directly, producing the same
+    object as ``json.loads(template.format(**kwargs))`` without formatting and
+    reparsing the whole text.
+
+    Templates that are not valid JSON once formatted (e.g. ``{objects}``
+    fragments spliced into an object body) keep working in text mode.
+    """
+
+    def __init__(self, name: str, template: str):
+        self.name = name
+        self.template = template
+        self._fields: List[str] = []
+        self._skeleton: Optional[Any] = None
+        self._slots: List[Tuple[tuple, Any]] = []
+        try:
+            self._compile()
+        except (ValueError, KeyError) as e:
+            logger.debug("[TEMPLATE_BUILDER] %s uses text mode: %s", name, e)
+            self._skeleton = None
+            self._slots = []
+
+    @property
+    def compiled(self) -> bool:
+        return self._skeleton is not None
+
+    def _compile(self) -> None:
+        pieces = []
+        in_string = False
+        for literal, field_name, format_spec, conversion in string.Formatter().parse(self.template):
+            # Track JSON string state over the literal text (braces already un-doubled by parse).
+            escaped = False
+            for ch in literal:
+                if escaped:
+                    escaped = False
+                elif ch == "\\" and in_string:
+                    escaped = True
+                elif ch == '"':
+                    in_string = not in_string
+            pieces.append(literal)
+            if field_name is None:
+                continue
+            if format_spec or conversion or not field_name.isidentifier():
+                raise ValueError(f"unsupported placeholder '{field_name}'")
+            index = len(self._fields)
+            self._fields.append(field_name)
+            pieces.append((_STRING_SLOT if in_string else _BARE_SLOT).format(index=index))
+
+        skeleton = json.loads("".join(pieces))
+        if not isinstance(skeleton, (dict, list)):
+            raise ValueError("template is not a JSON container")
+        self._collect_slots(skeleton, ())
+        self._skeleton = skeleton
+
+    def _collect_slots(self, node: Any, path: tuple) -> None:
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if _STRING_MARK in key or _BARE_MARK in key:
+                    raise ValueError("placeholder used as an object key")
+                self._collect_slots(value, path + (key,))
+        elif isinstance(node, list):
+            for i, value in enumerate(node):
+                self._collect_slots(value, path + (i,))
+        elif isinstance(node, str):
+            if node.startswith(_BARE_MARK):
+                self._slots.append((path, ("bare", self._fields[int(node[1:])])))
+            elif _STRING_MARK in node:
+                # Alternating literal / field-index parts: "a\x000\x00b" -> ["a", "0", "b"]
+                parts = node.split(_STRING_MARK)
+                spec = [(i % 2 == 1, self._fields[int(p)] if i % 2 else p) for i, p in enumerate(parts)]
+                self._slots.append((path, ("string", spec)))
+
+    @staticmethod
+    def _bare_value(value: Any) -> Any:
+        if type(value) in (int, float):
+            return value
+        return json.loads(str(value))
+
+    @staticmethod
+    def _string_value(value: Any) -> str:
+        text = str(value)
+        # Text mode splices the raw value into a JSON string literal, so escapes in it are decoded.
+        if "\\" in text or '"' in text or any(ord(c) < 0x20 for c in text):
+            return json.loads(f'"{text}"')
+        return text
+
+    def _render(self, slot: Any, kwargs: Dict[str, Any]) -> Any:
+        kind, spec = slot
+        if kind == "bare":
+            return self._bare_value(kwargs[spec])
+        return "".join(self._string_value(kwargs[part]) if is_field else part for is_field, part in spec)
+
+    def build(self, **kwargs) -> Any:
+        """
+        Return the filled template as Python objects.
+
+        Containers that hold no slot are shared with the skeleton; copy them
+        before mutating the result in place.
+        """
+        if self._skeleton is None:
+            return json.loads(self.template.format(**kwargs))
+
+        root = self._skeleton.copy()
+        copies = {(): root}
+
+        def container(path: tuple):
+            existing = copies.get(path)
+            if existing is not None:
+                return existing
+            parent = container(path[:-1])
+            child = parent[path[-1]].copy()
+            parent[path[-1]] = child
+            copies[path] = child
+            return child
+
+        for path, slot in self._slots:
+            container(path[:-1])[path[-1]] = self._render(slot, kwargs)
+        return root
+
+    def build_text(self, **kwargs) -> str:
+        """The original ``str.format`` rendering, for callers that need the text itself."""
+        return self.template.format(**kwargs)
+
+
+_builders: Dict[str, TemplateBuilder] = {}
+
+
+def get_template_builder(name: str) -> TemplateBuilder:
+    """Return the cached builder for a template defined in ``templates.py``, compiling it on first use."""
+    builder = _builders.get(name)
+    if builder is None:
+        template = getattr(templates, name)
+        if not isinstance(template, str):
+            raise TypeError(f"Template '{name}' is not a format string")
+        builder = _builders[name] = TemplateBuilder(name, template)
+    return builder
+
+
+def dumps_report(obj: Any) -> str:
+    """
+    Serialize a whole report once, compactly, after all visuals are built.
+
+    The output is ``json.dumps(obj, ensure_ascii=False, separators=(",", ":"))``.
+    orjson is used when installed; its text is kept unless it rejects a value
+    (int keys, ints beyond 64 bits) or contains a float it formats differently
+    from ``json`` (``1e-7`` for ``1e-07``, ``1e16`` for ``1e+16``, ``0.00001``
+    for ``1e-05``), in which case ``json`` serializes the report. The one
+    difference left is NaN/Infinity, which orjson writes as ``null`` where
+    ``json`` writes the non-standard ``NaN`` that Power BI cannot read anyway.
+    """
+    if orjson is not None:
+        try:
+            text = orjson.dumps(obj).decode("utf-8")
+        except orjson.JSONEncodeError:
+            text = None
+        if text is not None and not _ORJSON_FLOAT_MISMATCH.search(text):
+            return text
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,46 @@
+from app.core.date_table import DateColumn, build_date_tables, render_local_date_tables, render_shared_date_table
+
+ORDER_DATE = DateColumn("Orders", "Order Date")
+SHIP_DATE = DateColumn("Orders", "Ship Date")
+SIGNUP_DATE = DateColumn("Customers", "Signup Date")
+
+
+def _inactive(relationships):
+    return ["isActive: false" in block for block in relationships]
+
+
+def test_shared_table_gets_one_active_relationship_per_table():
+    result = render_shared_date_table([ORDER_DATE, SHIP_DATE, SIGNUP_DATE])
+    assert list(result.tables) == ["Date.tmdl"]
+    assert set(result.targets.values()) == {"Date"}
+    assert _inactive(result.relationships) == [False, True, False]
+
+
+def test_shared_table_name_avoids_existing_tables():
+    result = render_shared_date_table([ORDER_DATE], existing_tables=["Orders", "date", "Date 2"])
+    assert list(result.tables) == ["Date 3.tmdl"]
+    assert result.targets[ORDER_DATE] == "Date 3"
+    assert "toColumn: 'Date 3'.Date" in result.relationships[0]
+
+
+def test_only_fact_tables_get_active_relationships():
+    result = render_shared_date_table([ORDER_DATE, SHIP_DATE, SIGNUP_DATE], fact_tables=["Orders"])
+    assert _inactive(result.relationships) == [False, True, True]
+
+
+def test_shared_rendering_is_deterministic():
+    first = render_shared_date_table([ORDER_DATE, SIGNUP_DATE])
+    second = render_shared_date_table([ORDER_DATE, SIGNUP_DATE])
+    assert first == second
+
+
+def test_local_tables_one_per_column():
+    result = render_local_date_tables([ORDER_DATE, SHIP_DATE])
+    assert len(result.tables) == 2
+    assert result.targets[ORDER_DATE] != result.targets[SHIP_DATE]
+    assert result.relationships == []
+
+
+def test_build_date_tables_unknown_mode_falls_back_to_local():
+    assert build_date_tables([ORDER_DATE], mode="bogus").mode == "local"
+    assert build_date_tables([ORDER_DATE], mode="shared", existing_tables=["Date"]).targets[ORDER_DATE] == "Date 2"
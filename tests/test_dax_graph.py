@@ -0,0 +1,108 @@
+import asyncio
+
+from app.core.dax_graph import CalculationGraph, CalculationNode, convert_by_dependency_levels
+from app.core.dax_translation_cache import DaxTranslationCacheManager
+
+
+def test_cycle_level_holds_only_cycle_members():
+    graph = CalculationGraph([
+        CalculationNode("[A]", "A", "[B] + 1"),
+        CalculationNode("[B]", "B", "[A] + 1"),
+        CalculationNode("[C]", "C", "[A] * 2"),
+        CalculationNode("[D]", "D", "1"),
+        CalculationNode("[E]", "E", "[D] + [C]"),
+    ])
+    assert graph.levels == [["[D]"], ["[A]", "[B]"], ["[C]"], ["[E]"]]
+
+
+def test_acyclic_levels_follow_dependencies():
+    graph = CalculationGraph([
+        CalculationNode("[Calculation_1]", "Profit", "[Sales] - [Cost]"),
+        CalculationNode("[Calculation_2]", "Margin", "[Profit] / [Sales]"),
+    ])
+    assert graph.levels == [["[Calculation_1]"], ["[Calculation_2]"]]
+
+
+class StubGateway:
+    """Answers every item with a measure and records the user messages it was sent."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def complete_batched(self, system_message, items, build_user_message, model=None):
+        self.messages.append(build_user_message(list(range(len(items)))))
+        return [{"dax": f"DAX {i}", "type": "measure"} for i in range(len(items))]
+
+
+def test_convert_by_dependency_levels_sends_formulas_to_gateway():
+    gateway = StubGateway()
+    calculations = [
+        CalculationNode("[Calculation_1]", "Margin", "SUM([Profit])/SUM([Sales])"),
+        CalculationNode("[Calculation_2]", "Double Margin", "[Calculation_1] * 2"),
+    ]
+    metadata = [{"name": "Profit", "datatype": "real"}, {"name": "Sales", "datatype": "real"},
+                {"name": "Region", "datatype": "string"}]
+
+    converted = asyncio.run(convert_by_dependency_levels(calculations, metadata, gateway=gateway))
+
+    assert converted == {
+        "Margin": {"dax": "DAX 0", "type": "measure", "table": None},
+        "Double Margin": {"dax": "DAX 0", "type": "measure", "table": None},
+    }
+    first, second = gateway.messages
+    assert "Margin (calculation) = SUM([Profit])/SUM([Sales])" in first
+    assert "Region" not in first
+    assert "Double Margin (calculation) = [Margin] * 2" in second
+    assert "- [Margin] (measure)" in second
+
+
+class StubCache:
+    """In-memory stand-in for DaxTranslationCacheManager."""
+
+    def __init__(self):
+        self.entries = {}
+        self.lookups = 0
+
+    build_cache_key = staticmethod(DaxTranslationCacheManager.build_cache_key)
+
+    def get_many(self, organization_id, cache_keys):
+        self.lookups += len(cache_keys)
+        return {key: self.entries[(organization_id, key)] for key in cache_keys if (organization_id, key) in self.entries}
+
+    def store(self, organization_id, key_parts, tableau_formula, dax_output):
+        self.entries[(organization_id, key_parts["cache_key"])] = dax_output
+        return True
+
+
+class ModelStubGateway(StubGateway):
+    def model_name(self, model=None):
+        return model or "gpt-test"
+
+
+def test_cached_translations_skip_the_gateway():
+    cache = StubCache()
+    calculations = [
+        CalculationNode("[Calculation_1]", "Margin", "SUM([Profit])/SUM([Sales])"),
+        CalculationNode("[Calculation_2]", "Double Margin", "[Calculation_1] * 2"),
+    ]
+    metadata = [{"name": "Profit"}, {"name": "Sales"}]
+
+    first_gateway = ModelStubGateway()
+    first = asyncio.run(convert_by_dependency_levels(
+        calculations, metadata, gateway=first_gateway, organization_id="org", cache=cache
+    ))
+    assert len(first_gateway.messages) == 2
+    assert len(cache.entries) == 2
+
+    second_gateway = ModelStubGateway()
+    second = asyncio.run(convert_by_dependency_levels(
+        calculations, metadata, gateway=second_gateway, organization_id="org", cache=cache
+    ))
+    assert second_gateway.messages == []
+    assert second == first
+
+    other_org = ModelStubGateway()
+    asyncio.run(convert_by_dependency_levels(
+        calculations, metadata, gateway=other_org, organization_id="other", cache=cache
+    ))
+    assert len(other_org.messages) == 2
@@ -0,0 +1,41 @@
+from app.core.dax_translation_cache import DaxTranslationCacheManager
+
+normalize = DaxTranslationCacheManager.normalize_formula
+
+
+def test_urls_in_string_literals_are_not_treated_as_comments():
+    assert normalize('"https://a.com"') != normalize('"https://b.com"')
+    assert normalize('"https://a.com"') == '"https://a.com"'
+
+
+def test_comment_markers_inside_field_names_are_kept():
+    assert normalize("[Sales // Net] + 1") != normalize("[Sales // Gross] + 1")
+    assert normalize("SUM([a/*b*/c])") == "SUM( [a/*b*/c] )"
+
+
+def test_comments_outside_tokens_are_dropped():
+    formula = "SUM([Sales]) // total\n+ /* tax */ 1"
+    assert normalize(formula) == normalize("SUM([Sales]) + 1")
+
+
+def test_whitespace_collapsed_only_outside_tokens():
+    assert normalize("IF  [x]\n\tTHEN 'a  b' END") == "IF [x] THEN 'a  b' END"
+    assert normalize("IF [x] THEN 'a b' END") != normalize("IF [x] THEN 'a  b' END")
+
+
+def test_escaped_quotes_and_brackets_stay_inside_token():
+    assert normalize('"say ""//hi"""  +  1') == '"say ""//hi""" + 1'
+    assert normalize("[a]]//b]") == "[a]]//b]"
+
+
+def test_unterminated_string_keeps_its_text():
+    assert normalize('"https://a.com') != normalize('"https://b.com')
+
+
+def test_cache_key_depends_on_normalized_formula():
+    columns = [{"name": "Sales", "datatype": "real"}]
+    first = DaxTranslationCacheManager.build_cache_key('"https://a.com"', columns, "gpt")
+    second = DaxTranslationCacheManager.build_cache_key('"https://b.com"', columns, "gpt")
+    same = DaxTranslationCacheManager.build_cache_key('  "https://a.com"  // note', columns, "gpt")
+    assert first["cache_key"] != second["cache_key"]
+    assert first["cache_key"] == same["cache_key"]
@@ -0,0 +1,51 @@
+import asyncio
+import os
+import zipfile
+
+from app.core.powerbi_template import PowerBITemplateCache
+
+FILES = {
+    "Model.SemanticModel/definition/tables/Orders.tmdl": "table Orders",
+    "Model.Report/report.json": "{}",
+    "Model.Report/StaticResources/logo.png": "PNG",
+}
+
+
+class FakeStorage:
+    def __init__(self, tmp_path, etag=None):
+        self.etag = etag
+        self.downloads = 0
+        self.zip_path = tmp_path / "template.zip"
+        with zipfile.ZipFile(self.zip_path, "w") as zipf:
+            for name, content in FILES.items():
+                zipf.writestr(name, content)
+
+    async def get_object_etag(self, object_key):
+        return self.etag
+
+    async def download_file(self, object_key, file_path):
+        self.downloads += 1
+        with open(self.zip_path, "rb") as src, open(file_path, "wb") as dst:
+            dst.write(src.read())
+
+
+def test_overlay_copies_every_editable_file(tmp_path):
+    cache = PowerBITemplateCache(cache_dir=str(tmp_path / "cache"), revalidate_seconds=0)
+    storage = FakeStorage(tmp_path, etag='"v1"')
+    overlay = tmp_path / "overlay"
+    version = asyncio.run(cache.create_overlay(storage, overlay))
+
+    for rel_path in FILES:
+        shared = os.stat(version.directory / rel_path).st_ino
+        linked = os.stat(overlay / rel_path).st_ino == shared
+        assert linked == rel_path.endswith(".png")
+
+    (overlay / "Model.Report/report.json").write_text('{"edited": true}')
+    assert (version.directory / "Model.Report/report.json").read_text() == "{}"
+
+
+def test_unversioned_template_is_downloaded_again_by_a_new_process(tmp_path):
+    storage = FakeStorage(tmp_path)
+    asyncio.run(PowerBITemplateCache(cache_dir=str(tmp_path / "cache")).get(storage))
+    asyncio.run(PowerBITemplateCache(cache_dir=str(tmp_path / "cache")).get(storage))
+    assert storage.downloads == 2
@@ -0,0 +1,26 @@
+import json
+
+from app.core.prompt_context import json_metadata_for_formulas, metadata_for_formulas, prune_metadata
+
+METADATA = {
+    "Orders": [
+        {"name": "Sales", "datatype": "real"},
+        {"name": "Region", "datatype": "string"},
+    ],
+    "People": [{"name": "Manager", "datatype": "string"}],
+}
+
+
+def test_prune_keeps_only_referenced_columns():
+    assert prune_metadata(METADATA, ["SUM([Sales])"]) == {"Orders": [{"name": "Sales", "datatype": "real"}]}
+
+
+def test_pipe_encoding_lists_one_row_per_column():
+    assert metadata_for_formulas(METADATA, ["[Sales] + LEN([Manager])"]) == (
+        "table|name|datatype\nOrders|Sales|real\nPeople|Manager|string"
+    )
+
+
+def test_json_variant_is_pruned_json():
+    text = json_metadata_for_formulas(METADATA, ["[Region]"])
+    assert json.loads(text) == {"Orders": [{"name": "Region", "datatype": "string"}]}
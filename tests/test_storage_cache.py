@@ -0,0 +1,86 @@
+import pytest
+
+from app.core import storage_cache
+from app.core.storage_cache import ObjectMetadata, ObjectMetadataCache, PresignedUrlCache
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(storage_cache, "time", fake)
+    return fake
+
+
+def test_presigned_url_reused_while_half_its_lifetime_is_left(clock):
+    cache = PresignedUrlCache()
+    cache.set("bucket", "a.zip", 3600, "https://signed/a")
+    clock.now += 1800
+    assert cache.get("bucket", "a.zip", 3600) == "https://signed/a"
+    clock.now += 1
+    assert cache.get("bucket", "a.zip", 3600) is None
+
+
+def test_presigned_url_keyed_by_namespace_and_expiration(clock):
+    cache = PresignedUrlCache()
+    cache.set("bucket", "a.zip", 3600, "https://signed/a")
+    assert cache.get("other", "a.zip", 3600) is None
+    assert cache.get("bucket", "a.zip", 600) is None
+
+
+def test_presigned_url_cache_evicts_least_recently_used(clock):
+    cache = PresignedUrlCache(max_entries=2)
+    cache.set("bucket", "a", 3600, "url-a")
+    cache.set("bucket", "b", 3600, "url-b")
+    cache.get("bucket", "a", 3600)
+    cache.set("bucket", "c", 3600, "url-c")
+    assert cache.get("bucket", "b", 3600) is None
+    assert cache.get("bucket", "a", 3600) == "url-a"
+
+
+def test_presigned_url_invalidate_drops_every_expiration(clock):
+    cache = PresignedUrlCache()
+    cache.set("bucket", "a", 3600, "url-1h")
+    cache.set("bucket", "a", 600, "url-10m")
+    cache.invalidate("bucket", "a")
+    assert cache.get("bucket", "a", 3600) is None
+    assert cache.get("bucket", "a", 600) is None
+
+
+def test_metadata_present_and_absent_ttls(clock):
+    cache = ObjectMetadataCache(present_ttl=30, absent_ttl=15)
+    cache.record_present("bucket", "a", etag='"e1"', size=10)
+    cache.record_absent("bucket", "b")
+    clock.now += 15
+    assert cache.get("bucket", "a") == ObjectMetadata(True, '"e1"', 10)
+    assert cache.get("bucket", "b") is None
+    clock.now += 15
+    assert cache.get("bucket", "a") is None
+
+
+def test_metadata_later_record_replaces_earlier(clock):
+    cache = ObjectMetadataCache()
+    cache.record_present("bucket", "a")
+    cache.record_absent("bucket", "a")
+    assert cache.get("bucket", "a").exists is False
+    cache.invalidate("bucket", "a")
+    assert cache.get("bucket", "a") is None
+
+
+def test_metadata_cache_is_bounded(clock):
+    cache = ObjectMetadataCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.record_present("bucket", key)
+    assert cache.get("bucket", "a") is None
+    assert cache.get("other", "b") is None
+    assert cache.get("bucket", "c").exists
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from app.core.exceptions import StorageMoveError
+from app.core.storage_move import move_object
+
+
+class FakeStorage:
+    def __init__(self, objects):
+        self.objects = dict(objects)
+        self.fail_copy = False
+
+    async def list_objects(self, prefix):
+        return {key: size for key, size in self.objects.items() if key.startswith(prefix)}
+
+    async def copy_object(self, source_key, destination_key, size=None):
+        if self.fail_copy:
+            return False
+        self.objects[destination_key] = self.objects[source_key]
+        return True
+
+    async def delete_objects(self, keys):
+        for key in keys:
+            self.objects.pop(key, None)
+        return []
+
+
+def test_move_object_leaves_keys_sharing_the_prefix():
+    storage = FakeStorage({"r/tableau_file/Sales": 10, "r/tableau_file/Sales2.twbx": 20})
+    assert asyncio.run(move_object(storage, "r/tableau_file/Sales", "r/tableau_file/Revenue"))
+    assert storage.objects == {"r/tableau_file/Revenue": 10, "r/tableau_file/Sales2.twbx": 20}
+
+
+def test_move_object_missing_source_is_a_no_op():
+    storage = FakeStorage({"r/tableau_file/Sales2.twbx": 20})
+    assert not asyncio.run(move_object(storage, "r/tableau_file/Sales", "r/tableau_file/Revenue"))
+    assert storage.objects == {"r/tableau_file/Sales2.twbx": 20}
+
+
+def test_failed_copy_keeps_the_source():
+    storage = FakeStorage({"r/tableau_file/Sales": 10})
+    storage.fail_copy = True
+    with pytest.raises(StorageMoveError):
+        asyncio.run(move_object(storage, "r/tableau_file/Sales", "r/tableau_file/Revenue"))
+    assert storage.objects == {"r/tableau_file/Sales": 10}
@@ -0,0 +1,69 @@
+import re
+
+import pytest
+
+from app.core.tableau_dax_compiler import CompiledFormula, TableauDaxCompiler, UnsupportedFormulaError
+
+
+@pytest.fixture
+def compiler():
+    compiler = TableauDaxCompiler(workbook_name="Superstore")
+    compiler.add_field("Sales", table="Orders", datatype="real", aliases=["[Calculation_1]"])
+    compiler.add_field("Cost", table="Orders", datatype="real")
+    compiler.add_field("Region", table="Orders", datatype="string")
+    compiler.add_field("Order Date", table="Orders", datatype="date")
+    compiler.add_field("Target", table="Targets", datatype="real")
+    compiler.add_field("Total Sales", kind="measure", datatype="real")
+    return compiler
+
+
+@pytest.mark.parametrize("formula, expected", [
+    ("SUM([Sales])", CompiledFormula("SUM('Orders'[Sales])", "measure", None, "number")),
+    ("SUM([Sales]-[Cost])", CompiledFormula("SUMX('Orders', 'Orders'[Sales] - 'Orders'[Cost])", "measure", None, "number")),
+    ("COUNTD([Region])", CompiledFormula("DISTINCTCOUNT('Orders'[Region])", "measure", None, "number")),
+    ("SUM([Calculation_1]) / SUM([Cost])",
+     CompiledFormula("DIVIDE(SUM('Orders'[Sales]), SUM('Orders'[Cost]))", "measure", None, "number")),
+    ("ZN(SUM([Sales]))", CompiledFormula("COALESCE(SUM('Orders'[Sales]), 0)", "measure", None, "number")),
+    ("[Total Sales]*2", CompiledFormula("[Total Sales] * 2", "measure", None, "number")),
+    ("{FIXED [Region] : SUM([Sales])}",
+     CompiledFormula("CALCULATE(SUM('Orders'[Sales]), ALLEXCEPT('Orders', 'Orders'[Region]))", "measure", None, "number")),
+    ("[Sales]-[Cost]", CompiledFormula("'Orders'[Sales] - 'Orders'[Cost]", "column", "Orders", "number")),
+    ('IF [Region]="East" THEN 1 ELSEIF [Region]="West" THEN 2 ELSE 0 END',
+     CompiledFormula('SWITCH(TRUE(), \'Orders\'[Region] = "East", 1, \'Orders\'[Region] = "West", 2, 0)',
+                     "column", "Orders", "number")),
+    ('CASE [Region] WHEN "A" THEN "x" ELSE "y" END',
+     CompiledFormula('SWITCH(\'Orders\'[Region], "A", "x", "y")', "column", "Orders", "string")),
+    ('DATEPART("month", [Order Date])', CompiledFormula("MONTH('Orders'[Order Date])", "column", "Orders", "number")),
+    ("NOT ISNULL([Region]) AND [Sales] > 10",
+     CompiledFormula("NOT(ISBLANK('Orders'[Region])) && ('Orders'[Sales] > 10)", "column", "Orders", "boolean")),
+    ("#2024-01-15#", CompiledFormula("DATE(2024, 1, 15)", "measure", None, "date")),
+    ('"it""s"', CompiledFormula('"it""s"', "measure", None, "string")),
+])
+def test_compile(compiler, formula, expected):
+    assert compiler.compile(formula) == expected
+
+
+@pytest.mark.parametrize("formula, reason", [
+    ("", "empty formula"),
+    ("[Unknown]", "unknown field [Unknown]"),
+    ("[Sales]+[Target]", "row-level formula spans several tables"),
+    ("WINDOW_SUM(SUM([Sales]))", "unsupported function WINDOW_SUM"),
+])
+def test_unsupported_formulas_fall_back(compiler, formula, reason):
+    with pytest.raises(UnsupportedFormulaError, match=re.escape(reason)):
+        compiler.compile(formula)
+    assert compiler.try_compile(formula) is None
+    assert compiler.fallback_reasons[reason] == 1
+
+
+def test_constant_follows_role(compiler):
+    assert compiler.compile("1", role="dimension").type == "measure"  # no table to host a column
+    assert compiler.compile("[Sales] * 0 + 1", role="measure").type == "column"
+
+
+def test_coverage_counts_compiled_and_fallback(compiler):
+    compiler.try_compile("SUM([Sales])")
+    compiler.try_compile("WINDOW_SUM(SUM([Sales]))")
+    stats = compiler.coverage()
+    assert (stats["total"], stats["compiled"], stats["fallback"]) == (2, 1, 1)
+    assert stats["coverage_rate"] == 0.5
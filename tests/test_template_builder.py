@@ -0,0 +1,54 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.core import templates
+from app.core.template_builder import TemplateBuilder, dumps_report, get_template_builder
+
+# Golden files hold the legacy rendering of each case: template.format(**kwargs), parsed and
+# re-serialized compactly with json, captured before the builders existed.
+FIXTURES = Path(__file__).parent / "fixtures" / "templates"
+CASES = json.loads((FIXTURES / "cases.json").read_text(encoding="utf-8"))
+
+
+def _golden(case: str) -> bytes:
+    return (FIXTURES / f"{case}.json").read_bytes()
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_dumps_report_matches_legacy_output_byte_for_byte(case):
+    spec = CASES[case]
+    built = get_template_builder(spec["template"]).build(**spec["kwargs"])
+    assert dumps_report(built).encode("utf-8") == _golden(case)
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_build_matches_parsed_legacy_output(case):
+    spec = CASES[case]
+    builder = get_template_builder(spec["template"])
+    assert builder.build(**spec["kwargs"]) == json.loads(_golden(case))
+
+
+def test_fragment_templates_fall_back_to_text_mode():
+    assert not get_template_builder("text_box_json").compiled
+    assert get_template_builder("slicer_template").compiled
+
+
+def test_build_does_not_mutate_skeleton():
+    spec = CASES["slicer"]
+    builder = TemplateBuilder("slicer_template", templates.slicer_template)
+    first = builder.build(**spec["kwargs"])
+    second = builder.build(**dict(spec["kwargs"], title_text="Other", x=1))
+    assert first != second
+    assert builder.build(**spec["kwargs"]) == first
+
+
+def test_dumps_report_falls_back_for_non_string_keys():
+    assert dumps_report({1: "a"}) == '{"1":"a"}'
+
+
+@pytest.mark.parametrize("value", [1e-07, 1e-05, 1e16, -2.5e300, 123456789012345678.0, 0.1, 1e15])
+def test_dumps_report_formats_floats_like_json(value):
+    obj = {"x": [value, "1e5"], "y": value}
+    assert dumps_report(obj) == json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
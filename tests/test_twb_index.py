@@ -0,0 +1,40 @@
+from app.core import twb_index
+from app.core.twb_index import load_workbook_index
+
+WORKBOOK = """<?xml version='1.0' encoding='utf-8' ?>
+<workbook>
+  <datasources><datasource name='Orders'><column name='[Sales]' datatype='real'/></datasource></datasources>
+  <worksheets><worksheet name='Sheet 1'><table/></worksheet></worksheets>
+  <thumbnails><thumbnail name='Sheet 1'>{payload}</thumbnail></thumbnails>
+</workbook>
+"""
+
+
+def _write(tmp_path):
+    path = tmp_path / "book.twb"
+    path.write_text(WORKBOOK.format(payload="A" * 100000), encoding="utf-8")
+    return str(path)
+
+
+def test_pruned_parse_drops_thumbnails_and_keeps_the_rest(tmp_path):
+    path = _write(tmp_path)
+    tree = load_workbook_index(path, prune=False)
+    pruned = load_workbook_index(path, prune=True)
+
+    assert pruned.stats["mode"] == "pruned" and tree.stats["mode"] == "tree"
+    assert list(pruned.worksheets) == list(tree.worksheets) == ["Sheet 1"]
+    assert list(pruned.columns["Orders"]) == ["[Sales]"]
+    assert tree.descendants("thumbnail") and not pruned.descendants("thumbnail")
+
+
+def test_peak_heap_is_measured_per_parse(tmp_path, monkeypatch):
+    path = _write(tmp_path)
+    monkeypatch.setattr(twb_index, "TWB_TRACE_MEMORY", True)
+    first = load_workbook_index(path, prune=False)
+    second = load_workbook_index(path, prune=False)
+    # Each parse reports its own peak instead of the process-lifetime maximum.
+    assert first.stats["peak_heap_mb"] > 0
+    assert second.stats["peak_heap_mb"] > 0
+
+    monkeypatch.setattr(twb_index, "TWB_TRACE_MEMORY", False)
+    assert load_workbook_index(path).stats["peak_heap_mb"] is None
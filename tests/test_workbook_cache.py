@@ -0,0 +1,49 @@
+import asyncio
+
+from app.core.workbook_cache import WorkbookCache
+
+
+class FakeStorage:
+    def __init__(self, content, etag):
+        self.content = content
+        self.etag = etag
+        self.downloads = 0
+
+    async def get_object_etag(self, object_key):
+        return self.etag
+
+    async def download_file(self, object_key, file_path):
+        self.downloads += 1
+        with open(file_path, "wb") as f:
+            f.write(self.content)
+
+
+KEY = "BI-Portfinal/org/r1/tableau_file/Sales.twb"
+
+
+def test_second_lookup_is_a_hit_and_key_locks_are_released(tmp_path):
+    cache = WorkbookCache(str(tmp_path))
+    storage = FakeStorage(b"<workbook/>", '"v1"')
+
+    async def run():
+        return await asyncio.gather(*(cache.get_file(KEY, storage) for _ in range(3)))
+
+    paths = asyncio.run(run())
+    assert len(set(paths)) == 1
+    assert storage.downloads == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+    assert cache._key_locks == {} and cache._key_lock_users == {}
+
+
+def test_changed_etag_or_invalidation_downloads_again(tmp_path):
+    cache = WorkbookCache(str(tmp_path))
+    storage = FakeStorage(b"<workbook/>", '"v1"')
+    asyncio.run(cache.get_file(KEY, storage))
+
+    storage.etag = '"v2"'
+    asyncio.run(cache.get_file(KEY, storage))
+    assert storage.downloads == 2
+
+    cache.invalidate_keys([KEY, "unrelated.json"])
+    asyncio.run(cache.get_file(KEY, storage))
+    assert storage.downloads == 3
@@ -0,0 +1,142 @@
+import os
+import uuid
+import asyncio
+import hashlib
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import aiofiles
+
+from app.core.config import TMDL_WRITE_CONCURRENCY
+from app.core.logger_setup import logger
+
+TMDL_SUFFIX = ".tmdl"
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class TmdlModel:
+    """
+    The ``.tmdl`` files of a semantic model definition, diffed and written incrementally.
+
+    ``load`` records a hash of every file under ``root`` (``load_async`` does the
+    reading in a worker thread, for use on the event loop). Callers then render
+    tables with ``set`` / ``render`` (e.g. from ``NUMERIC_PARAMETER_TEMPLATE``)
+    and ``remove`` stale ones; ``write`` touches only files whose rendered
+    content differs from disk, concurrently. ``pending_entries`` gives the same
+    changes as bytes for writing straight into an output zip without touching disk.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._disk_hashes: Dict[str, str] = {}
+        self._staged: Dict[str, bytes] = {}
+        self._removed: set = set()
+
+    @classmethod
+    def load(cls, root: Path) -> "TmdlModel":
+        model = cls(root)
+        if model.root.exists():
+            for path in model.root.rglob(f"*{TMDL_SUFFIX}"):
+                if path.is_file():
+                    model._disk_hashes[path.relative_to(model.root).as_posix()] = _content_hash(path.read_bytes())
+        return model
+
+    @classmethod
+    async def load_async(cls, root: Path) -> "TmdlModel":
+        return await asyncio.to_thread(cls.load, root)
+
+    @property
+    def files(self) -> List[str]:
+        return sorted((set(self._disk_hashes) | set(self._staged)) - self._removed)
+
+    def read(self, rel_path: str) -> Optional[str]:
+        """Staged content if any, else the file on disk."""
+        if rel_path in self._removed:
+            return None
+        if rel_path in self._staged:
+            return self._staged[rel_path].decode("utf-8")
+        path = self.root / rel_path
+        return path.read_text(encoding="utf-8") if path.exists() else None
+
+    def set(self, rel_path: str, content: str) -> None:
+        self._removed.discard(rel_path)
+        self._staged[rel_path] = content.encode("utf-8")
+
+    def render(self, rel_path: str, template: str, **kwargs) -> None:
+        self.set(rel_path, template.format(**kwargs))
+
+    def remove(self, rel_path: str) -> None:
+        self._staged.pop(rel_path, None)
+        if rel_path in self._disk_hashes:
+            self._removed.add(rel_path)
+
+    def diff(self) -> Dict[str, List[str]]:
+        changes = {"added": [], "changed": [], "unchanged": [], "removed": sorted(self._removed)}
+        for rel_path, data in sorted(self._staged.items()):
+            disk_hash = self._disk_hashes.get(rel_path)
+            if disk_hash is None:
+                changes["added"].append(rel_path)
+            elif disk_hash != _content_hash(data):
+                changes["changed"].append(rel_path)
+            else:
+                changes["unchanged"].append(rel_path)
+        return changes
+
+    def pending_entries(self, prefix: str = "") -> Dict[str, Optional[bytes]]:
+        """
+        ``{path: content}`` for added/changed files and ``{path: None}`` for removed ones.
+
+        Paths are relative to ``root``; pass ``prefix`` (``root`` relative to the
+        overlay, e.g. ``"Report.SemanticModel/definition"``) to get keys relative
+        to the overlay root, as ``build_overlay_zip`` expects.
+        """
+        prefix = prefix.strip("/")
+        key = (lambda p: f"{prefix}/{p}") if prefix else (lambda p: p)
+        changes = self.diff()
+        entries: Dict[str, Optional[bytes]] = {key(p): self._staged[p] for p in changes["added"] + changes["changed"]}
+        entries.update({key(p): None for p in changes["removed"]})
+        return entries
+
+    async def _write_file(self, rel_path: str, data: bytes, semaphore: asyncio.Semaphore) -> None:
+        path = self.root / rel_path
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        async with semaphore:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            async with aiofiles.open(tmp_path, "wb") as f:
+                await f.write(data)
+            # Replace rather than rewrite in place: the old file may be a hardlink to a shared template.
+            os.replace(tmp_path, path)
+
+    async def write(self, max_concurrency: int = TMDL_WRITE_CONCURRENCY) -> Dict[str, List[str]]:
+        """Write added/changed files and delete removed ones; returns the diff that was applied."""
+        changes = self.diff()
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        to_write = changes["added"] + changes["changed"]
+        await asyncio.gather(*(self._write_file(p, self._staged[p], semaphore) for p in to_write))
+        for rel_path in changes["removed"]:
+            (self.root / rel_path).unlink(missing_ok=True)
+
+        for rel_path in to_write:
+            self._disk_hashes[rel_path] = _content_hash(self._staged[rel_path])
+        for rel_path in changes["removed"]:
+            self._disk_hashes.pop(rel_path, None)
+        self._staged.clear()
+        self._removed.clear()
+        logger.info(
+            "[TMDL_WRITER] %s: wrote %s files, removed %s, skipped %s unchanged",
+            self.root, len(to_write), len(changes["removed"]), len(changes["unchanged"])
+        )
+        return changes
+
+    def write_zip(self, zipf: zipfile.ZipFile, arc_prefix: str) -> None:
+        """Write every current file into ``zipf`` (staged content from memory, the rest from disk)."""
+        for rel_path in self.files:
+            arcname = f"{arc_prefix}/{rel_path}" if arc_prefix else rel_path
+            if rel_path in self._staged:
+                zipf.writestr(arcname, self._staged[rel_path], compress_type=zipfile.ZIP_DEFLATED)
+            else:
+                zipf.write(self.root / rel_path, arcname, compress_type=zipfile.ZIP_DEFLATED)
@@ -0,0 +1,255 @@
+import os
+import re
+import time
+import zipfile
+import threading
+import tracemalloc
+import xml.etree.ElementTree as ET
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from typing import Dict, IO, Iterator, List, Optional, Tuple, Union
+
+from app.core.config import logger, TWB_PRUNE_THRESHOLD, TWB_TRACE_MEMORY
+from app.core.constants import TWB_PRUNED_TAGS
+from app.core.enums import TableauXMLTags
+
+
+# Matches the simple descendant selectors used by TableauXMLTags, e.g. ".//zone" or
+# ".//metadata-record[@class='column']".
+_DESCENDANT_SELECTOR = re.compile(r"^\.//([\w\-]+)(?:\[@([\w\-]+)='([^']*)'\])?$")
+_trace_lock = threading.Lock()
+
+
+class WorkbookIndex:
+    """
+    Index over a parsed Tableau workbook, built in a single pre-order walk.
+
+    Every element is numbered on entry and exit, so "descendants of X with tag T"
+    is a binary search over the pre-order positions of T instead of a fresh
+    ``.//T`` walk. Worksheets, dashboards, datasources, columns, calculations,
+    zones and filters are also exposed by name, with parent links.
+    """
+
+    def __init__(self, root: ET.Element):
+        self.root = root
+        self.stats: Dict[str, object] = {}
+        self._parent: Dict[ET.Element, Optional[ET.Element]] = {}
+        self._start: Dict[ET.Element, int] = {}
+        self._end: Dict[ET.Element, int] = {}
+        self._by_tag: Dict[str, List[ET.Element]] = {}
+        self._positions: Dict[str, List[int]] = {}
+
+        self.worksheets: Dict[str, ET.Element] = {}
+        self.dashboards: Dict[str, ET.Element] = {}
+        self.datasources: Dict[str, ET.Element] = {}
+        self.columns: Dict[str, Dict[str, ET.Element]] = {}
+        self.calculations: Dict[str, Dict[str, ET.Element]] = {}
+        self.zones: Dict[str, List[ET.Element]] = {}
+        self.filters: Dict[str, List[ET.Element]] = {}
+
+        self._build()
+
+    @classmethod
+    def from_string(cls, xml_text: Union[str, bytes]) -> "WorkbookIndex":
+        return cls(ET.fromstring(xml_text))
+
+    @classmethod
+    def from_file(cls, path: str) -> "WorkbookIndex":
+        return cls(ET.parse(path).getroot())
+
+    def _build(self) -> None:
+        counter = 0
+        # Iterative DFS so deeply nested zone trees cannot hit the recursion limit.
+        stack = [(self.root, None, False)]
+        while stack:
+            element, parent, closing = stack.pop()
+            if closing:
+                self._end[element] = counter
+                continue
+            counter += 1
+            self._start[element] = counter
+            self._parent[element] = parent
+            self._by_tag.setdefault(element.tag, []).append(element)
+            self._positions.setdefault(element.tag, []).append(counter)
+            self._classify(element, parent)
+            stack.append((element, parent, True))
+            for child in reversed(list(element)):
+                stack.append((child, element, False))
+
+    def _classify(self, element: ET.Element, parent: Optional[ET.Element]) -> None:
+        tag = element.tag
+        name = element.get(TableauXMLTags.NAME.value)
+        parent_tag = parent.tag if parent is not None else None
+
+        if tag == "worksheet" and parent_tag == "worksheets" and name:
+            self.worksheets[name] = element
+        elif tag == "dashboard" and parent_tag == "dashboards" and name:
+            self.dashboards[name] = element
+        elif tag == "datasource" and parent_tag == "datasources" and name:
+            # Worksheets reference datasources by name too; only the workbook-level definitions are kept.
+            grandparent = self._parent.get(parent)
+            if grandparent is self.root:
+                self.datasources[name] = element
+        elif tag == TableauXMLTags.COLUMN.value and parent is not None and parent_tag == "datasource" and name:
+            datasource_name = parent.get(TableauXMLTags.NAME.value)
+            self.columns.setdefault(datasource_name, {})[name] = element
+        elif tag == TableauXMLTags.CALCULATION.value and parent is not None and parent_tag == TableauXMLTags.COLUMN.value:
+            grandparent = self._parent.get(parent)
+            if grandparent is not None and grandparent.tag == "datasource" and parent.get(TableauXMLTags.NAME.value):
+                datasource_name = grandparent.get(TableauXMLTags.NAME.value)
+                self.calculations.setdefault(datasource_name, {})[parent.get(TableauXMLTags.NAME.value)] = parent
+        elif tag == "zone":
+            owner = self.ancestor(element, "dashboard")
+            if owner is not None:
+                self.zones.setdefault(owner.get(TableauXMLTags.NAME.value), []).append(element)
+        elif tag == "filter":
+            owner = self.ancestor(element, "worksheet")
+            if owner is not None:
+                self.filters.setdefault(owner.get(TableauXMLTags.NAME.value), []).append(element)
+
+    def parent(self, element: ET.Element) -> Optional[ET.Element]:
+        return self._parent.get(element)
+
+    def ancestor(self, element: ET.Element, tag: str) -> Optional[ET.Element]:
+        current = self._parent.get(element)
+        while current is not None and current.tag != tag:
+            current = self._parent.get(current)
+        return current
+
+    def descendants(self, tag: str, scope: Optional[ET.Element] = None) -> List[ET.Element]:
+        """All ``tag`` elements below ``scope`` (the whole workbook when omitted), in document order."""
+        elements = self._by_tag.get(tag, [])
+        if scope is None or scope is self.root:
+            return [e for e in elements if e is not self.root]
+        if scope not in self._start:
+            return scope.findall(f".//{tag}")
+        positions = self._positions[tag] if tag in self._positions else []
+        lo = bisect_right(positions, self._start[scope])
+        hi = bisect_left(positions, self._end[scope] + 1)
+        return elements[lo:hi]
+
+    def findall(self, selector: Union[TableauXMLTags, str], scope: Optional[ET.Element] = None) -> List[ET.Element]:
+        """
+        Drop-in for ``scope.findall(selector)``.
+
+        Simple descendant selectors (``.//tag`` with an optional single ``[@attr='value']``)
+        are answered from the index; anything else falls back to ElementTree.
+        """
+        path = selector.value if isinstance(selector, TableauXMLTags) else selector
+        match = _DESCENDANT_SELECTOR.match(path)
+        if not match:
+            return (scope if scope is not None else self.root).findall(path)
+        tag, attr, value = match.groups()
+        elements = self.descendants(tag, scope)
+        if attr:
+            elements = [e for e in elements if e.get(attr) == value]
+        return elements
+
+    def find(self, selector: Union[TableauXMLTags, str], scope: Optional[ET.Element] = None) -> Optional[ET.Element]:
+        elements = self.findall(selector, scope)
+        return elements[0] if elements else None
+
+    def worksheet_datasources(self, worksheet_name: str) -> List[str]:
+        """Names of the datasources a worksheet's view depends on."""
+        worksheet = self.worksheets.get(worksheet_name)
+        if worksheet is None:
+            return []
+        return [
+            d.get("datasource")
+            for d in self.descendants("datasource-dependencies", worksheet)
+            if d.get("datasource")
+        ]
+
+
+def _parse_pruned(source: IO[bytes]) -> ET.Element:
+    """
+    Build the workbook tree with ``iterparse``, dropping heavy subtrees as soon as they close.
+
+    The index keeps the rest of the tree, so this is not a streaming parse: it
+    only avoids holding thumbnails and embedded images, which can be most of a
+    large workbook's bytes and are never read by the pipelines. They are
+    cleared and detached from their parent the moment their end tag is seen.
+    """
+    root = None
+    stack: List[ET.Element] = []
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            stack.append(element)
+            continue
+        stack.pop()
+        if element.tag in TWB_PRUNED_TAGS:
+            element.clear()
+            if stack:
+                stack[-1].remove(element)
+    return root
+
+
+@contextmanager
+def _traced_memory() -> Iterator[Dict[str, Optional[float]]]:
+    """
+    Peak Python heap allocated inside the block, in MB, when ``TWB_TRACE_MEMORY`` is on.
+
+    tracemalloc is process-wide, so one parse is traced at a time (others report
+    None), and allocations by other threads during that parse are counted too.
+    """
+    usage: Dict[str, Optional[float]] = {"peak_mb": None}
+    if not TWB_TRACE_MEMORY or tracemalloc.is_tracing() or not _trace_lock.acquire(blocking=False):
+        yield usage
+        return
+    try:
+        tracemalloc.start()
+        try:
+            yield usage
+        finally:
+            usage["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            tracemalloc.stop()
+    finally:
+        _trace_lock.release()
+
+
+def _open_workbook_xml(path: str) -> Tuple[IO[bytes], int, Optional[zipfile.ZipFile]]:
+    """Open the .twb XML stream for a .twb or .twbx path and return it with its uncompressed size."""
+    if path.lower().endswith(".twbx"):
+        archive = zipfile.ZipFile(path)
+        member = next((m for m in archive.infolist() if m.filename.lower().endswith(".twb")), None)
+        if member is None:
+            archive.close()
+            raise ValueError(f"No .twb file found inside {os.path.basename(path)}")
+        return archive.open(member), member.file_size, archive
+    return open(path, "rb"), os.path.getsize(path), None
+
+
+def load_workbook_index(path: str, prune: Optional[bool] = None) -> WorkbookIndex:
+    """
+    Parse a .twb or .twbx into a WorkbookIndex.
+
+    Workbooks whose XML is larger than ``TWB_PRUNE_THRESHOLD`` bytes are parsed
+    with ``_parse_pruned`` unless ``prune`` is set explicitly. Parse time, and the
+    peak heap of this parse when ``TWB_TRACE_MEMORY`` is on, are logged and
+    stored on ``index.stats``.
+    """
+    source, xml_size, archive = _open_workbook_xml(path)
+    use_pruning = xml_size > TWB_PRUNE_THRESHOLD if prune is None else prune
+    started = time.perf_counter()
+    with _traced_memory() as memory:
+        try:
+            root = _parse_pruned(source) if use_pruning else ET.parse(source).getroot()
+        finally:
+            source.close()
+            if archive is not None:
+                archive.close()
+        index = WorkbookIndex(root)
+
+    index.stats = {
+        "mode": "pruned" if use_pruning else "tree",
+        "xml_bytes": xml_size,
+        "parse_seconds": round(time.perf_counter() - started, 3),
+        "peak_heap_mb": memory["peak_mb"],
+    }
+    logger.info(
+        "[TWB_INDEX] Parsed %s (%s bytes) in %s mode in %ss; peak heap %s MB",
+        os.path.basename(path), xml_size, index.stats["mode"], index.stats["parse_seconds"], index.stats["peak_heap_mb"]
+    )
+    return index
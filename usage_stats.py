@@ -0,0 +1,220 @@
+import time
+import asyncio
+from collections import OrderedDict
+import aiohttp
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import logger, USAGE_STATS_MAX_CONCURRENCY, USAGE_STATS_CACHE_TTL, USAGE_STATS_CACHE_SIZE
+from app.core.constants import (
+    MAX_DOWNLOAD_RETRIES, RETRY_BACKOFF_BASE, TABLEAU_AUTH_HEADER, USAGE_STATS_HITS_KEY,
+    USAGE_STATS_LAST_ACCESS_KEY, WORKBOOK_USAGE_STATISTICS_URL
+)
+
+
+class WorkbookUsage(NamedTuple):
+    """View statistics for one workbook, keyed back to its report row."""
+    workbook_id: str
+    report_id: str
+    view_count: Optional[int] = None
+    last_viewed: Optional[datetime] = None
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts to the server (additive increase, multiplicative decrease).
+
+    Every 429 halves the number of in-flight requests; each run of ``limit``
+    successes allows one more, up to ``max_limit``.
+    """
+
+    def __init__(self, max_limit: int, initial_limit: Optional[int] = None):
+        self.max_limit = max(1, max_limit)
+        self.limit = min(self.max_limit, initial_limit or self.max_limit)
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.max_limit:
+            self.limit += 1
+            self._successes = 0
+
+    def on_throttled(self) -> None:
+        self.limit = max(1, self.limit // 2)
+        self._successes = 0
+
+
+def _parse_last_access(value) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            # Epoch milliseconds
+            return datetime.fromtimestamp(value / 1000, tz=timezone.utc).replace(tzinfo=None)
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except (ValueError, OverflowError, OSError):
+        logger.warning("[USAGE_STATS] Could not parse last access time '%s'", value)
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class UsageStatsCollector:
+    """
+    Fetches per-workbook usage statistics from Tableau Server concurrently.
+
+    Results are cached per (server, workbook) for ``USAGE_STATS_CACHE_TTL``
+    seconds so repeated refreshes of the same site do not hit the server again.
+    The cache holds at most ``USAGE_STATS_CACHE_SIZE`` entries, oldest first out.
+    """
+
+    # (server_url, workbook_id) -> (expires_at, WorkbookUsage)
+    _cache: "OrderedDict[Tuple[str, str], Tuple[float, WorkbookUsage]]" = OrderedDict()
+
+    def __init__(
+        self,
+        server_url: str,
+        auth_token: str,
+        max_concurrency: int = USAGE_STATS_MAX_CONCURRENCY,
+        cache_ttl: int = USAGE_STATS_CACHE_TTL
+    ):
+        self.server_url = server_url.rstrip("/")
+        self.auth_token = auth_token
+        self.max_concurrency = max(1, max_concurrency)
+        self.cache_ttl = cache_ttl
+
+    def _cached(self, workbook_id: str) -> Optional[WorkbookUsage]:
+        key = (self.server_url, workbook_id)
+        entry = UsageStatsCollector._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            UsageStatsCollector._cache.pop(key, None)
+            return None
+        return entry[1]
+
+    def _store(self, usage: WorkbookUsage) -> None:
+        cache = UsageStatsCollector._cache
+        key = (self.server_url, usage.workbook_id)
+        cache[key] = (time.monotonic() + self.cache_ttl, usage)
+        cache.move_to_end(key)
+        while len(cache) > USAGE_STATS_CACHE_SIZE:
+            cache.popitem(last=False)
+
+    @classmethod
+    def clear_cache(cls, server_url: Optional[str] = None) -> None:
+        if server_url is None:
+            cls._cache.clear()
+            return
+        server_url = server_url.rstrip("/")
+        for key in [k for k in cls._cache if k[0] == server_url]:
+            cls._cache.pop(key, None)
+
+    @staticmethod
+    def _retry_after(resp: aiohttp.ClientResponse, attempt: int) -> float:
+        header = resp.headers.get("Retry-After")
+        if header:
+            try:
+                return max(0.0, float(header))
+            except ValueError:
+                pass
+        return RETRY_BACKOFF_BASE ** attempt
+
+    async def _fetch_one(
+        self,
+        session: aiohttp.ClientSession,
+        limiter: AdaptiveLimiter,
+        workbook_id: str,
+        report_id: str
+    ) -> Optional[WorkbookUsage]:
+        cached = self._cached(workbook_id)
+        if cached:
+            return cached._replace(report_id=report_id)
+
+        url = WORKBOOK_USAGE_STATISTICS_URL.format(server_url=self.server_url, workbook_id=workbook_id)
+        headers = {TABLEAU_AUTH_HEADER: self.auth_token, "Accept": "application/json"}
+
+        for attempt in range(1, MAX_DOWNLOAD_RETRIES + 1):
+            wait_time = None
+            reason = None
+            try:
+                async with limiter:
+                    async with session.get(url, headers=headers) as resp:
+                        if resp.status == 429 or resp.status >= 500:
+                            if resp.status == 429:
+                                limiter.on_throttled()
+                                reason = "Throttled"
+                            else:
+                                reason = f"Server error {resp.status}"
+                            wait_time = self._retry_after(resp, attempt)
+                        else:
+                            resp.raise_for_status()
+                            payload = await resp.json(content_type=None)
+                            limiter.on_success()
+                            usage = WorkbookUsage(
+                                workbook_id=workbook_id,
+                                report_id=report_id,
+                                view_count=payload.get(USAGE_STATS_HITS_KEY),
+                                last_viewed=_parse_last_access(payload.get(USAGE_STATS_LAST_ACCESS_KEY))
+                            )
+                            self._store(usage)
+                            return usage
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                wait_time = RETRY_BACKOFF_BASE ** attempt
+                reason = f"Connection error ({e})"
+            except Exception as e:
+                logger.error("[USAGE_STATS] Failed to fetch usage for workbook %s: %s", workbook_id, e)
+                return None
+
+            if attempt < MAX_DOWNLOAD_RETRIES:
+                logger.warning(
+                    "[USAGE_STATS] %s on workbook %s (attempt %s), retrying in %ss with limit %s",
+                    reason, workbook_id, attempt, wait_time, limiter.limit
+                )
+                await asyncio.sleep(wait_time)
+
+        logger.error("[USAGE_STATS] Giving up on workbook %s after %s attempts", workbook_id, MAX_DOWNLOAD_RETRIES)
+        return None
+
+    async def collect(self, workbooks: Dict[str, str]) -> List[WorkbookUsage]:
+        """
+        Fetch usage for ``{workbook_id: report_id}``.
+
+        Workbooks that could not be fetched are left out of the result.
+        """
+        if not workbooks:
+            return []
+        limiter = AdaptiveLimiter(self.max_concurrency)
+        connector = aiohttp.TCPConnector(limit_per_host=self.max_concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            results = await asyncio.gather(
+                *(self._fetch_one(session, limiter, wb_id, rep_id) for wb_id, rep_id in workbooks.items())
+            )
+        usages = [r for r in results if r is not None]
+        logger.info("[USAGE_STATS] Collected usage for %s/%s workbooks", len(usages), len(workbooks))
+        return usages
+
+    async def refresh_report_usage(self, workbooks: Dict[str, str]) -> int:
+        """Collect usage for ``{workbook_id: report_id}`` and write it to ``report_details`` in bulk."""
+        from app.models.report_details import ReportDetailManager
+
+        usages = await self.collect(workbooks)
+        updates = [
+            {"report_id": u.report_id, "view_count": u.view_count, "last_viewed": u.last_viewed}
+            for u in usages
+        ]
+        return await asyncio.to_thread(ReportDetailManager.update_usage_statistics, updates)
@@ -0,0 +1,285 @@
+import os
+import json
+import uuid
+import time
+import pickle
+import asyncio
+import hashlib
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; keys.json is then only guarded per process
+    fcntl = None
+
+from app.core.config import logger, WORKBOOK_CACHE_DIR, WORKBOOK_CACHE_MAX_BYTES, WORKBOOK_CACHE_MIN_AGE
+from app.core.constants import WORKBOOK_CACHE_KEY_MARKER
+from app.core.twb_index import WorkbookIndex, load_workbook_index
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+_INDEX_SUFFIX = ".index.pkl"
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_index(index_path: str) -> WorkbookIndex:
+    with open(index_path, "rb") as f:
+        index = pickle.load(f)
+    os.utime(index_path)  # mark as recently used
+    return index
+
+
+def _write_index(index_path: str, index: WorkbookIndex) -> None:
+    tmp_path = f"{index_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, index_path)
+
+
+class WorkbookCache:
+    """
+    Content-addressed, disk-backed cache of workbook files and their parsed indexes.
+
+    Each cloud object key maps to the SHA-256 of its bytes and the object's
+    ETag, and the bytes and the pickled WorkbookIndex are stored once per hash,
+    so analysis, DAX conversion, migration and semantic generation share a
+    single download and parse of a report. Every lookup compares the stored
+    ETag with the object's current one, so a key replaced through another
+    worker is re-downloaded. ``keys.json`` is shared by all workers on the
+    host: it is re-read when it changes and every update is a locked
+    read-modify-write. Entries are evicted least-recently-used once the cache
+    exceeds ``WORKBOOK_CACHE_MAX_BYTES``; anything used in the last
+    ``WORKBOOK_CACHE_MIN_AGE`` seconds is kept, so a returned path stays valid
+    for at least that long.
+    """
+
+    def __init__(self, cache_dir: str = WORKBOOK_CACHE_DIR, max_bytes: int = WORKBOOK_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.keys_path = os.path.join(cache_dir, "keys.json")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, asyncio.Lock] = {}
+        self._key_lock_users: Dict[str, int] = {}
+        self._keys: Dict[str, Dict[str, Optional[str]]] = {}
+        self._keys_mtime: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    # ---- key map -------------------------------------------------------
+
+    def _load_keys(self) -> Dict[str, Dict[str, Optional[str]]]:
+        """The key map, re-read whenever another worker has replaced keys.json."""
+        try:
+            mtime = os.stat(self.keys_path).st_mtime_ns
+        except FileNotFoundError:
+            self._keys, self._keys_mtime = {}, None
+            return self._keys
+        if mtime != self._keys_mtime:
+            try:
+                with open(self.keys_path, "r") as f:
+                    # Entries from before ETags were recorded are dropped and re-downloaded.
+                    self._keys = {k: v for k, v in json.load(f).items() if isinstance(v, dict)}
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._keys = {}
+            self._keys_mtime = mtime
+        return self._keys
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(f"{self.keys_path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _update_keys(self, mutate: Callable[[Dict[str, Dict[str, Optional[str]]]], bool]) -> None:
+        """Apply ``mutate`` to the latest on-disk key map and write it back if it reports a change."""
+        with self._lock, self._file_lock():
+            keys = self._load_keys()
+            if not mutate(keys):
+                return
+            tmp_path = f"{self.keys_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(keys, f)
+            os.replace(tmp_path, self.keys_path)
+            self._keys_mtime = os.stat(self.keys_path).st_mtime_ns
+
+    def _blob_path(self, content_hash: str, extension: str = "") -> str:
+        return os.path.join(self.blob_dir, content_hash + extension)
+
+    def _lookup(self, object_key: str, etag: Optional[str]) -> Optional[str]:
+        with self._lock:
+            entry = self._load_keys().get(object_key)
+        # Without a current ETag the copy cannot be validated, so it is not trusted.
+        if not entry or etag is None or entry.get("etag") != etag:
+            return None
+        path = self._blob_path(entry["hash"], os.path.splitext(object_key)[1])
+        try:
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            return None
+        return path
+
+    @asynccontextmanager
+    async def _key_lock(self, object_key: str):
+        """Serialize work on one key; the lock is dropped once nobody holds or awaits it."""
+        lock = self._key_locks.get(object_key)
+        if lock is None:
+            lock = self._key_locks[object_key] = asyncio.Lock()
+        self._key_lock_users[object_key] = self._key_lock_users.get(object_key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._key_lock_users[object_key] -= 1
+            if not self._key_lock_users[object_key]:
+                del self._key_lock_users[object_key]
+                del self._key_locks[object_key]
+
+    # ---- public API ----------------------------------------------------
+
+    async def get_file(self, object_key: str, cloud_storage) -> str:
+        """Return a local path holding the bytes of ``object_key``, downloading it on a miss."""
+        async with self._key_lock(object_key):
+            etag = await cloud_storage.get_object_etag(object_key)
+            path = await asyncio.to_thread(self._lookup, object_key, etag)
+            if path:
+                self.hits += 1
+                return path
+
+            self.misses += 1
+            os.makedirs(self.blob_dir, exist_ok=True)
+            extension = os.path.splitext(object_key)[1]
+            tmp_path = os.path.join(self.blob_dir, f"{uuid.uuid4().hex}.download{extension}")
+            try:
+                await cloud_storage.download_file(object_key, tmp_path)
+                content_hash = await asyncio.to_thread(_sha256_file, tmp_path)
+                path = self._blob_path(content_hash, extension)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            def record(keys):
+                keys[object_key] = {"hash": content_hash, "etag": etag}
+                return True
+
+            await asyncio.to_thread(self._update_keys, record)
+            logger.info("[WORKBOOK_CACHE] Cached %s as %s", object_key, content_hash[:12])
+            await asyncio.to_thread(self._evict)
+            return path
+
+    async def get_index(self, object_key: str, cloud_storage) -> WorkbookIndex:
+        """Return the parsed WorkbookIndex for ``object_key``, parsing at most once per content hash."""
+        path = await self.get_file(object_key, cloud_storage)
+        index_path = os.path.splitext(path)[0] + _INDEX_SUFFIX
+        if os.path.exists(index_path):
+            try:
+                return await asyncio.to_thread(_read_index, index_path)
+            except Exception as e:
+                logger.warning("[WORKBOOK_CACHE] Discarding unreadable index %s: %s", index_path, e)
+
+        index = await asyncio.to_thread(load_workbook_index, path)
+        await asyncio.to_thread(_write_index, index_path, index)
+        return index
+
+    def _invalidate_matching(self, matches: Callable[[str], bool]) -> int:
+        removed = []
+
+        def drop(keys):
+            removed.extend(k for k in keys if matches(k))
+            for k in removed:
+                keys.pop(k, None)
+            return bool(removed)
+
+        self._update_keys(drop)
+        return len(removed)
+
+    def invalidate(self, object_key: str) -> None:
+        """Forget the mapping for ``object_key``; the content itself ages out through eviction."""
+        if self._invalidate_matching(lambda k: k == object_key):
+            logger.info("[WORKBOOK_CACHE] Invalidated %s", object_key)
+
+    def invalidate_keys(self, object_keys: List[str]) -> None:
+        """Forget several keys with a single keys.json update."""
+        wanted = set(object_keys)
+        count = self._invalidate_matching(lambda k: k in wanted)
+        if count:
+            logger.info("[WORKBOOK_CACHE] Invalidated %s of %s keys", count, len(wanted))
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        count = self._invalidate_matching(lambda k: k.startswith(prefix))
+        if count:
+            logger.info("[WORKBOOK_CACHE] Invalidated %s entries under %s", count, prefix)
+
+    def invalidate_report(self, s3_report_id) -> None:
+        """Forget every cached tableau_file belonging to a report, whatever its organization or name."""
+        marker = f"/{s3_report_id}{WORKBOOK_CACHE_KEY_MARKER}"
+        count = self._invalidate_matching(lambda k: marker in k)
+        if count:
+            logger.info("[WORKBOOK_CACHE] Invalidated %s entries for report %s", count, s3_report_id)
+
+    def _evict(self) -> None:
+        """Delete least-recently-used blobs (and their indexes) until the cache fits in max_bytes."""
+        if not os.path.isdir(self.blob_dir):
+            return
+        entries = []
+        total = 0
+        for entry in os.scandir(self.blob_dir):
+            if not entry.is_file() or entry.name.endswith(".tmp") or ".download" in entry.name:
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        removed_hashes = set()
+        # Recently used blobs may have just been handed to a caller that has not opened them yet.
+        cutoff = time.time() - WORKBOOK_CACHE_MIN_AGE
+        for mtime, size, path in entries:
+            if total <= self.max_bytes or mtime > cutoff:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            removed_hashes.add(os.path.basename(path).split(".", 1)[0])
+
+        def drop(keys):
+            stale = [k for k, e in keys.items() if e["hash"] in removed_hashes and not self._has_blob(k, e["hash"])]
+            for k in stale:
+                keys.pop(k, None)
+            return bool(stale)
+
+        self._update_keys(drop)
+        logger.info("[WORKBOOK_CACHE] Evicted %s entries; cache now %s bytes", len(removed_hashes), total)
+
+    def _has_blob(self, object_key: str, content_hash: str) -> bool:
+        return os.path.exists(self._blob_path(content_hash, os.path.splitext(object_key)[1]))
+
+
+workbook_cache = WorkbookCache()
+
+
+def invalidate_cached_objects(object_keys: List[str]) -> None:
+    """Hook for the storage classes: drop ``object_keys`` from the workbook cache after they change."""
+    try:
+        workbook_cache.invalidate_keys(object_keys)
+    except Exception as e:
+        logger.warning("[WORKBOOK_CACHE] Failed to invalidate %s keys: %s", len(object_keys), e)
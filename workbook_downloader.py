@@ -0,0 +1,238 @@
+import os
+import re
+import asyncio
+import weakref
+import aiohttp
+import aiofiles
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional
+
+from app.core.config import logger, WORKBOOK_DOWNLOAD_CONCURRENCY, WORKBOOK_DOWNLOAD_TIMEOUT
+from app.core.constants import (
+    MAX_DOWNLOAD_RETRIES, REPORT_PATH, RETRY_BACKOFF_BASE, TABLEAU_AUTH_HEADER, TABLEAU_VERSION,
+    WORKBOOK_DOWNLOAD_CHUNK_SIZE, WORKBOOK_DOWNLOAD_URL, WORKBOOK_PARTIAL_SUFFIX, WORKBOOK_VALIDATOR_SUFFIX
+)
+
+
+class WorkbookDownloadRequest(NamedTuple):
+    """A single workbook to fetch from Tableau Server."""
+    workbook_id: str
+    file_name: str
+    s3_report_id: str
+    updated_at: Optional[str] = None
+    stored_updated_at: Optional[datetime] = None
+
+
+class WorkbookDownloadResult(NamedTuple):
+    """Outcome of a single workbook download; the local copy is removed once uploaded."""
+    workbook_id: str
+    status: str
+    cloud_path: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _to_naive_utc(value) -> Optional[datetime]:
+    """Normalise Tableau ISO timestamps and DB datetimes to naive UTC for comparison."""
+    if not value:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            logger.warning("[WORKBOOK_DOWNLOAD] Could not parse timestamp '%s'", value)
+            return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=0)
+
+
+class WorkbookDownloader:
+    """
+    Bulk workbook fetcher for Tableau Server.
+
+    Workbooks are downloaded concurrently, capped per server so one large
+    migration cannot flood a Tableau node. Each download streams to a
+    ``.part`` file and resumes with an HTTP ``Range`` request after a dropped
+    connection; the request carries ``If-Range`` with the validator of the
+    partial body, so a workbook republished in between is downloaded afresh
+    instead of being spliced. Workbooks whose ``updatedAt`` matches the copy
+    already stored under ``REPORT_PATH`` are skipped.
+
+    Downloads are capped twice: by ``max_concurrency`` per downloader, and by
+    ``WORKBOOK_DOWNLOAD_CONCURRENCY`` per server across every downloader
+    running on the same event loop.
+    """
+
+    # event loop -> server URL -> semaphore; entries go away with their loop.
+    _server_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+        weakref.WeakKeyDictionary()
+    )
+
+    def __init__(
+        self,
+        server_url: str,
+        site_id: str,
+        auth_token: str,
+        organization_name: str,
+        cloud_storage,
+        cloud_provider: str,
+        download_dir: str,
+        version: str = TABLEAU_VERSION,
+        max_concurrency: int = WORKBOOK_DOWNLOAD_CONCURRENCY
+    ):
+        self.server_url = server_url.rstrip("/")
+        self.site_id = site_id
+        self.auth_token = auth_token
+        self.organization_name = organization_name
+        self.cloud_storage = cloud_storage
+        self.cloud_provider = cloud_provider
+        self.download_dir = download_dir
+        self.version = version
+        self.max_concurrency = max(1, max_concurrency)
+        self._instance_limit: Optional[asyncio.Semaphore] = None
+
+    def _server_semaphore(self) -> asyncio.Semaphore:
+        servers = WorkbookDownloader._server_limits.setdefault(asyncio.get_running_loop(), {})
+        semaphore = servers.get(self.server_url)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(max(1, WORKBOOK_DOWNLOAD_CONCURRENCY))
+            servers[self.server_url] = semaphore
+        return semaphore
+
+    def _instance_semaphore(self) -> asyncio.Semaphore:
+        if self._instance_limit is None:
+            self._instance_limit = asyncio.Semaphore(self.max_concurrency)
+        return self._instance_limit
+
+    def _cloud_path(self, request: WorkbookDownloadRequest) -> str:
+        report_path = REPORT_PATH.format(
+            organization_name=self.organization_name,
+            s3_report_id=request.s3_report_id
+        )
+        return f"{report_path}/{request.file_name}"
+
+    async def _is_up_to_date(self, request: WorkbookDownloadRequest, cloud_path: str) -> bool:
+        remote_updated_at = _to_naive_utc(request.updated_at)
+        stored_updated_at = _to_naive_utc(request.stored_updated_at)
+        if not remote_updated_at or remote_updated_at != stored_updated_at:
+            return False
+        try:
+            return await self.cloud_storage.check_file_exists(cloud_path)
+        except Exception as e:
+            logger.warning("[WORKBOOK_DOWNLOAD] Existence check failed for %s: %s", cloud_path, e)
+            return False
+
+    @staticmethod
+    def _validator(resp: aiohttp.ClientResponse) -> Optional[str]:
+        """A strong validator usable in If-Range: the ETag unless weak, else Last-Modified."""
+        etag = resp.headers.get("ETag")
+        if etag and not etag.startswith("W/"):
+            return etag
+        return resp.headers.get("Last-Modified")
+
+    async def _stream_to_disk(self, session: aiohttp.ClientSession, url: str, local_path: str) -> None:
+        """Stream the workbook body to ``local_path``, resuming a previous partial download."""
+        part_path = local_path + WORKBOOK_PARTIAL_SUFFIX
+        validator_path = part_path + WORKBOOK_VALIDATOR_SUFFIX
+        headers = {TABLEAU_AUTH_HEADER: self.auth_token}
+
+        for attempt in range(1, MAX_DOWNLOAD_RETRIES + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            validator = None
+            if offset and os.path.exists(validator_path):
+                async with aiofiles.open(validator_path, "r") as f:
+                    validator = (await f.read()).strip() or None
+            request_headers = dict(headers)
+            if offset and validator:
+                # Without a matching validator the server sends the whole current body (200).
+                request_headers["Range"] = f"bytes={offset}-"
+                request_headers["If-Range"] = validator
+            else:
+                # A partial body that cannot be validated is never resumed.
+                offset = 0
+            try:
+                async with session.get(url, headers=request_headers) as resp:
+                    if resp.status == 416 and offset:
+                        # The partial file already holds the whole body.
+                        break
+                    resp.raise_for_status()
+                    if resp.status != 206:
+                        # Fresh body (first attempt, changed workbook, or Range ignored): start over.
+                        offset = 0
+                        new_validator = self._validator(resp)
+                        if new_validator:
+                            async with aiofiles.open(validator_path, "w") as f:
+                                await f.write(new_validator)
+                        elif os.path.exists(validator_path):
+                            os.remove(validator_path)
+                    async with aiofiles.open(part_path, "ab" if offset else "wb") as f:
+                        async for chunk in resp.content.iter_chunked(WORKBOOK_DOWNLOAD_CHUNK_SIZE):
+                            await f.write(chunk)
+                break
+            except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == MAX_DOWNLOAD_RETRIES:
+                    raise
+                wait_time = RETRY_BACKOFF_BASE ** attempt
+                logger.warning(
+                    "[WORKBOOK_DOWNLOAD] Connection dropped for %s at byte %s (attempt %s): %s. Resuming in %ss",
+                    url, offset, attempt, e, wait_time
+                )
+                await asyncio.sleep(wait_time)
+
+        os.replace(part_path, local_path)
+        if os.path.exists(validator_path):
+            os.remove(validator_path)
+
+    async def _upload(self, local_path: str, cloud_path: str) -> bool:
+        if self.cloud_provider == "azure":
+            return await self.cloud_storage.upload_to_blob(file_path=local_path, object_name=cloud_path)
+        return await self.cloud_storage.upload_to_s3(file_path=local_path, object_name=cloud_path)
+
+    async def _download_one(self, session: aiohttp.ClientSession, request: WorkbookDownloadRequest) -> WorkbookDownloadResult:
+        cloud_path = self._cloud_path(request)
+        if await self._is_up_to_date(request, cloud_path):
+            logger.info("[WORKBOOK_DOWNLOAD] Skipping %s: stored copy is current", request.file_name)
+            return WorkbookDownloadResult(request.workbook_id, "skipped", cloud_path)
+
+        url = WORKBOOK_DOWNLOAD_URL.format(
+            server_url=self.server_url,
+            version=self.version,
+            site_id=self.site_id,
+            workbook_id=request.workbook_id
+        )
+        safe_name = re.sub(r'[\\/]', '_', request.file_name)
+        local_path = os.path.join(self.download_dir, request.workbook_id, safe_name)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+
+        try:
+            async with self._instance_semaphore(), self._server_semaphore():
+                await self._stream_to_disk(session, url, local_path)
+            try:
+                if not await self._upload(local_path, cloud_path):
+                    raise RuntimeError(f"Upload of {cloud_path} failed")
+            finally:
+                # The complete file is only a staging copy; a .part of a failed download stays for resuming.
+                if os.path.exists(local_path):
+                    os.remove(local_path)
+            logger.info("[WORKBOOK_DOWNLOAD] Stored %s at %s", request.file_name, cloud_path)
+            return WorkbookDownloadResult(request.workbook_id, "downloaded", cloud_path)
+        except Exception as e:
+            logger.error("[WORKBOOK_DOWNLOAD] Failed to download workbook %s: %s", request.workbook_id, e)
+            return WorkbookDownloadResult(request.workbook_id, "failed", error=str(e))
+
+    async def download_workbooks(self, requests: List[WorkbookDownloadRequest]) -> List[WorkbookDownloadResult]:
+        """Download all requested workbooks; failures are reported per workbook instead of raised."""
+        if not requests:
+            return []
+        timeout = aiohttp.ClientTimeout(total=WORKBOOK_DOWNLOAD_TIMEOUT)
+        connector = aiohttp.TCPConnector(limit_per_host=self.max_concurrency)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            results = await asyncio.gather(*(self._download_one(session, r) for r in requests))
+
+        downloaded = sum(1 for r in results if r.status == "downloaded")
+        skipped = sum(1 for r in results if r.status == "skipped")
+        logger.info(
+            "[WORKBOOK_DOWNLOAD] %s downloaded, %s skipped, %s failed out of %s workbooks",
+            downloaded, skipped, len(results) - downloaded - skipped, len(results)
+        )
+        return list(results)